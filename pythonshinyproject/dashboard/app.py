@@ -18,6 +18,7 @@ from tabs.brightwaytab import brightway_tab_ui, brightway_tab_server
 from tabs.foodwastetab import foodwaste_tab_ui, foodwaste_tab_server
 from tabs.wasteestimation import wasteestimation_tab_ui, wasteestimation_tab_server
 
+from clientcharts import chart_dependencies
 from init import initialization
 
 # Initialize the application
@@ -31,6 +32,7 @@ app_ui = ui.page_fluid(
         ui.nav_panel("Food Waste", wasteestimation_tab_ui()),
     ),
     ui.include_css(app_dir / "styles.css"),
+    chart_dependencies(),
 )
 
 def server(input, output, session):
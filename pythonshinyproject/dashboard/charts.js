@@ -0,0 +1,101 @@
+// Draws the interactive charts from the payloads built in clientcharts.py
+(function () {
+  var charts = {};
+
+  function records(chart) {
+    var rows = [];
+    chart.series.forEach(function (series) {
+      series.values.forEach(function (value, i) {
+        rows.push({ category: chart.categories[i], series: series.name, value: value });
+      });
+    });
+    return rows;
+  }
+
+  function barSpec(chart) {
+    var category = { field: "category", type: "nominal", sort: chart.categories, title: chart.x };
+    var value = { field: "value", type: "quantitative", title: chart.y, stack: chart.stacked ? "zero" : null };
+    var encoding = {
+      color: { field: "series", type: "nominal", title: null },
+      tooltip: [
+        { field: "category", title: chart.x || "Category" },
+        { field: "series", title: "Series" },
+        { field: "value", title: chart.y || "Value", format: ",.4~g" },
+      ],
+    };
+
+    encoding[chart.horizontal ? "y" : "x"] = category;
+    encoding[chart.horizontal ? "x" : "y"] = value;
+    if (!chart.stacked) {
+      encoding[chart.horizontal ? "yOffset" : "xOffset"] = { field: "series" };
+    }
+
+    var layers = [{ data: { values: records(chart) }, mark: { type: "bar", opacity: 0.85 }, encoding: encoding }];
+
+    if (chart.points) {
+      var points = chart.points.values.map(function (value, i) {
+        return { category: chart.categories[i], series: chart.points.name, value: value };
+      });
+      var pointEncoding = { tooltip: encoding.tooltip };
+      pointEncoding[chart.horizontal ? "y" : "x"] = category;
+      pointEncoding[chart.horizontal ? "x" : "y"] = { field: "value", type: "quantitative" };
+      layers.push({
+        data: { values: points },
+        mark: { type: "point", shape: "diamond", filled: true, color: "black", size: 100 },
+        encoding: pointEncoding,
+      });
+    }
+
+    return { title: chart.title, layer: layers, width: "container", height: "container" };
+  }
+
+  function spec(chart) {
+    if (chart.kind === "message") {
+      return {
+        data: { values: [{}] },
+        mark: { type: "text", fontSize: 14, color: "gray" },
+        encoding: { text: { value: chart.title } },
+        width: "container",
+        height: "container",
+        view: { stroke: null },
+      };
+    }
+    if (chart.kind === "panels") {
+      return {
+        title: chart.title,
+        columns: chart.columns,
+        concat: chart.panels.map(function (panel) {
+          var panelSpec = spec(panel);
+          panelSpec.width = 420;
+          panelSpec.height = 320;
+          return panelSpec;
+        }),
+        resolve: { scale: { color: "shared" } },
+      };
+    }
+    return barSpec(chart);
+  }
+
+  function draw(id) {
+    var el = document.getElementById(id);
+    // Hidden elements have no size to draw to, they are drawn when shown
+    if (!el || el.offsetParent === null) {
+      return;
+    }
+    var full = Object.assign({ $schema: "https://vega.github.io/schema/vega-lite/v5.json", autosize: { type: "fit", contains: "padding" } }, spec(charts[id]));
+    vegaEmbed(el, full, { actions: { export: true, source: false, compiled: false, editor: false }, renderer: "svg" });
+  }
+
+  function redrawVisible() {
+    Object.keys(charts).forEach(draw);
+  }
+
+  $(function () {
+    Shiny.addCustomMessageHandler("client-chart", function (message) {
+      charts[message.id] = message.chart;
+      // The conditional panel the chart is in may only be shown once this message is handled
+      setTimeout(function () { draw(message.id); }, 0);
+    });
+    $(document).on("shown.bs.tab", redrawVisible);
+  });
+})();
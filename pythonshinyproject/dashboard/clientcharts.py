@@ -0,0 +1,69 @@
+import math
+
+from shiny import ui
+
+from shared import app_dir
+
+# Custom message the browser draws a chart from, handled in charts.js
+CHART_MESSAGE = "client-chart"
+
+VEGA_SCRIPTS = [
+    "https://cdn.jsdelivr.net/npm/vega@5",
+    "https://cdn.jsdelivr.net/npm/vega-lite@5",
+    "https://cdn.jsdelivr.net/npm/vega-embed@6",
+]
+
+def chart_dependencies():
+    """Method to get the scripts the interactive charts are drawn with, added once to the page"""
+    return ui.head_content(
+        *[ui.tags.script(src=src) for src in VEGA_SCRIPTS],
+        ui.include_js(app_dir / "charts.js"),
+    )
+
+def client_chart(id, height="400px"):
+    """Method to get the element an interactive chart is drawn in"""
+    return ui.div(id=id, class_="client-chart", style=f"width: 100%; height: {height};")
+
+def _values(values):
+    # 6 significant digits is below what a chart can show, and NaN is not valid JSON
+    rounded = []
+    for v in values:
+        v = None if v is None else float(v)
+        rounded.append(None if v is None or not math.isfinite(v) else float(f"{v:.6g}"))
+    return rounded
+
+def bar_chart(categories, series, title="", x_label="", y_label="", stacked=False, horizontal=False, points=None):
+    """Method to get the payload of a bar chart, series is {name: one value per category}
+
+    Bars are grouped, or stacked if stacked is True. points is an optional (name, one value per category)
+    drawn as markers over the bars, such as the totals of stacked contributions.
+    """
+    chart = {
+        "kind": "bar",
+        "title": title,
+        "x": x_label,
+        "y": y_label,
+        "categories": [str(c) for c in categories],
+        "series": [{"name": str(name), "values": _values(values)} for name, values in series.items()],
+        "stacked": stacked,
+        "horizontal": horizontal,
+    }
+    if points is not None:
+        chart["points"] = {"name": points[0], "values": _values(points[1])}
+    return chart
+
+def frame_chart(df, **kwargs):
+    """Method to get the payload of a bar chart of a data frame, one group per row and one series per column"""
+    return bar_chart(df.index, {column: df[column].to_numpy() for column in df.columns}, **kwargs)
+
+def panel_chart(panels, columns=2, title=""):
+    """Method to get the payload of a grid of charts"""
+    return {"kind": "panels", "title": title, "columns": columns, "panels": panels}
+
+def message_chart(message):
+    """Method to get the payload of a chart with only a message, shown while there is nothing to draw"""
+    return {"kind": "message", "title": message}
+
+async def send_chart(session, id, chart):
+    """Method to send a chart payload to the browser, which draws it in the element id"""
+    await session.send_custom_message(CHART_MESSAGE, {"id": id, "chart": chart})
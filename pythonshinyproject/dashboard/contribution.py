@@ -0,0 +1,83 @@
+import brightway2 as bw
+
+import numpy as np
+import pandas as pd
+
+from lcaengine import activity_key, get_engine, unit_scores
+
+COLUMNS = ['activity', 'name', 'input', 'type', 'amount', 'contribution', '%_contribution']
+
+def _names(keys):
+    names = {}
+    for key in set(keys):
+        try:
+            names[key] = bw.get_activity(key)['name']
+        except Exception:
+            names[key] = str(key)
+    return [names[key] for key in keys]
+
+def direct_contributions(activities, method, engine=None):
+    """Method to split the score of every activity into the contributions of its direct inputs and emissions
+
+    The score of one unit of activity a satisfies u_a * A[a, a] = g_a + sum_j u_j * (-A[j, a]), with g the
+    characterized biosphere column and u the unit scores, so every technosphere or substitution input
+    contributes its amount times the unit score of its input and every emission its characterized amount.
+    The totals come from one multi right-hand side solve of all the activities, and the unit scores of the
+    inputs from the unit score cache. Returns (contributions, totals), with one row per direct input.
+    """
+    engine = engine or get_engine(method)
+    keys = [activity_key(activity) for activity in activities]
+    if not keys:
+        return pd.DataFrame(columns=COLUMNS), pd.Series(dtype=float)
+
+    names = _names(keys)
+    cf = engine.characterization_vector(method)
+    supply = engine.solve_many([{key: 1} for key in keys])
+    totals = pd.Series(cf @ (engine.biosphere_matrix @ supply), index=names)
+
+    technosphere = engine.technosphere_matrix.tocsc()
+    biosphere = engine.biosphere_matrix.tocsc()
+    products = {index: key for key, index in engine.product_dict.items()}
+    flows = {index: key for key, index in engine.biosphere_dict.items()}
+
+    parts = []
+    for key, name in zip(keys, names):
+        col = engine.activity_dict[key]
+        production = technosphere[engine.product_dict[key], col]
+
+        column = technosphere[:, col]
+        rows, values = column.indices, column.data
+        keep = (rows != engine.product_dict[key]) & (values != 0)
+        parts.append(pd.DataFrame({
+            'activity': name,
+            'input': [products[row] for row in rows[keep]],
+            'type': np.where(values[keep] < 0, 'technosphere', 'substitution'),
+            'amount': np.abs(values[keep]) / production,
+            'matrix_amount': -values[keep] / production,
+        }))
+
+        column = biosphere[:, col]
+        rows, values = column.indices, column.data
+        parts.append(pd.DataFrame({
+            'activity': name,
+            'input': [flows[row] for row in rows],
+            'type': 'biosphere',
+            'amount': values / production,
+            'contribution': cf[rows] * values / production,
+        }))
+
+    table = pd.concat(parts, ignore_index=True)
+    inputs = table['type'] != 'biosphere'
+
+    input_keys = list(table.loc[inputs, 'input'])
+    scores = unit_scores(input_keys, [method])[:, 0] if input_keys else np.zeros(0)
+    table.loc[inputs, 'contribution'] = table.loc[inputs, 'matrix_amount'].to_numpy() * scores
+    table['name'] = _names(list(table['input']))
+    table['%_contribution'] = 100 * table['contribution'] / table['activity'].map(totals).replace(0, np.nan)
+
+    table = table[COLUMNS].sort_values(['activity', 'contribution'], ascending=[True, False], ignore_index=True)
+    return table, totals
+
+def check_contributions(table, totals):
+    """Method to get the gap between the sum of the contributions of every activity and its score, zero when they add up"""
+    return table.groupby('activity')['contribution'].sum().reindex(totals.index, fill_value=0) - totals
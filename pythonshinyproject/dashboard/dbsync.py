@@ -0,0 +1,109 @@
+import brightway2 as bw
+import hashlib
+
+import scorecache
+from pedigree import PEDIGREE_LOCATION, apply_pedigree
+
+SCENARIO_DB_LOCATION = "data/brightway/Scenarios Database.xlsx"
+SCENARIOS_DATABASE = "Scenarios"
+
+def workbook_hash(path):
+    """Method to get the content hash of a workbook, used to detect when it actually changed"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _canonical(ds):
+    """Method to reduce an activity to the fields that matter for the LCA, so imported and stored activities compare equal"""
+    fields = tuple(str(ds.get(field)) for field in ("name", "comment", "location", "unit", "reference product", "production amount"))
+    exchanges = sorted((tuple(exc["input"]), float(exc["amount"]), exc["type"]) for exc in ds.get("exchanges", []) if exc.get("input"))
+    return fields, exchanges
+
+def write_changed_activities(database_name, data):
+    """Method to insert, update or delete only the activities of a database that differ from the imported data"""
+    db = bw.Database(database_name)
+    existing = db.load()
+    imported = {(ds["database"], ds["code"]): ds for ds in data}
+
+    deleted = [key for key in existing if key not in imported]
+    changed = [key for key, ds in imported.items() if key not in existing or _canonical(existing[key]) != _canonical(ds)]
+
+    for key in deleted + [key for key in changed if key in existing]:
+        bw.get_activity(key).delete()
+
+    for key in changed:
+        ds = dict(imported[key])
+        exchanges = ds.pop("exchanges", [])
+        ds.pop("database", None)
+        code = ds.pop("code")
+
+        act = db.new_activity(code, **ds)
+        act.save()
+
+        for exc in exchanges:
+            if exc.get("input"):
+                act.new_exchange(**{k: v for k, v in exc.items() if k != "output"}).save()
+
+    if deleted or changed:
+        db.process()
+
+    print(f"{database_name}: {len(changed)} activities written, {len(deleted)} deleted")
+
+def refresh_scenarios(database_name):
+    """Method to import the Scenarios workbook into brightway, skipped when the workbook did not change since the last import
+
+    Returns True if the database was written.
+    """
+    source_hash = workbook_hash(SCENARIO_DB_LOCATION)
+
+    if SCENARIOS_DATABASE in bw.databases and bw.databases[SCENARIOS_DATABASE].get("source_hash") == source_hash:
+        return False
+
+    imp = bw.ExcelImporter(SCENARIO_DB_LOCATION) 
+    imp.apply_strategies()
+    imp.match_database(database_name, fields=('name', 'unit', 'location', 'reference product')) 
+    imp.match_database(fields=('name', 'unit', 'location'))
+    _, _, unlinked = imp.statistics()
+
+    if unlinked:
+        imp.write_excel(only_unlinked=True)
+
+    if imp.db_name in bw.databases:
+        write_changed_activities(imp.db_name, imp.data)
+    else:
+        imp.write_database()
+
+    if imp.db_name in bw.databases:
+        bw.databases[imp.db_name]["source_hash"] = source_hash
+        bw.databases.flush()
+
+    scorecache.prune()
+    return True
+
+def refresh_pedigree(database_name, path=PEDIGREE_LOCATION):
+    """Method to apply the pedigree workbook again to the exchanges of a database, skipped when the workbook did not change since
+
+    Databases imported before the pedigree workbook, or before its last change, get their uncertainty
+    updated in place. Returns True if the database was written.
+    """
+    source_hash = workbook_hash(path)
+    if bw.databases[database_name].get("pedigree_hash") == source_hash:
+        return False
+
+    db = bw.Database(database_name)
+    data = db.load()
+    for ds in data.values():
+        for exc in ds.get("exchanges", []):
+            # Exchanges stored without the names they were imported with are matched on their input
+            if "name" not in exc and exc.get("input"):
+                exc["name"] = bw.get_activity(exc["input"]).get("name")
+
+    apply_pedigree(list(data.values()), path)
+    db.write(data)
+
+    bw.databases[database_name]["pedigree_hash"] = source_hash
+    bw.databases.flush()
+    scorecache.prune()
+    return True
@@ -0,0 +1,168 @@
+import functools
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+# Memory tier bound in megabytes of PNG, and disk tier directory, no disk tier when it is empty
+FIGURE_CACHE_MB = float(os.environ.get("FIGURE_CACHE_MB", 64))
+FIGURE_CACHE_LOCATION = os.environ.get("FIGURE_CACHE_LOCATION", "data/figures")
+FIGURE_CACHE_DISK_FILES = int(os.environ.get("FIGURE_CACHE_DISK_FILES", 2000))
+
+# Bump when the drawing code changes, so figures drawn by an older version are not served from disk
+FIGURE_VERSION = 1
+
+_lock = threading.Lock()
+_memory = OrderedDict()
+_memory_bytes = 0
+# Files counted in the disk tier, counted once by a scan of the directory and then kept up to date by the writes
+_disk_files = None
+
+def content_hash(*objects):
+    """Method to get a digest of the values the figure is drawn from: data frames, arrays, or anything with a stable repr"""
+    digest = hashlib.sha256()
+
+    def update(obj):
+        if isinstance(obj, pd.DataFrame):
+            digest.update(repr((list(obj.columns), obj.shape)).encode())
+            digest.update(pd.util.hash_pandas_object(obj.reset_index(), index=False).to_numpy().tobytes())
+        elif isinstance(obj, np.ndarray):
+            digest.update(repr((obj.dtype.str, obj.shape)).encode())
+            digest.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, (list, tuple)):
+            digest.update(f"{type(obj).__name__}{len(obj)}".encode())
+            for item in obj:
+                update(item)
+        else:
+            digest.update(repr(obj).encode())
+
+    update((FIGURE_VERSION,) + objects)
+    return digest.hexdigest()
+
+def _disk_path(key):
+    return os.path.join(FIGURE_CACHE_LOCATION, f"{key}.png")
+
+def _remember(key, png):
+    global _memory_bytes
+
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return
+        _memory[key] = png
+        _memory_bytes += len(png)
+        while _memory and _memory_bytes > FIGURE_CACHE_MB * 1024 * 1024:
+            _, old = _memory.popitem(last=False)
+            _memory_bytes -= len(old)
+
+def _prune_disk():
+    """Method to remove the oldest figures from disk, down to 90% of the limit so the next writes do not prune again"""
+    entries = sorted(os.scandir(FIGURE_CACHE_LOCATION), key=lambda entry: entry.stat().st_mtime)
+    removed = 0
+    for entry in entries[:max(0, len(entries) - int(FIGURE_CACHE_DISK_FILES * 0.9))]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return len(entries) - removed
+
+def _count_disk_write(new_file):
+    global _disk_files
+
+    with _lock:
+        if _disk_files is None:
+            _disk_files = len(os.listdir(FIGURE_CACHE_LOCATION))
+        elif new_file:
+            _disk_files += 1
+        if _disk_files <= FIGURE_CACHE_DISK_FILES:
+            return
+        # Other processes write to the same directory, the scan of the prune also corrects the count
+        _disk_files = _prune_disk()
+
+def get_png(key):
+    """Method to get the cached PNG bytes of a figure, from memory then disk, None if it was never drawn"""
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key]
+
+    if FIGURE_CACHE_LOCATION:
+        try:
+            with open(_disk_path(key), "rb") as f:
+                png = f.read()
+        except OSError:
+            return None
+        _remember(key, png)
+        return png
+
+    return None
+
+def put_png(key, png):
+    """Method to add the PNG bytes of a figure to the memory tier and, if there is one, the disk tier"""
+    _remember(key, png)
+
+    if FIGURE_CACHE_LOCATION:
+        try:
+            os.makedirs(FIGURE_CACHE_LOCATION, exist_ok=True)
+            new_file = not os.path.exists(_disk_path(key))
+            fd, tmp_path = tempfile.mkstemp(dir=FIGURE_CACHE_LOCATION, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, _disk_path(key))
+            _count_disk_write(new_file)
+        except OSError as e:
+            print(f"Figure cache write failed: {e}")
+
+def figure_png(fig, width, height, pixelratio=1.0):
+    """Method to draw a matplotlib figure at width x height CSS pixels, the way render.plot sizes it, and close it"""
+    dpi = 96 * pixelratio
+    fig.set_size_inches(width / 96, height / 96)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    plt.close(fig)
+    return buffer.getvalue()
+
+def _client_size(session, output_id):
+    clientdata = session.input
+    width = clientdata[f".clientdata_output_{output_id}_width"]()
+    height = clientdata[f".clientdata_output_{output_id}_height"]()
+    pixelratio = clientdata[".clientdata_pixelratio"]() if ".clientdata_pixelratio" in clientdata else 1
+    return int(width or 0), int(height or 0), float(pixelratio or 1)
+
+def cached_plot(session, output_id, key):
+    """Decorator to serve a plot function, which returns a matplotlib figure, through the figure cache
+
+    key is called first, in the reactive context of the output, and returns everything the figure depends on:
+    the selection and a version of the data. The figure is only drawn when that key, at the size of the output,
+    has not been drawn yet by any session. The result is for a render.image(delete_file=True) output.
+    """
+    def decorator(draw):
+        @functools.wraps(draw)
+        def wrapper():
+            width, height, pixelratio = _client_size(session, output_id)
+            if width <= 0 or height <= 0:
+                return None
+
+            cache_key = content_hash(output_id, key(), width, height, pixelratio)
+            png = get_png(cache_key)
+            if png is None:
+                png = figure_png(draw(), width, height, pixelratio)
+                put_png(cache_key, png)
+
+            # render.image reads the image from a file, which it deletes once sent
+            fd, path = tempfile.mkstemp(suffix=".png")
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+
+            return {"src": path, "width": f"{width}px", "height": f"{height}px", "alt": output_id}
+
+        return wrapper
+    return decorator
@@ -0,0 +1,241 @@
+import brightway2 as bw
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, TypedDict
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from lcaengine import TECHNOSPHERE_SIGNS, activity_key, climate_change_methods, get_engine
+from scenarioindex import find_activity
+
+# Facilities compared in the notebook sensitivity analysis
+GSA_FACILITIES = ["Composter_terrebonne", "AD_city", "Landfill_terrebonne_HOC"]
+
+_models = {}
+
+class Parameter(TypedDict):
+    name: str
+    activity: tuple
+    input: tuple
+    type: str
+    amount: float
+    low: float
+    high: float
+
+def exchange_parameters(activities, spread=0.2, include=("transport", "Methane")):
+    """Method to get uniform +/- spread parameters on the substitution credits of activities and on the exchanges whose name contains one of include"""
+    parameters: List[Parameter] = []
+
+    for activity in activities:
+        activity = bw.get_activity(activity_key(activity))
+        for exc in activity.exchanges():
+            if exc['type'] == 'production' or exc['amount'] == 0:
+                continue
+            if exc['type'] == 'substitution' or any(word in exc.input['name'] for word in include):
+                low, high = sorted((exc['amount'] * (1 - spread), exc['amount'] * (1 + spread)))
+                parameters.append({
+                    "name": f"{activity['name']}: {exc.input['name']}",
+                    "activity": activity.key,
+                    "input": exc.input.key,
+                    "type": exc['type'],
+                    "amount": exc['amount'],
+                    "low": low,
+                    "high": high,
+                })
+
+    return parameters
+
+class GSAModel:
+    """Scores of a set of demands as a function of exchange amounts, every evaluation reuses the base factorization
+
+    The parameters only change the columns of their activities, so each evaluation is the base solution
+    corrected with the Woodbury identity. Apart from one multi right-hand side solve at construction,
+    evaluating thousands of samples is a batch of small dense solves.
+    """
+
+    def __init__(self, parameters, demands, method, engine=None):
+        engine = engine or get_engine(method)
+        self.parameters = list(parameters)
+        self.low = np.array([p["low"] for p in self.parameters], dtype=float)
+        self.high = np.array([p["high"] for p in self.parameters], dtype=float)
+
+        param_bio = np.array([p["type"] == "biosphere" for p in self.parameters], dtype=bool)
+        self.signs = np.array([1 if p["type"] == "biosphere" else TECHNOSPHERE_SIGNS.get(p["type"], 1) for p in self.parameters], dtype=float)
+        param_rows = np.array([engine.biosphere_dict[p["input"]] if bio else engine.product_dict[p["input"]] for p, bio in zip(self.parameters, param_bio)], dtype=int)
+        param_cols = np.array([engine.activity_dict[p["activity"]] for p in self.parameters], dtype=int)
+
+        # Base amount of the exchange of every parameter, the other exchanges of its cell are kept as they are
+        self.amounts = np.array([p["amount"] for p in self.parameters], dtype=float)
+
+        # Parameters on the same matrix cell are summed into it, so the model works on cells rather than parameters
+        cells, self.cell_of = np.unique(np.column_stack([param_bio, param_rows, param_cols]), axis=0, return_inverse=True)
+        self.cell_of = self.cell_of.ravel()
+        self.n_cells = len(cells)
+        is_bio, rows, cols = cells[:, 0].astype(bool), cells[:, 1], cells[:, 2]
+
+        bio = engine.biosphere_matrix.tocsr()
+
+        demand_array = np.zeros((len(engine.product_dict), len(demands)))
+        for j, demand in enumerate(demands):
+            demand_array[engine.product_dict[activity_key(demand)], j] = 1
+        base_supply = engine.solve_array(demand_array)
+
+        cf = engine.characterization_vector(method)
+        g = bio.T @ cf
+
+        self.columns, column_index = np.unique(cols, return_inverse=True)
+        self.tech = np.flatnonzero(~is_bio)
+        self.bio = np.flatnonzero(is_bio)
+        self.tech_column = column_index[self.tech]
+        self.bio_column = column_index[self.bio]
+        self.bio_cf = cf[rows[self.bio]]
+
+        unit_rows = np.zeros((len(engine.product_dict), len(self.tech)))
+        unit_rows[rows[self.tech], np.arange(len(self.tech))] = 1
+        spread = engine.solve_array(unit_rows) if len(self.tech) else np.zeros((len(engine.product_dict), 0))
+
+        self.base_scores = g @ base_supply
+        self.base_columns = base_supply[self.columns, :]
+        self.spread_columns = spread[self.columns, :]
+        self.spread_scores = g @ spread
+
+    def evaluate(self, samples):
+        """Method to get the samples x demands array of scores, samples are in [0, 1] and scaled to the parameter ranges"""
+        values = self.low + np.asarray(samples) * (self.high - self.low)
+        n_samples, k = len(values), len(self.columns)
+
+        # Change of every cell, the sum of the signed changes of the exchanges of its parameters
+        deltas = np.zeros((n_samples, self.n_cells))
+        np.add.at(deltas.T, self.cell_of, (self.signs * (values - self.amounts)).T)
+
+        # Technosphere deltas placed in the columns of their activities, one k x k capacitance matrix per sample
+        m = np.zeros((n_samples, len(self.tech), k))
+        m[:, np.arange(len(self.tech)), self.tech_column] = deltas[:, self.tech]
+
+        km = self.spread_columns @ m
+        capacitance = np.eye(k) + km
+        z = np.linalg.solve(capacitance, np.broadcast_to(self.base_columns, (n_samples,) + self.base_columns.shape))
+
+        scores = self.base_scores - np.einsum("t,stk,skd->sd", self.spread_scores, m, z)
+
+        if len(self.bio):
+            supply = self.base_columns - km @ z
+            scores += np.einsum("sb,b,sbd->sd", deltas[:, self.bio], self.bio_cf, supply[:, self.bio_column, :])
+
+        return scores
+
+def _worker_model(project_name, parameters, demands, method):
+    """Method to get the model of a worker process, built once per process from the snapshot when it is current"""
+    from snapshot import load_background
+
+    if bw.projects.current != project_name:
+        bw.projects.set_current(project_name)
+
+    model_key = (project_name, repr(parameters), tuple(demands), tuple(method))
+    if model_key not in _models:
+        load_background()
+        _models.clear()
+        _models[model_key] = GSAModel(parameters, demands, method)
+
+    return _models[model_key]
+
+def _evaluate_chunk(project_name, parameters, demands, method, samples):
+    return _worker_model(project_name, parameters, demands, method).evaluate(samples)
+
+def evaluate(parameters, demands, method, samples, workers=None, chunk_size=2048):
+    """Method to evaluate a design, split in chunks across a spawned process pool of workers processes, every CPU by default
+
+    With workers=0, or a design of a single chunk that would not pay for starting the pool, it is evaluated in this process.
+    """
+    keys = [activity_key(demand) for demand in demands]
+
+    if workers == 0 or len(samples) <= chunk_size:
+        return GSAModel(parameters, keys, method).evaluate(samples)
+
+    chunks = [samples[i:i + chunk_size] for i in range(0, len(samples), chunk_size)]
+    args = (repeat(bw.projects.current), repeat(parameters), repeat(keys), repeat(method), chunks)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn")) as executor:
+        return np.vstack(list(executor.map(_evaluate_chunk, *args)))
+
+def saltelli_design(n_parameters, n_samples, seed=1016):
+    """Method to get the A, B and AB matrices of a Saltelli design from a scrambled Sobol sequence, n_samples is rounded up to a power of two"""
+    base = qmc.Sobol(2 * n_parameters, scramble=True, seed=seed).random_base2(int(np.ceil(np.log2(n_samples))))
+    a, b = base[:, :n_parameters], base[:, n_parameters:]
+
+    ab = np.repeat(a[None, :, :], n_parameters, axis=0)
+    ab[np.arange(n_parameters), :, np.arange(n_parameters)] = b.T
+
+    return a, b, ab
+
+def sobol_indices(parameters, demands, method=None, n_samples=1024, seed=1016, workers=None):
+    """Method to get the first-order and total-order Sobol indices of every parameter for the score of every demand
+
+    Saltelli 2010 estimators on a design of n_samples x (parameters + 2) evaluations. The result has one
+    row per (demand, parameter) with the S1 and ST indices.
+    """
+    method = method or climate_change_methods()[0]
+    names = [bw.get_activity(activity_key(demand))['name'] for demand in demands]
+    d = len(parameters)
+
+    a, b, ab = saltelli_design(d, n_samples, seed)
+    n = len(a)
+    y = evaluate(parameters, demands, method, np.vstack([a, b, ab.reshape(-1, d)]), workers=workers)
+    y_a, y_b, y_ab = y[:n], y[n:2 * n], y[2 * n:].reshape(d, n, -1)
+
+    variance = np.var(np.vstack([y_a, y_b]), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first = np.mean(y_b * (y_ab - y_a), axis=1) / variance
+        total = 0.5 * np.mean((y_a - y_ab) ** 2, axis=1) / variance
+
+    return pd.DataFrame({
+        "demand": np.repeat(names, d),
+        "parameter": np.tile([p["name"] for p in parameters], len(names)),
+        "S1": first.T.ravel(),
+        "ST": total.T.ravel(),
+    })
+
+def morris_design(n_parameters, trajectories, levels=4, seed=1016):
+    """Method to get Morris one-at-a-time trajectories, trajectories x (parameters + 1) points, with the order of the moved parameters"""
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+
+    starts = rng.integers(0, levels // 2, size=(trajectories, n_parameters)) / (levels - 1)
+    orders = np.argsort(rng.random((trajectories, n_parameters)), axis=1)
+
+    steps = np.zeros((trajectories, n_parameters + 1, n_parameters))
+    steps[np.arange(trajectories)[:, None], np.arange(1, n_parameters + 1)[None, :], orders] = delta
+    points = starts[:, None, :] + np.cumsum(steps, axis=1)
+
+    return points, orders, delta
+
+def morris_indices(parameters, demands, method=None, trajectories=50, levels=4, seed=1016, workers=None):
+    """Method to get the Morris mu, mu* and sigma of the elementary effects of every parameter for the score of every demand"""
+    method = method or climate_change_methods()[0]
+    names = [bw.get_activity(activity_key(demand))['name'] for demand in demands]
+    d = len(parameters)
+
+    points, orders, delta = morris_design(d, trajectories, levels, seed)
+    y = evaluate(parameters, demands, method, points.reshape(-1, d), workers=workers).reshape(trajectories, d + 1, -1)
+
+    effects = np.empty((trajectories, d, y.shape[-1]))
+    effects[np.arange(trajectories)[:, None], orders] = np.diff(y, axis=1) / delta
+
+    return pd.DataFrame({
+        "demand": np.repeat(names, d),
+        "parameter": np.tile([p["name"] for p in parameters], len(names)),
+        "mu": effects.mean(axis=0).T.ravel(),
+        "mu_star": np.abs(effects).mean(axis=0).T.ravel(),
+        "sigma": effects.std(axis=0, ddof=1).T.ravel(),
+    })
+
+def owm_sobol(n_samples=1024, spread=0.2, seed=1016, workers=None):
+    """Method to run the Sobol analysis of transport, methane and substitution credits of the notebook facilities"""
+    acts = [find_activity("OWM Facilities", name, exact=False) for name in GSA_FACILITIES]
+    acts = [act for act in acts if act is not None]
+
+    return sobol_indices(exchange_parameters(acts, spread), acts, n_samples=n_samples, seed=seed, workers=workers)
@@ -1,22 +1,20 @@
 import brightway2 as bw
 import bw2io as bi
 
-SCENARIO_DB_LOCATION = "data/brightway/Scenarios Database.xlsx"
+import scenariostore
+from dbsync import refresh_pedigree, workbook_hash
+from lcaengine import climate_change_methods
+from methodregistry import EF31, impact_methods
+from pedigree import PEDIGREE_LOCATION, apply_pedigree
+from snapshot import warm_start
+
 OWM_DB_LOCATION = "data/brightway/Canada OWM Facilities Database.xlsx"
 OWM_DATABASE = "OWM Facilities"
 
-def refresh_scenarios(database_name):
-    imp = bw.ExcelImporter(SCENARIO_DB_LOCATION) 
-    imp.apply_strategies()
-    imp.match_database(database_name, fields=('name', 'unit', 'location', 'reference product')) 
-    imp.match_database(fields=('name', 'unit', 'location'))
-    imp.statistics()
-    imp.write_excel(only_unlinked=True)
-    imp.write_database()
+PROJECT_NAME = "testproject7"
 
 def initialization():
     """Method to initialize brightway database when first running the app"""
-    PROJECT_NAME = "testproject7"
     DATABASE_NAME = "ecoinvent-3.9.1-cutoff"
 
     bw.projects.set_current(PROJECT_NAME)
@@ -33,6 +31,13 @@ def initialization():
         imp.match_database(fields=('name', 'unit', 'location'))
         imp.statistics()
         imp.write_excel(only_unlinked=True)
+        apply_pedigree(imp.data)
         imp.write_database()
+        bw.databases[OWM_DATABASE]["pedigree_hash"] = workbook_hash(PEDIGREE_LOCATION)
+        bw.databases.flush()
+    else:
+        # Projects imported before the pedigree workbook, or before it last changed
+        refresh_pedigree(OWM_DATABASE)
     
-    refresh_scenarios(OWM_DATABASE)
\ No newline at end of file
+    scenariostore.get_scenario_store().sync_database(OWM_DATABASE)
+    warm_start(climate_change_methods() + impact_methods(EF31))
\ No newline at end of file
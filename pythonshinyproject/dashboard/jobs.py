@@ -0,0 +1,150 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import brightway2 as bw
+from shiny import reactive
+
+# Number of LCA worker processes, 0 runs the jobs on a background thread of the app process instead
+LCA_WORKERS = int(os.environ.get("LCA_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor = None
+
+def _init_worker(project_name):
+    """Method run once in every worker process, opens the project and loads the engine from the snapshot"""
+    from snapshot import load_background
+
+    bw.projects.set_current(project_name)
+    load_background()
+
+def _run_job(func, *args):
+    # Databases may have been written by the app process since the worker started
+    bw.databases.load()
+    return func(*args)
+
+def get_executor():
+    """Method to get the shared executor, a warm process pool unless LCA_WORKERS is 0"""
+    global _executor
+
+    if _executor is None:
+        if LCA_WORKERS > 0:
+            # Spawned rather than forked, the solver libraries do not survive a fork
+            _executor = ProcessPoolExecutor(
+                max_workers=LCA_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(bw.projects.current,),
+            )
+        else:
+            # A single worker, brightway and the factorized solver are not shared between threads
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lca")
+
+    return _executor
+
+async def run_in_background(func, *args):
+    """Method to run a blocking function in the LCA workers, cancelling the await drops the job if it has not started"""
+    return await asyncio.wrap_future(get_executor().submit(_run_job, func, *args))
+
+def debounce(delay_secs):
+    """Decorator to get a reactive calc that only updates once its inputs have been quiet for delay_secs
+
+    A single timer is scheduled for the remaining delay, instead of polling until the delay has passed.
+    """
+    def wrapper(f):
+        when = reactive.Value(None)
+        trigger = reactive.Value(0)
+
+        @reactive.Calc
+        def cached():
+            return f()
+
+        @reactive.Effect(priority=102)
+        def primer():
+            try:
+                cached()
+            except Exception:
+                pass
+            finally:
+                when.set(time.time() + delay_secs)
+
+        @reactive.Effect(priority=101)
+        def timer():
+            deadline = when()
+            if deadline is None:
+                return
+
+            time_left = deadline - time.time()
+            if time_left <= 0:
+                with reactive.isolate():
+                    when.set(None)
+                    trigger.set(trigger() + 1)
+            else:
+                reactive.invalidate_later(time_left)
+
+        @reactive.Calc
+        @reactive.event(trigger, ignore_none=False)
+        def debounced():
+            return cached()
+
+        return debounced
+    return wrapper
+
+class LatestJob:
+    """Background job of a session that runs one call at a time and keeps only the newest pending call
+
+    Must be created inside a server function. Calls submitted while a job is running replace each
+    other, so a burst of selections costs at most the running job plus the last selection.
+    """
+
+    def __init__(self, func):
+        self._pending = None
+        self._running = None
+        self._last = None
+
+        @reactive.extended_task
+        async def task(*args):
+            return await run_in_background(func, *args)
+
+        self.task = task
+
+        @reactive.Effect
+        def resubmit():
+            status = self.task.status()
+            if status != "running" and self._pending is not None:
+                self._running, self._pending = self._pending, None
+                self.task.invoke(*self._running)
+            elif status == "error":
+                # A failed call is not a result, submitting the same arguments again retries it
+                self._last = self._running = None
+
+    def submit(self, *args):
+        if args == self._last:
+            return
+        self._last = args
+
+        with reactive.isolate():
+            running = self.task.status() == "running"
+
+        if running:
+            self._pending = None if args == self._running else args
+        else:
+            self._running = args
+            self.task.invoke(*args)
+
+    def cancel(self):
+        """Method to cancel the running call and drop the pending one
+
+        The session stops waiting for the running call, but a call already started in a worker process
+        runs to the end and its result is thrown away; only a call still queued in the pool is dropped.
+        """
+        self._pending = None
+        self._last = None
+        self.task.cancel()
+
+    def status(self):
+        return self.task.status()
+
+    def result(self):
+        return self.task.result()
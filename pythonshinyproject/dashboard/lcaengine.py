@@ -0,0 +1,300 @@
+import brightway2 as bw
+import numpy as np
+from scipy import sparse
+
+try:
+    from pypardiso import factorized
+except ImportError:
+    from scipy.sparse.linalg import factorized
+
+import scorecache
+from dbsync import SCENARIOS_DATABASE
+from methodregistry import impact_methods
+
+FOREGROUND_DATABASES = ("Scenarios", "OWM Facilities")
+
+# Sign of an exchange amount in the technosphere matrix, technosphere inputs are negative
+TECHNOSPHERE_SIGNS = {"production": 1, "substitution": 1, "technosphere": -1}
+
+_engines = {}
+
+def database_version():
+    """Method to get a key identifying the current project and the state of all of its databases
+
+    The last item is the state of the Scenarios database and everything before it the background, so an
+    engine whose key only differs in the last item can be updated instead of rebuilt.
+    """
+    background = tuple(
+        (name, bw.databases[name].get("modified")) for name in sorted(bw.databases) if name != SCENARIOS_DATABASE
+    )
+    scenarios = bw.databases[SCENARIOS_DATABASE].get("modified") if SCENARIOS_DATABASE in bw.databases else None
+    return (bw.projects.current,) + background + ((SCENARIOS_DATABASE, scenarios),)
+
+def same_background(version, other):
+    """Method to tell whether two database versions only differ in the state of the Scenarios database"""
+    return version is not None and other is not None and tuple(version[:-1]) == tuple(other[:-1])
+
+def climate_change_methods():
+    """Method to get the IPCC 2021 GWP100 climate change method used throughout the dashboard"""
+    return impact_methods("IPCC 2021")
+
+def activity_key(activity):
+    """Method to get the (database, code) key of an activity, a key is returned as is"""
+    if hasattr(activity, "key"):
+        return activity.key
+    return tuple(activity)
+
+def _solve_columns(solver, array):
+    try:
+        supply = solver(array)
+    except Exception:
+        # Some solvers only accept a single right-hand side
+        supply = np.column_stack([solver(column) for column in array.T])
+    return np.asarray(supply).reshape(array.shape)
+
+class LCAEngine:
+    """Technosphere matrix built and factorized once, every demand vector is then a single back-substitution
+
+    The last leaves products are scenarios: nothing else uses them and they only produce themselves, so
+    the matrix is block triangular. Only the background block is factorized, the leaves are solved around
+    it, and engines that differ only in their leaves share the same background factorization.
+    """
+
+    def __init__(self, technosphere_matrix, biosphere_matrix, activity_dict, product_dict, biosphere_dict, version, characterization=None, leaves=0, background=None):
+        self.technosphere_matrix = technosphere_matrix
+        self.biosphere_matrix = biosphere_matrix
+        self.activity_dict = activity_dict
+        self.product_dict = product_dict
+        self.biosphere_dict = biosphere_dict
+        self.version = version
+        self.characterization = dict(characterization or {})
+        self._characterization_matrices = {}
+        self._unit_score_vectors = {}
+
+        self.leaves = leaves
+        # (scenario, input) pairs of the scenario exchanges that could not be placed in the matrices
+        self.left_out = []
+        self.n_background = technosphere_matrix.shape[0] - leaves
+        n = self.n_background
+        # A CSC matrix, such as a loaded snapshot, is used as is
+        technosphere = technosphere_matrix.tocsc()
+        self._coupling = technosphere[:n, n:]
+        self._leaf_production = technosphere.diagonal()[n:]
+
+        # Factorizations of the background block and its transpose, the transpose only when first needed
+        if background is None:
+            # The background columns have no leaf rows, so the block is the first columns of the arrays, not a copy
+            end = technosphere.indptr[n]
+            block = sparse.csc_matrix((technosphere.data[:end], technosphere.indices[:end], technosphere.indptr[:n + 1]), shape=(n, n), copy=False)
+            background = {"solver": factorized(block), "transposed": None}
+        self._background = background
+
+    @classmethod
+    def from_project(cls, method, databases=FOREGROUND_DATABASES):
+        """Method to build the engine from the brightway databases of the current project, scenarios as leaves"""
+        version = database_version()
+
+        # One activity per background foreground database is enough, brightway pulls in every dependent database
+        demand = {}
+        for name in databases:
+            if name in bw.databases and name != SCENARIOS_DATABASE:
+                for act in bw.Database(name):
+                    demand[act] = 1
+                    break
+
+        lca = bw.LCA(demand, method)
+        lca.lci()
+        lca.lcia()
+
+        return cls(
+            lca.technosphere_matrix,
+            lca.biosphere_matrix,
+            dict(lca.activity_dict),
+            dict(lca.product_dict),
+            dict(lca.biosphere_dict),
+            version,
+            {method: lca.characterization_matrix.diagonal().copy()},
+        ).with_scenarios(version)
+
+    def with_scenarios(self, version):
+        """Method to get an engine with the same background and the current activities of the Scenarios database as leaves
+
+        Only the scenario columns are read from brightway, the background factorization is reused as is.
+        Inputs that are not background products, such as another scenario, are listed in left_out.
+        """
+        n, n_flows = self.n_background, len(self.biosphere_dict)
+        products = {key: index for key, index in self.product_dict.items() if index < n}
+        activities = {key: index for key, index in self.activity_dict.items() if index < n}
+
+        acts = list(bw.Database(SCENARIOS_DATABASE)) if SCENARIOS_DATABASE in bw.databases else []
+        for i, act in enumerate(acts):
+            products[act.key] = activities[act.key] = n + i
+
+        tech_rows, tech_cols, tech_data = [], [], []
+        bio_rows, bio_cols, bio_data = [], [], []
+        production = np.ones(len(acts))
+        left_out = []
+
+        for i, act in enumerate(acts):
+            for exc in act.exchanges():
+                key = tuple(exc["input"])
+                if exc["type"] == "production" or (key == act.key and exc["type"] != "biosphere"):
+                    production[i] = exc["amount"]
+                elif exc["type"] == "biosphere" and key in self.biosphere_dict:
+                    bio_rows.append(self.biosphere_dict[key])
+                    bio_cols.append(i)
+                    bio_data.append(exc["amount"])
+                elif key in products and products[key] < n:
+                    tech_rows.append(products[key])
+                    tech_cols.append(i)
+                    tech_data.append(exc["amount"] * TECHNOSPHERE_SIGNS.get(exc["type"], 1))
+                else:
+                    left_out.append((act.key, key))
+
+        technosphere = self.technosphere_matrix.tocsc()[:n, :n]
+        if acts:
+            technosphere = sparse.bmat([
+                [technosphere, sparse.csc_matrix((tech_data, (tech_rows, tech_cols)), shape=(n, len(acts)))],
+                [None, sparse.diags(production)],
+            ])
+        technosphere = technosphere.tocsr()
+        biosphere = sparse.hstack([
+            self.biosphere_matrix.tocsc()[:, :n],
+            sparse.csc_matrix((bio_data, (bio_rows, bio_cols)), shape=(n_flows, len(acts))),
+        ], format="csr")
+
+        engine = LCAEngine(
+            technosphere, biosphere, activities, products, dict(self.biosphere_dict), version,
+            self.characterization, leaves=len(acts), background=self._background,
+        )
+        engine.left_out = left_out
+        return engine
+
+    def demand_array(self, demand):
+        """Method to turn a {activity: amount} dictionary into a demand vector aligned with the technosphere"""
+        array = np.zeros(len(self.product_dict))
+        for activity, amount in demand.items():
+            array[self.product_dict[activity_key(activity)]] += amount
+        return array
+
+    def solve(self, demand):
+        """Method to get the supply vector of a demand using the stored factorization"""
+        return self.solver(self.demand_array(demand))
+
+    def solve_many(self, demands):
+        """Method to get the supply vectors of N demands as the columns of one array, solved as a multi right-hand-side system"""
+        return self.solve_array(np.column_stack([self.demand_array(demand) for demand in demands]))
+
+    def solver(self, array):
+        """Method to solve the technosphere for a vector or the columns of an array, the leaves around the background"""
+        array = np.asarray(array, dtype=float)
+        n = self.n_background
+        if not self.leaves:
+            return _solve_columns(self._background["solver"], array)
+
+        leaves = array[n:] / (self._leaf_production[:, None] if array.ndim == 2 else self._leaf_production)
+        background = _solve_columns(self._background["solver"], array[:n] - self._coupling @ leaves)
+        return np.concatenate([background, leaves])
+
+    def solve_array(self, array):
+        """Method to solve the technosphere for the columns of a product x N array"""
+        return self.solver(array).reshape(array.shape)
+
+    def characterization_vector(self, method):
+        """Method to get the characterization factors of a method, aligned with the biosphere rows"""
+        if method not in self.characterization:
+            vector = np.zeros(len(self.biosphere_dict))
+            for row in bw.Method(method).load():
+                flow, cf = row[0], row[1]
+                if tuple(flow) in self.biosphere_dict:
+                    vector[self.biosphere_dict[tuple(flow)]] += cf["amount"] if isinstance(cf, dict) else cf
+            self.characterization[method] = vector
+        return self.characterization[method]
+
+    def characterization_matrix(self, methods):
+        """Method to get the sparse M x biosphere matrix of the characterization factors of M methods, built once per list of methods"""
+        methods = tuple(methods)
+        if methods not in self._characterization_matrices:
+            self._characterization_matrices[methods] = sparse.csr_matrix(
+                np.vstack([self.characterization_vector(method) for method in methods])
+            )
+        return self._characterization_matrices[methods]
+
+    def unit_score_vector(self, method):
+        """Method to get the scores of one unit of every product, from one solve of the transposed technosphere"""
+        if method not in self._unit_score_vectors:
+            n = self.n_background
+            if self._background["transposed"] is None:
+                self._background["transposed"] = factorized(self.technosphere_matrix.tocsc()[:n, :n].T.tocsc())
+            characterized = self.biosphere_matrix.T @ self.characterization_vector(method)
+
+            background = np.asarray(self._background["transposed"](characterized[:n])).ravel()
+            leaves = (characterized[n:] - self._coupling.T @ background) / self._leaf_production
+            self._unit_score_vectors[method] = np.concatenate([background, leaves])
+        return self._unit_score_vectors[method]
+
+    def score(self, demand, method):
+        """Method to get the LCA score of a demand, same as bw.LCA(demand, method).score"""
+        inventory = self.biosphere_matrix * self.solve(demand)
+        return float(self.characterization_vector(method) @ inventory)
+
+    def scores(self, demands, methods):
+        """Method to get the N x M array of scores of N demands for M methods in one matrix call"""
+        if not demands:
+            return np.zeros((0, len(methods)))
+
+        inventory = self.biosphere_matrix * self.solve_many(demands)
+        return (self.characterization_matrix(methods) @ inventory).T
+
+def get_engine(method):
+    """Method to get the shared engine, rebuilt only when the project or one of its databases changed"""
+    version = database_version()
+    engine = _engines.get(version)
+
+    if engine is None:
+        previous = current_engine()
+        # Only the scenarios changed, e.g. one was saved in the dashboard, the background is kept
+        if previous is not None and same_background(previous.version, version):
+            engine = previous.with_scenarios(version)
+        else:
+            engine = LCAEngine.from_project(method)
+        _engines.clear()
+        _engines[version] = engine
+
+    return engine
+
+def current_engine():
+    """Method to get the shared engine as it is, None if none was built or loaded yet"""
+    return next(iter(_engines.values()), None)
+
+def set_engine(engine):
+    """Method to register an engine built elsewhere, e.g. loaded from a snapshot, as the shared engine"""
+    _engines.clear()
+    _engines[engine.version] = engine
+
+def lca_scores(demands, methods):
+    """Method to get the N x M array of scores of N {activity: amount} demands for M methods"""
+    methods = list(methods)
+    return get_engine(methods[0]).scores(list(demands), methods)
+
+def unit_scores(activities, methods):
+    """Method to get the N x M array of scores of one unit of N activities, served from the on-disk cache when possible"""
+    methods = list(methods)
+    keys = [activity_key(activity) for activity in activities]
+
+    found = scorecache.lookup(keys, methods)
+    missing = list(dict.fromkeys(key for key in keys for method in methods if (key, method) not in found))
+
+    if missing:
+        computed = lca_scores([{key: 1} for key in missing], methods)
+        new_scores = {(key, method): computed[i, j] for i, key in enumerate(missing) for j, method in enumerate(methods)}
+        scorecache.store(new_scores)
+        found.update(new_scores)
+
+    return np.array([[found[(key, method)] for method in methods] for key in keys]).reshape(len(keys), len(methods))
+
+def get_lca_results(list_acts, mymethod):
+    """Method to get {activity name: score} for a list of activities, batch version of the notebook getLCAresults"""
+    acts = [bw.get_activity(activity_key(a)) for a in list_acts]
+    results = unit_scores(acts, [mymethod])[:, 0]
+    return dict(zip([act['name'] for act in acts], results))
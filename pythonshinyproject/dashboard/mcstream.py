@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILES = (0.025, 0.05, 0.25, 0.5, 0.75, 0.95, 0.975)
+
+# Levels of the grid the quantiles are kept at
+SKETCH_RESOLUTION = 1001
+
+# Most points kept in the convergence trace, every other one is dropped when it is full
+HISTORY_POINTS = 64
+
+class QuantileSketch:
+    """Mergeable estimate of several quantiles of several columns, kept as the values at a fixed grid of levels
+
+    Every chunk is summarised by its exact quantiles at the middles of resolution equal slices of rank, in one
+    vectorized call, and merged into the running grid by weighting each point with the number of observations
+    it stands for. The extremes are kept exactly. Memory does not grow with the number of observations.
+    """
+
+    def __init__(self, n_columns, quantiles=DEFAULT_QUANTILES, resolution=SKETCH_RESOLUTION):
+        self.p = np.asarray(quantiles, dtype=float)
+        self.levels = (np.arange(resolution) + 0.5) / resolution
+        self.points = np.full((resolution, n_columns), np.nan)
+        self.minimum = np.full(n_columns, np.inf)
+        self.maximum = np.full(n_columns, -np.inf)
+        self.count = 0
+
+    def update(self, samples):
+        """Method to add an observations x columns array"""
+        samples = np.asarray(samples, dtype=float)
+        n = len(samples)
+        if n == 0:
+            return
+
+        self.minimum = np.minimum(self.minimum, samples.min(axis=0))
+        self.maximum = np.maximum(self.maximum, samples.max(axis=0))
+        # Hazen quantiles put the i-th of n sorted values at rank (i + 0.5) / n, as the merge does
+        chunk = np.quantile(samples, self.levels, axis=0, method="hazen")
+        if self.count == 0:
+            self.points, self.count = chunk, n
+            return
+
+        resolution = len(self.levels)
+        values = np.vstack([self.points, chunk])
+        weights = np.concatenate([np.full(resolution, self.count / resolution), np.full(resolution, n / resolution)])
+
+        order = np.argsort(values, axis=0, kind="stable")
+        values = np.take_along_axis(values, order, axis=0)
+        weights = weights[order]
+        # Rank of every point as a fraction of all the observations, at the middle of its slice
+        positions = (np.cumsum(weights, axis=0) - weights / 2) / (self.count + n)
+
+        self.points = np.column_stack([np.interp(self.levels, positions[:, c], values[:, c]) for c in range(values.shape[1])])
+        self.count += n
+
+    def values(self):
+        """Method to get the quantiles x columns array of estimates"""
+        if self.count == 0:
+            return np.full((len(self.p), self.points.shape[1]), np.nan)
+
+        levels = np.concatenate([[0.0], self.levels, [1.0]])
+        points = np.vstack([self.minimum, self.points, self.maximum])
+        return np.column_stack([np.interp(self.p, levels, points[:, c]) for c in range(points.shape[1])])
+
+class StreamingResults:
+    """Sink for Monte Carlo results that keeps running statistics per column instead of every iteration
+
+    Mean and variance are merged chunk by chunk, and so are the quantiles, through a QuantileSketch. The convergence trace
+    keeps at most HISTORY_POINTS chunks, evenly spaced, however many chunks come in. If spill_path is given,
+    the raw samples are also written there as one .npy file per chunk, to be read back with load_spill.
+    The statistics can be read from another thread while results are still coming in.
+    """
+
+    def __init__(self, columns, quantiles=DEFAULT_QUANTILES, spill_path=None):
+        self.columns = list(columns)
+        self.quantiles = tuple(quantiles)
+        self.count = 0
+        self.mean = np.zeros(len(self.columns))
+        self.m2 = np.zeros(len(self.columns))
+        self.sketch = QuantileSketch(len(self.columns), quantiles)
+        self.history = []
+        self._stride = 1
+        self.spill_path = spill_path
+        self._chunks = 0
+        self._lock = threading.Lock()
+
+        if spill_path is not None:
+            os.makedirs(spill_path, exist_ok=True)
+            with open(os.path.join(spill_path, "columns.json"), "w") as f:
+                json.dump(self.columns, f)
+
+    def update(self, samples):
+        """Method to add an iterations x columns array of results"""
+        samples = np.asarray(samples, dtype=float)
+        if samples.size == 0:
+            return
+
+        if self.spill_path is not None:
+            np.save(os.path.join(self.spill_path, f"chunk_{self._chunks:06d}.npy"), samples)
+        self._chunks += 1
+
+        with self._lock:
+            # Chan et al. merge of the chunk moments into the running moments
+            n = len(samples)
+            chunk_mean = samples.mean(axis=0)
+            delta = chunk_mean - self.mean
+            total = self.count + n
+            self.m2 += ((samples - chunk_mean) ** 2).sum(axis=0) + delta ** 2 * self.count * n / total
+            self.mean += delta * n / total
+            self.count = total
+
+            self.sketch.update(samples)
+
+            if self._chunks % self._stride == 0:
+                self.history.append((self.count, self.mean.copy(), self.std()))
+                if len(self.history) > HISTORY_POINTS:
+                    # Keep the chunks that are multiples of the doubled stride
+                    self.history = self.history[1::2]
+                    self._stride *= 2
+
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.full(len(self.columns), np.nan)
+
+    def summary(self):
+        """Method to get the mean, standard deviation and quantiles per column, laid out like montecarlo.quantile_table"""
+        with self._lock:
+            table = pd.DataFrame(self.sketch.values().T, index=self.columns, columns=[f"q{q:g}" for q in self.quantiles])
+            table.insert(0, "std", self.std())
+            table.insert(0, "mean", self.mean)
+        return table
+
+    def convergence(self):
+        """Method to get the running mean and its standard error per column along the trace, in long format"""
+        with self._lock:
+            history = list(self.history)
+            if self.count and (not history or history[-1][0] != self.count):
+                history.append((self.count, self.mean.copy(), self.std()))
+
+        frames = [
+            pd.DataFrame({"iterations": count, "column": self.columns, "mean": mean, "standard error": std / np.sqrt(count)})
+            for count, mean, std in history
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["iterations", "column", "mean", "standard error"])
+
+def load_spill(path, columns=None):
+    """Method to read back the raw samples spilled by a StreamingResults, optionally only some columns"""
+    with open(os.path.join(path, "columns.json")) as f:
+        names = json.load(f)
+
+    selected = [names.index(column) for column in columns] if columns is not None else list(range(len(names)))
+    chunks = sorted(file for file in os.listdir(path) if file.startswith("chunk_") and file.endswith(".npy"))
+    data = [np.load(os.path.join(path, file), mmap_mode="r")[:, selected] for file in chunks]
+
+    return pd.DataFrame(np.vstack(data) if data else np.zeros((0, len(selected))), columns=[names[i] for i in selected])
@@ -0,0 +1,62 @@
+import brightway2 as bw
+
+EF31 = "EF v3.1"
+
+# Impact categories of the EF v3.1 bundle, the second field of its method tuples, in the order they are shown
+EF31_CATEGORIES = [
+    "climate change",
+    "ozone depletion",
+    "acidification",
+    "eutrophication: freshwater",
+    "eutrophication: marine",
+    "eutrophication: terrestrial",
+    "ecotoxicity: freshwater",
+    "human toxicity: carcinogenic",
+    "human toxicity: non-carcinogenic",
+    "ionising radiation: human health",
+    "particulate matter formation",
+    "photochemical oxidant formation: human health",
+    "land use",
+    "water use",
+    "energy resources: non-renewable",
+    "material resources: metals/minerals",
+]
+
+_resolved = {}
+
+def _ipcc_2021():
+    return [m for m in bw.methods if 'IPCC 2021' in str(m) and not 'LT' in str(m) and 'GWP100' in str(m) and 'climate change' in str(m) and not 'biogenic' in str(m) and not 'fossil' in str(m) and not 'land use' in str(m) and not 'SLCFs' in str(m)]
+
+def _ef_v31():
+    # The first field is matched exactly, which leaves out the "EF v3.1 EN15804" and "EF v3.1 no LT" variants
+    methods = {}
+    for m in bw.methods:
+        if m[0] == EF31 and m[1] in EF31_CATEGORIES:
+            methods.setdefault(m[1], m)
+    return [methods[category] for category in EF31_CATEGORIES if category in methods]
+
+# Named impact sets, each resolved to a list of method tuples of the current project
+IMPACT_SETS = {
+    "IPCC 2021": _ipcc_2021,
+    EF31: _ef_v31,
+}
+
+def impact_methods(name):
+    """Method to get the methods of a named impact set, resolved once per project and list of installed methods"""
+    key = (name, bw.projects.current, len(bw.methods))
+
+    if key not in _resolved:
+        _resolved[key] = IMPACT_SETS[name]()
+
+    return list(_resolved[key])
+
+def method_label(method):
+    """Method to get the short label of a method shown in the dashboard"""
+    if 'IPCC 2021' in str(method):
+        return 'IPCC 2021'
+    if method[0] == EF31:
+        return method[1]
+    return str(method)
+
+def method_unit(method):
+    return bw.methods.get(method, {}).get("unit", "")
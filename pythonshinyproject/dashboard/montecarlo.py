@@ -0,0 +1,150 @@
+import brightway2 as bw
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from scipy.sparse.linalg import LinearOperator, gmres
+from stats_arrays import MCRandomNumberGenerator
+
+from lcaengine import activity_key, climate_change_methods, factorized
+from mcstream import DEFAULT_QUANTILES, StreamingResults
+from scenarioindex import find_activity
+
+# Facilities and scenarios compared with Monte Carlo in the OWM LCA notebook
+OWM_FACILITIES = [
+    "Composter_terrebonne",
+    "Composter_casselman",
+    "Closed_composter_city_final",
+    "AD_city",
+    "Landfill_terrebonne_HOC",
+    "Landfill_lachute_HOC",
+]
+OWM_SCENARIOS = ["S1", "S2", "S3"]
+
+_models = {}
+
+class MonteCarloModel:
+    """Uncertain matrices of a set of activities, every iteration is solved starting from the deterministic factorization"""
+
+    def __init__(self, keys, method):
+        self.lca = bw.LCA({key: 1 for key in keys}, method)
+        self.lca.lci()
+        self.lca.lcia()
+
+        self.demands = np.zeros((len(self.lca.product_dict), len(keys)))
+        for j, key in enumerate(keys):
+            self.demands[self.lca.product_dict[key], j] = 1
+
+        base_solver = factorized(self.lca.technosphere_matrix.tocsc())
+        self.base_supply = np.column_stack([base_solver(column) for column in self.demands.T])
+        self.preconditioner = LinearOperator(self.lca.technosphere_matrix.shape, matvec=base_solver)
+
+    def solve(self, technosphere_matrix):
+        """Method to solve every demand for a sampled technosphere, falling back to a new factorization if GMRES stalls"""
+        supply = np.empty_like(self.demands)
+        unsolved = []
+
+        for j in range(self.demands.shape[1]):
+            x, info = gmres(technosphere_matrix, self.demands[:, j], x0=self.base_supply[:, j], M=self.preconditioner, restart=20, maxiter=5)
+            if info == 0:
+                supply[:, j] = x
+            else:
+                unsolved.append(j)
+
+        if unsolved:
+            solver = factorized(technosphere_matrix.tocsc())
+            for j in unsolved:
+                supply[:, j] = solver(self.demands[:, j])
+
+        return supply
+
+    def sample(self, iterations, seed_sequence):
+        """Method to get an iterations x activities array of scores, reproducible for a given seed sequence"""
+        tech_seed, bio_seed, cf_seed = (int(s) for s in seed_sequence.generate_state(3))
+        tech_rng = MCRandomNumberGenerator(self.lca.tech_params, seed=tech_seed)
+        bio_rng = MCRandomNumberGenerator(self.lca.bio_params, seed=bio_seed)
+        cf_rng = MCRandomNumberGenerator(self.lca.cf_params, seed=cf_seed)
+
+        results = np.empty((iterations, self.demands.shape[1]))
+
+        for i in range(iterations):
+            self.lca.rebuild_technosphere_matrix(tech_rng.next())
+            self.lca.rebuild_biosphere_matrix(bio_rng.next())
+            self.lca.rebuild_characterization_matrix(cf_rng.next())
+
+            supply = self.solve(self.lca.technosphere_matrix)
+            results[i] = np.asarray((self.lca.characterization_matrix * (self.lca.biosphere_matrix * supply)).sum(axis=0)).ravel()
+
+        return results
+
+def _run_chunk(project_name, keys, method, iterations, seed_sequence):
+    """Method run in the worker processes, the model is built once per process and reused for every chunk"""
+    if bw.projects.current != project_name:
+        bw.projects.set_current(project_name)
+
+    model_key = (project_name, tuple(keys), tuple(method))
+    if model_key not in _models:
+        _models.clear()
+        _models[model_key] = MonteCarloModel(keys, method)
+
+    return _models[model_key].sample(iterations, seed_sequence)
+
+def monte_carlo(activities, method, iterations=10000, seed=1016, workers=None, chunk_size=250, sink=None):
+    """Method to get an iterations x activities DataFrame of Monte Carlo scores, like the Activity Browser export
+
+    Iterations are split in chunks of chunk_size, each with its own stream spawned from seed, so results
+    only depend on seed and chunk_size and not on the number of workers. workers=0 runs in this process.
+    If sink is given (see streaming_monte_carlo), chunks are passed to sink.update in order as they finish
+    instead of being kept, and the sink is returned.
+    """
+    keys = [activity_key(activity) for activity in activities]
+    names = [bw.get_activity(key)['name'] for key in keys]
+
+    chunks = [chunk_size] * (iterations // chunk_size)
+    if iterations % chunk_size:
+        chunks.append(iterations % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    args = (repeat(bw.projects.current), repeat(keys), repeat(method), chunks, seeds)
+
+    def collect(results):
+        if sink is None:
+            return list(results)
+        for result in results:
+            sink.update(result)
+
+    if workers == 0:
+        results = collect(map(_run_chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = collect(executor.map(_run_chunk, *args))
+
+    if sink is not None:
+        return sink
+    return pd.DataFrame(np.vstack(results), columns=names)
+
+def streaming_monte_carlo(activities, method, iterations=10000, seed=1016, workers=None, chunk_size=250, quantiles=DEFAULT_QUANTILES, spill_path=None):
+    """Method to run a Monte Carlo in constant memory, returns a StreamingResults with the running statistics per activity"""
+    names = [bw.get_activity(activity_key(activity))['name'] for activity in activities]
+    sink = StreamingResults(names, quantiles=quantiles, spill_path=spill_path)
+    return monte_carlo(activities, method, iterations=iterations, seed=seed, workers=workers, chunk_size=chunk_size, sink=sink)
+
+def quantile_table(results, quantiles=DEFAULT_QUANTILES):
+    """Method to summarize Monte Carlo results per activity: mean, standard deviation and quantiles"""
+    table = results.quantile(list(quantiles)).T
+    table.columns = [f"q{q:g}" for q in quantiles]
+    table.insert(0, "std", results.std())
+    table.insert(0, "mean", results.mean())
+    return table
+
+def owm_monte_carlo(iterations=10000, seed=1016, workers=None):
+    """Method to run the notebook's Monte Carlo comparison of the six facilities and the S1, S2 and S3 scenarios in one call"""
+    acts = [find_activity("OWM Facilities", name, exact=False) for name in OWM_FACILITIES]
+    acts += [find_activity("Scenarios", name) for name in OWM_SCENARIOS]
+    acts = [act for act in acts if act is not None]
+
+    results = monte_carlo(acts, climate_change_methods()[0], iterations=iterations, seed=seed, workers=workers)
+    return results, quantile_table(results)
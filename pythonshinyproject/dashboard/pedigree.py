@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+PEDIGREE_LOCATION = "data/brightway/Data Quality Pedigree Matrix.xlsx"
+
+# Pedigree indicators in the order of the workbook columns, with the brightway names of the exchange "pedigree" dict
+INDICATORS = {
+    "Reliability": "reliability",
+    "Completeness": "completeness",
+    "Temporal Correlation": "temporal correlation",
+    "Geographical Correlation": "geographical correlation",
+    "Further technological correlation": "further technological correlation",
+}
+
+# Variances of the underlying normal for the scores 1 to 5 of each indicator (ecoinvent v3 data quality guidelines)
+PEDIGREE_VARIANCES = np.array([
+    [0.0, 0.0006, 0.002, 0.008, 0.04],
+    [0.0, 0.0001, 0.0006, 0.002, 0.008],
+    [0.0, 0.0002, 0.002, 0.008, 0.04],
+    [0.0, 0.000025, 0.0001, 0.0006, 0.002],
+    [0.0, 0.0006, 0.008, 0.04, 0.12],
+])
+
+# Basic uncertainty variances, field emissions of methane and nitrous oxide are much less certain than energy demands
+BASIC_VARIANCES = {
+    "methane, non-fossil": 0.04,
+    "nitrous oxide": 0.04,
+}
+DEFAULT_BASIC_VARIANCE = 0.0006
+
+# Facility names of the pedigree workbook and the activities they describe in the OWM Facilities database
+FACILITY_ACTIVITIES = {
+    "Lachenaie Landfill": "Landfill_terrebonne",
+    "Saint Thomas Landfill": "Landfill_saint_thomas",
+    "Sainte Sophie Landfill": "Landfill_saint sophie",
+    "Cecile de Milton Landfill": "Landfill_cecile_de_milton",
+    "Lachute Landfill": "Landfill_lachute",
+    "Saint Nicephore Landfill": "Landfill_st-nicephore",
+    "Enclosed composter": "Closed-tunnel Composter",
+    "Casselman Composter": "Composter_casselman",
+    "Saint Thomas Composter": "Composter_saint thomas",
+    "Complexe Environmental Saint Michel Composter": "Composter_complexe enviro st Michel",
+    "Lachenaie Composter": "Composter_terrebonne",
+    "Anaerobic digestor": "AD",
+}
+
+# Flow names of the pedigree workbook that differ from the biosphere flow names
+FLOW_ALIASES = {
+    "nitrous oxide": "dinitrogen monoxide",
+}
+
+def read_pedigree(path=PEDIGREE_LOCATION):
+    """Method to read the pedigree workbook as one row per (activity, flow) with the five scores and the lognormal sigma"""
+    df = pd.read_excel(path)
+
+    pedigree = pd.DataFrame({
+        "activity": df["Facility name"].map(FACILITY_ACTIVITIES).fillna(df["Facility name"]),
+        "flow": df["Flow"].str.strip().str.lower().replace(FLOW_ALIASES),
+    })
+
+    # Cells are written as "4) Qualified estimate", the score is the leading digit
+    scores = np.column_stack([
+        df[column].astype(str).str.extract(r"^\s*(\d)", expand=False).astype(float).fillna(5).astype(int).clip(1, 5)
+        for column in INDICATORS
+    ])
+    for i, name in enumerate(INDICATORS.values()):
+        pedigree[name] = scores[:, i]
+
+    basic = df["Flow"].str.strip().str.lower().map(BASIC_VARIANCES).fillna(DEFAULT_BASIC_VARIANCE).to_numpy()
+    pedigree["sigma"] = np.sqrt(basic + PEDIGREE_VARIANCES[np.arange(len(INDICATORS)), scores - 1].sum(axis=1))
+
+    return pedigree.drop_duplicates(["activity", "flow"], keep="last")
+
+def apply_pedigree(data, path=PEDIGREE_LOCATION):
+    """Method to add lognormal uncertainty from the pedigree scores to the exchanges of imported datasets
+
+    Exchanges are matched on the activity name and on the exchange name or reference product. Exchanges that
+    already have an uncertainty distribution in the inventory are left as they are, those from an earlier
+    pedigree are replaced, or made certain again if the workbook no longer scores them. Returns the number
+    of exchanges updated.
+    """
+    pedigree = read_pedigree(path)
+
+    exchanges = [exc for ds in data for exc in ds.get("exchanges", [])]
+    if not exchanges:
+        return 0
+
+    for exc in exchanges:
+        if "pedigree" in exc:
+            for field in ("pedigree", "loc", "scale", "negative"):
+                exc.pop(field, None)
+            exc["uncertainty type"] = 0
+
+    table = pd.DataFrame({
+        "activity": [ds["name"] for ds in data for _ in ds.get("exchanges", [])],
+        "name": [str(exc.get("name", "")).strip().lower() for exc in exchanges],
+        "product": [str(exc.get("reference product", "")).strip().lower() for exc in exchanges],
+        "amount": [exc.get("amount", 0) for exc in exchanges],
+        "uncertain": [exc.get("uncertainty type", 0) not in (0, 1) for exc in exchanges],
+    })
+    table["position"] = np.arange(len(table))
+
+    by_name = table.merge(pedigree, left_on=["activity", "name"], right_on=["activity", "flow"])
+    by_product = table.merge(pedigree, left_on=["activity", "product"], right_on=["activity", "flow"])
+    matched = pd.concat([by_name, by_product]).drop_duplicates("position")
+    matched = matched[~matched["uncertain"] & (matched["amount"] != 0)]
+
+    amounts = matched["amount"].to_numpy(dtype=float)
+    locs = np.log(np.abs(amounts))
+    scores = matched[list(INDICATORS.values())].to_numpy()
+
+    for position, loc, sigma, negative, row_scores in zip(matched["position"], locs, matched["sigma"], amounts < 0, scores):
+        exchanges[position].update({
+            "uncertainty type": 2,
+            "loc": float(loc),
+            "scale": float(sigma),
+            "negative": bool(negative),
+            "pedigree": dict(zip(INDICATORS.values(), map(int, row_scores))),
+        })
+
+    return len(matched)
@@ -0,0 +1,158 @@
+import os
+from typing import List, TypedDict
+
+import numpy as np
+import pandas as pd
+
+from lcaengine import climate_change_methods, unit_scores
+from methodregistry import method_label
+from montecarlo import streaming_monte_carlo
+from scenarioindex import find_activity
+from scorecache import database_revision
+
+SCENARIO_DATABASE = "Scenarios"
+
+# Columns of a Monte Carlo summary used as the lower and upper bands
+BAND_COLUMNS = ("q0.025", "q0.975")
+
+COLUMNS = ["year", "territory", "scenario", "method", "tonnes", "score", "lower", "upper"]
+
+# Per tonne Monte Carlo summaries, {(scenario, method, revision of the Scenarios database): summary row}
+_bands = {}
+
+class Projection(TypedDict):
+    years: List[int]
+    territories: List[str]
+    scenarios: List[str]
+    methods: List[str]
+    tonnes: np.ndarray
+    scores: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+
+def scenario_unit_scores(scenarios, methods=None):
+    """Method to get the scenarios x methods table of the scores of one tonne managed by each scenario, NaN if not found"""
+    methods = list(methods or climate_change_methods())
+    acts = [find_activity(SCENARIO_DATABASE, name) for name in scenarios]
+
+    table = pd.DataFrame(np.nan, index=list(scenarios), columns=[method_label(m) for m in methods])
+    found = [i for i, act in enumerate(acts) if act is not None]
+    if found:
+        table.iloc[found] = unit_scores([acts[i] for i in found], methods)
+
+    return table
+
+def scenario_bands(scenarios, method=None, iterations=1000, seed=1016):
+    """Method to run a Monte Carlo of one tonne of each scenario, returns its summary indexed by scenario name"""
+    method = method or climate_change_methods()[0]
+    acts = [act for act in (find_activity(SCENARIO_DATABASE, name) for name in scenarios) if act is not None]
+    if not acts:
+        return None
+
+    # Already run in an LCA worker, so the chunks are not spread over another pool
+    return streaming_monte_carlo(acts, method, iterations=iterations, seed=seed, workers=0).summary()
+
+def record_bands(summary, method=None):
+    """Method to keep the per tonne Monte Carlo summary of scenarios, until the Scenarios database is written again"""
+    method = method or climate_change_methods()[0]
+    revision = database_revision(SCENARIO_DATABASE)
+    for name, row in summary.iterrows():
+        _bands[(name, method_label(method), revision)] = row
+
+def cached_bands(scenarios, method=None):
+    """Method to get the per tonne Monte Carlo summary of the scenarios that have one, for the current database"""
+    method = method or climate_change_methods()[0]
+    revision = database_revision(SCENARIO_DATABASE)
+    rows = {name: _bands[(name, method_label(method), revision)] for name in scenarios if (name, method_label(method), revision) in _bands}
+    return pd.DataFrame(rows).T if rows else None
+
+def tonnage(cube, materials, quantity="collected"):
+    """Method to get the years x territories tonnage of a set of materials, NaN where none of them has a row"""
+    m = [cube.material_index[material] for material in materials if material in cube.material_index]
+    present = cube.present[:, m, :]
+    values = np.where(present, cube.quantity(quantity)[:, m, :], 0.0).sum(axis=1)
+    return np.where(present.any(axis=1), values, np.nan)
+
+def project(cube, unit_table, materials, quantity="collected", bands=None, band_method=None):
+    """Method to get the carbon footprint of managing the tonnage of the materials under every scenario
+
+    One broadcast of the years x territories tonnage against the scenarios x methods per tonne scores
+    gives the years x territories x scenarios x methods footprint. bands is an optional Monte Carlo
+    summary of one tonne per scenario for the method labelled band_method, the first column by default;
+    the tonnage being fixed, its quantiles scale with it, and since every territory shares the same per
+    tonne draw they also add up across territories. The bounds have the shape of the footprint and are
+    NaN for the other methods and for the scenarios without bands.
+    """
+    tonnes = tonnage(cube, materials, quantity)
+    scores = tonnes[:, :, None, None] * unit_table.to_numpy(dtype=float)[None, None, :, :]
+
+    lower = np.full(scores.shape, np.nan)
+    upper = np.full(scores.shape, np.nan)
+    band_method = unit_table.columns[0] if band_method is None else band_method
+    if bands is not None and band_method in unit_table.columns:
+        m = unit_table.columns.get_loc(band_method)
+        per_tonne = bands.reindex(unit_table.index)
+        lower[:, :, :, m] = tonnes[:, :, None] * per_tonne[BAND_COLUMNS[0]].to_numpy(dtype=float)[None, None, :]
+        upper[:, :, :, m] = tonnes[:, :, None] * per_tonne[BAND_COLUMNS[1]].to_numpy(dtype=float)[None, None, :]
+
+    return {
+        "years": list(cube.years),
+        "territories": list(cube.territories),
+        "scenarios": list(unit_table.index),
+        "methods": list(unit_table.columns),
+        "tonnes": tonnes,
+        "scores": scores,
+        "lower": lower,
+        "upper": upper,
+    }
+
+def totals(projection, territories=None):
+    """Method to sum a projection over a set of territories, all of them by default, NaN only where none has data
+
+    Returns the years x scenarios x methods scores, lower and upper bounds.
+    """
+    if territories is None:
+        t = slice(None)
+    else:
+        t = [projection["territories"].index(name) for name in territories if name in projection["territories"]]
+
+    has_data = ~np.isnan(projection["tonnes"][:, t]).all(axis=1)
+
+    def total(values):
+        summed = np.nansum(values[:, t], axis=1)
+        return np.where(has_data.reshape((-1,) + (1,) * (summed.ndim - 1)), summed, np.nan)
+
+    lower, upper = total(projection["lower"]), total(projection["upper"])
+    # Scenarios and methods without a Monte Carlo summary stay without bounds
+    no_bands = np.isnan(projection["lower"]).all(axis=(0, 1))
+    lower[:, no_bands] = np.nan
+    upper[:, no_bands] = np.nan
+
+    return total(projection["scores"]), lower, upper
+
+def projection_table(projection):
+    """Method to get a projection as a long table, one row per year, territory, scenario and method"""
+    shape = projection["scores"].shape
+    years, territories, scenarios, methods = (np.array(axis, dtype=object) for axis in (
+        projection["years"], projection["territories"], projection["scenarios"], projection["methods"]
+    ))
+    y, t, s, m = np.indices(shape).reshape(4, -1)
+
+    return pd.DataFrame({
+        "year": years[y].astype(int),
+        "territory": territories[t],
+        "scenario": scenarios[s],
+        "method": methods[m],
+        "tonnes": projection["tonnes"][y, t],
+        "score": projection["scores"].reshape(-1),
+        "lower": projection["lower"].reshape(-1),
+        "upper": projection["upper"].reshape(-1),
+    }, columns=COLUMNS)
+
+def export_projection(table, path):
+    """Method to write a projection table to CSV or Parquet, chosen from the extension of the path"""
+    if os.path.splitext(path)[1].lower() == ".parquet":
+        table.to_parquet(path, index=False)
+    else:
+        table.to_csv(path, index=False)
+    return path
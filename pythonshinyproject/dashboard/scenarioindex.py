@@ -0,0 +1,123 @@
+import brightway2 as bw
+import functools
+import hashlib
+import json
+import os
+import threading
+from typing import List, TypedDict
+
+import numpy as np
+import pandas as pd
+
+_lock = threading.Lock()
+_activity_indexes = {}
+
+class Component(TypedDict):
+    name: str
+    percentage: float
+
+class Scenario(TypedDict):
+    name: str
+    row: int
+    components: List[Component]
+    id: str
+
+def file_stamp(path):
+    """Method to get the (modification time, size) of a file, None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def cached_on_file(path):
+    """Decorator to keep the result of a loader in memory until the file it reads changes on disk"""
+    def decorator(loader):
+        state = {}
+
+        @functools.wraps(loader)
+        def wrapper():
+            stamp = file_stamp(path)
+            with _lock:
+                if "value" not in state or state["stamp"] != stamp:
+                    state["value"] = loader()
+                    state["stamp"] = stamp
+                return state["value"]
+
+        return wrapper
+    return decorator
+
+def activity_index(database_name):
+    """Method to get the {name: key} index of a brightway database, rebuilt only when the database is written"""
+    modified = bw.databases[database_name].get("modified") if database_name in bw.databases else None
+    cached = _activity_indexes.get(database_name)
+
+    if cached is None or cached[0] != modified:
+        index = {}
+        for act in bw.Database(database_name):
+            index.setdefault(act['name'], act.key)
+        cached = (modified, index)
+        _activity_indexes[database_name] = cached
+
+    return cached[1]
+
+def find_activity(database_name, name, exact=True):
+    """Method to get the first activity of a database with the given name, or whose name contains it if exact is False"""
+    index = activity_index(database_name)
+
+    if exact:
+        key = index.get(name)
+    else:
+        key = next((key for act_name, key in index.items() if name in act_name), None)
+
+    return bw.get_activity(key) if key is not None else None
+
+def scenario_id(name, components):
+    """Method to get an id for a scenario from its content, the same wherever the scenario sits in the workbook"""
+    content = json.dumps([name, [[c['name'], round(float(c['percentage']), 9)] for c in components]])
+    return f"scenario_{hashlib.sha1(content.encode()).hexdigest()[:12]}"
+
+def with_ids(scenarios):
+    """Method to set the id of every scenario, identical scenarios numbered in order so every id is unique"""
+    seen = {}
+    for scenario in scenarios:
+        base = scenario_id(scenario['name'], scenario['components'])
+        seen[base] = seen.get(base, 0) + 1
+        scenario['id'] = base if seen[base] == 1 else f"{base}_{seen[base]}"
+    return scenarios
+
+def parse_scenarios(df):
+    """Method to parse the Activity/Exchanges blocks of an ExcelImporter sheet read with header=None"""
+    df = df.reindex(columns=range(max(4, df.shape[1])))
+    first = df[0].where(df[0].isna(), df[0].astype(str).str.strip())
+
+    activity_rows = np.flatnonzero((first == "Activity").to_numpy())
+    exchange_rows = np.flatnonzero((first == "Exchanges").to_numpy())
+    block_ends = np.append(activity_rows[1:], len(df))
+
+    # The first Exchanges row of each block, the name header and production rows follow it
+    first_exchange = np.append(exchange_rows, len(df))[np.searchsorted(exchange_rows, activity_rows)]
+    table_starts = np.minimum(first_exchange + 3, block_ends)
+
+    is_component = (first.notna() & df[2].notna()).to_numpy()
+    percentages = pd.to_numeric(df[3], errors="coerce").to_numpy()
+    names = first.to_numpy()
+
+    scenarios: List[Scenario] = []
+
+    for start, table_start, end in zip(activity_rows, table_starts, block_ends):
+        rows = table_start + np.flatnonzero(is_component[table_start:end])
+
+        if np.isnan(percentages[rows]).any():
+            print("Excel Format Not Appropriate")
+            rows = rows[~np.isnan(percentages[rows])]
+
+        name = str(df.iat[start, 1]).strip()
+
+        scenarios.append({
+            'name': name,
+            'row': int(start) + 1,
+            'components': [{'name': names[r], 'percentage': float(percentages[r])} for r in rows],
+        })
+
+    return with_ids(scenarios)
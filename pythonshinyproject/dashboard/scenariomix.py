@@ -0,0 +1,201 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linprog
+
+from lcaengine import climate_change_methods, unit_scores
+from methodregistry import method_label
+from scenarioindex import find_activity
+
+OWM_DATABASE = "OWM Facilities"
+
+# Facilities that do not count towards the organics diversion, matched on the start of the component name
+LANDFILL_PREFIX = "Landfill"
+
+def facility_unit_scores(components, methods=None, database=OWM_DATABASE):
+    """Method to get the components x methods table of the scores of one tonne treated by each facility
+
+    A scenario is a mix of facilities with amounts percentage / 100, so the score of any mix is the
+    allocation vector times this table. Components that are not found in the database get NaN scores.
+    """
+    methods = list(methods or climate_change_methods())
+    acts = [find_activity(database, name) or find_activity(database, name, exact=False) for name in components]
+
+    table = pd.DataFrame(np.nan, index=list(components), columns=[method_label(m) for m in methods])
+    found = [i for i, act in enumerate(acts) if act is not None]
+    if found:
+        table.iloc[found] = unit_scores([acts[i] for i in found], methods)
+
+    return table
+
+def mix_scores(allocations, scores):
+    """Method to get the N x M scores of N allocation vectors in percent, for a components x M table of unit scores"""
+    allocations = np.atleast_2d(np.asarray(allocations, dtype=float))
+    return (allocations / 100.0) @ np.asarray(scores, dtype=float)
+
+def unscored_components(table):
+    """Method to get the components of a unit score table missing the score of at least one method"""
+    return list(table.index[table.isna().any(axis=1)])
+
+def allocation_grid(n_components, step=5, total=100):
+    """Method to get every allocation of total in multiples of step over n_components, one per row
+
+    There are C(total / step + n_components - 1, n_components - 1) of them, so a fine step is only
+    practical for a handful of components.
+    """
+    units = int(round(total / step))
+    if n_components == 1:
+        return np.array([[total]], dtype=float)
+
+    # Stars and bars, the bar positions split the units between consecutive components
+    bars = np.array(list(combinations(range(units + n_components - 1), n_components - 1)))
+    bounds = np.hstack([np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), units + n_components - 1)])
+    return (np.diff(bounds, axis=1) - 1) * float(step)
+
+def random_allocations(n_components, n_samples, seed=1016, total=100):
+    """Method to get n_samples allocations drawn uniformly over all the splits of total between n_components"""
+    return np.random.default_rng(seed).dirichlet(np.ones(n_components), size=n_samples) * total
+
+def pareto_front(scores, chunk_size=1024):
+    """Method to get the mask of the rows of an N x M score array that no other row improves on, lower being better"""
+    scores = np.asarray(scores, dtype=float)
+    dominated = np.zeros(len(scores), dtype=bool)
+
+    for start in range(0, len(scores), chunk_size):
+        chunk = scores[start:start + chunk_size, None, :]
+        no_worse = (scores[None, :, :] <= chunk).all(axis=-1)
+        better = (scores[None, :, :] < chunk).any(axis=-1)
+        dominated[start:start + chunk_size] = (no_worse & better).any(axis=1)
+
+    return ~dominated
+
+def sweep(components, methods=None, step=5, allocations=None):
+    """Method to score a grid of allocations of the components, or the given allocations, with the Pareto optimal ones flagged
+
+    Components without a score for every method, listed in result.attrs["unscored"], are held at 0 in the grid
+    rather than counted as free of impact. Given allocations must leave them at 0.
+    """
+    table = facility_unit_scores(components, methods)
+    unscored = unscored_components(table)
+
+    scored = [name for name in components if name not in unscored]
+    if allocations is None:
+        allocations = np.zeros((0, len(components)))
+        if scored:
+            grid = allocation_grid(len(scored), step)
+            allocations = np.zeros((len(grid), len(components)))
+            allocations[:, [list(components).index(name) for name in scored]] = grid
+    allocations = np.asarray(allocations, dtype=float)
+    scores = mix_scores(allocations, table.fillna(0).to_numpy())
+
+    result = pd.DataFrame(allocations, columns=list(components))
+    for j, column in enumerate(table.columns):
+        result[column] = scores[:, j]
+    result["pareto"] = pareto_front(scores)
+    result.attrs["unscored"] = unscored
+
+    return result
+
+def _constraints(components, capacities, min_diversion, diversion):
+    """Method to get the linprog bounds and constraints of an allocation in percent"""
+    capacities = capacities or {}
+    bounds = [(0, min(100.0, capacities.get(name, 100.0))) for name in components]
+
+    if diversion is None:
+        diversion = [name for name in components if not name.startswith(LANDFILL_PREFIX)]
+
+    a_ub, b_ub = [], []
+    if min_diversion:
+        # sum of the diverted shares >= min_diversion
+        a_ub.append([-1.0 if name in diversion else 0.0 for name in components])
+        b_ub.append(-float(min_diversion))
+
+    return bounds, a_ub, b_ub
+
+def optimize_allocation(table, weights=None, capacities=None, min_diversion=None, diversion=None, extra_ub=None):
+    """Method to get the allocation in percent of the components of a unit score table with the lowest impact
+
+    The allocation sums to 100, each component stays under its capacity (percent of the total, from the
+    capacities dictionary) and the components in diversion, every non landfill component by default, take at
+    least min_diversion percent. The objective is the first category, or the categories weighted by weights.
+    extra_ub is an optional list of (category, maximum score) constraints. Components missing a score, listed
+    by unscored_components, are held at 0 rather than counted as free of impact. Returns (allocation, scores)
+    as Series, or (None, None) when the constraints cannot be met.
+    """
+    components = list(table.index)
+    scores = table.fillna(0)
+    weights = np.asarray(weights if weights is not None else [1.0] + [0.0] * (scores.shape[1] - 1), dtype=float)
+
+    unscored = unscored_components(table)
+    capacities = {**(capacities or {}), **{name: 0.0 for name in unscored}}
+    bounds, a_ub, b_ub = _constraints(components, capacities, min_diversion, diversion)
+    for category, maximum in extra_ub or []:
+        a_ub.append(list(scores[category] / 100.0))
+        b_ub.append(maximum)
+
+    result = linprog(
+        scores.to_numpy() @ weights / 100.0,
+        A_ub=np.array(a_ub) if a_ub else None,
+        b_ub=np.array(b_ub) if b_ub else None,
+        A_eq=np.ones((1, len(components))),
+        b_eq=[100.0],
+        bounds=bounds,
+        method="highs",
+    )
+
+    if not result.success:
+        return None, None
+
+    allocation = pd.Series(result.x, index=components)
+    return allocation, pd.Series(mix_scores(result.x, scores.to_numpy())[0], index=scores.columns)
+
+def tradeoff_curve(table, objective, constraint, n_points=11, **kwargs):
+    """Method to trace the trade-off between two categories, minimizing objective under a sweep of upper limits on constraint
+
+    Epsilon-constraint method, the limits go from the lowest reachable constraint score to its score at the
+    optimum of objective. Other keyword arguments are the constraints of optimize_allocation.
+    """
+    def weights_of(category):
+        return [1.0 if column == category else 0.0 for column in table.columns]
+
+    columns = list(table.columns)
+
+    _, at_objective = optimize_allocation(table, weights=weights_of(objective), **kwargs)
+    _, at_constraint = optimize_allocation(table, weights=weights_of(constraint), **kwargs)
+    if at_objective is None:
+        return pd.DataFrame(columns=list(table.index) + columns)
+
+    rows = []
+    for limit in np.linspace(at_constraint[constraint], at_objective[constraint], n_points):
+        allocation, scores = optimize_allocation(table, weights=weights_of(objective), extra_ub=[(constraint, limit + 1e-9 * abs(limit))], **kwargs)
+        if allocation is not None:
+            rows.append(pd.concat([allocation, scores]))
+
+    return pd.DataFrame(rows).drop_duplicates().reset_index(drop=True)
+
+def round_allocation(allocation, total=100, capacities=None):
+    """Method to round an allocation in percent to whole percents that still add up to total, largest remainders first
+
+    Components are only rounded up within their capacity, from the capacities dictionary, the percents that do
+    not fit going to the components with the most room left. Capacities are only exceeded when whole percents
+    within them cannot add up to total.
+    """
+    floors = np.floor(allocation.to_numpy() + 1e-9)
+    remainders = allocation.to_numpy() - floors
+    missing = int(round(total - floors.sum()))
+
+    capacities = capacities or {}
+    limits = np.floor(np.array([capacities.get(name, np.inf) for name in allocation.index], dtype=float) + 1e-9)
+    order = np.argsort(-remainders, kind="stable")
+
+    up = order[floors[order] + 1 <= limits[order]][:missing]
+    floors[up] += 1
+    missing -= len(up)
+
+    while missing > 0 and (limits - floors).max() >= 1:
+        floors[np.argmax(limits - floors)] += 1
+        missing -= 1
+
+    floors[order[:max(missing, 0)]] += 1
+    return pd.Series(floors.astype(int), index=allocation.index)
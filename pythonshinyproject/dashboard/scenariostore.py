@@ -0,0 +1,320 @@
+import brightway2 as bw
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+
+import openpyxl
+import pandas as pd
+from bw2io.utils import activity_hash
+
+import dbsync
+import scorecache
+from lcaengine import climate_change_methods
+from scenarioindex import activity_index, cached_on_file, parse_scenarios, with_ids
+from snapshot import update_snapshot
+
+SCENARIO_STORE_BACKEND = os.environ.get("SCENARIO_STORE_BACKEND", "sqlite")
+SCENARIO_STORE_LOCATION = "data/brightway/scenarios.sqlite"
+
+HEADER = ["name", "reference product", "unit", "amount", "location", "database", "type", "categories", "comment"]
+
+_store = None
+
+def scenario_rows(name, description, components):
+    """Method to get the ExcelImporter rows of one scenario, components amounts are fractions of the tonne"""
+    rows = [
+        ["Activity", name, "", "", "", "", "", "", ""],
+        ["comment", description, "", "", "", "", "", "", ""],
+        ["location", "CA-QC", "", "", "", "", "", "", ""],
+        ["production amount", "1", "", "", "", "", "", "", ""],
+        ["unit", "tonne", "", "", "", "", "", "", ""],
+        ["", "", "", "", "", "", "", "", ""],
+        ["Exchanges", "", "", "", "", "", "", "", ""],
+        HEADER,
+        [name, "OFMSW", "tonne", "1", "CA-QC", "Scenarios", "production", "", ""],
+    ]
+
+    for component in components:
+        rows.append([component["name"], "OFMSW", "tonne", component["amount"], "CA-QC", "OWM Facilities", "technosphere", "", ""])
+
+    return rows
+
+class ExcelScenarioStore:
+    """Scenarios kept directly in the Scenarios Database workbook, every edit rewrites the workbook"""
+
+    def __init__(self, path=None):
+        self.path = path or dbsync.SCENARIO_DB_LOCATION
+        self.list_scenarios = cached_on_file(self.path)(self._read_scenarios)
+
+    def _read_scenarios(self):
+        scenarios = []
+
+        try:
+            df = pd.read_excel(self.path, header=None, sheet_name="Sheet1")
+            scenarios = parse_scenarios(df)
+
+        except Exception as e:
+            print(f"ERROR: {e}")
+
+        return scenarios
+
+    def save_scenario(self, name, description, components):
+        try:
+            workbook = openpyxl.load_workbook(self.path, data_only=False)
+            ws = workbook['Sheet1']
+
+            last_row = 0
+            for row_num in range(1, ws.max_row + 1):
+                if ws.cell(row=row_num, column=1).value is not None or ws.cell(row=row_num, column=2).value is not None:
+                    last_row = row_num
+
+            start_row = last_row + 5
+
+            amounts = [{"name": c["name"], "amount": c["percentage"] / 100.0} for c in components]
+
+            for i, new_row in enumerate(scenario_rows(name, description, amounts)):
+                for col_idx, value in enumerate(new_row):
+                    ws.cell(row=start_row + i, column=col_idx + 1, value=value)
+
+            workbook.save(self.path)
+            workbook.close()
+
+            return 1
+
+        except Exception as e:
+            print(e)
+            return 0
+
+    def delete_scenario(self, name):
+        print(f"deleting {name}")
+        try:
+            workbook = openpyxl.load_workbook(self.path, data_only=False)
+            ws = workbook['Sheet1']
+
+            start_row = None
+            end_row = ws.max_row + 1
+
+            for row_num in range(1, ws.max_row + 1):
+                cell_value = ws.cell(row=row_num, column=1).value
+                if cell_value == "Activity":
+                    scenario_name_cell = ws.cell(row=row_num, column=2).value
+                    if scenario_name_cell == name:
+                        start_row = row_num
+                        break
+
+            if start_row is None:
+                print(f"Scenario '{name}' not found")
+                workbook.close()
+                return 0
+
+            for row_num in range(start_row + 1, ws.max_row + 1):
+                cell_value = ws.cell(row=row_num, column=1).value
+                if cell_value == "Activity":
+                    end_row = row_num
+                    break
+
+            # One shift of the rows below instead of one per deleted row
+            ws.delete_rows(start_row, end_row - start_row)
+
+            workbook.save(self.path)
+            workbook.close()
+
+            return 1
+
+        except Exception as e:
+            print(e)
+            return 0
+
+    def sync_database(self, database_name):
+        """Method to bring the brightway Scenarios database up to date with the store"""
+        if self.list_scenarios() != [] and dbsync.refresh_scenarios(database_name):
+            update_snapshot(climate_change_methods()[0])
+
+class SQLiteScenarioStore:
+    """Scenarios kept in SQLite, inserts and deletes are single transactions and the workbook is only written on export"""
+
+    def __init__(self, path=SCENARIO_STORE_LOCATION, workbook=None):
+        self.path = path
+        workbook = workbook or dbsync.SCENARIO_DB_LOCATION
+        self._cache = (None, [])
+
+        with closing(self._connect()) as conn:
+            empty = conn.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0] == 0
+
+        # First use, start from the scenarios of the workbook
+        if empty and os.path.exists(workbook):
+            for scenario in ExcelScenarioStore(workbook).list_scenarios():
+                self._insert(scenario["name"], "", [{"name": c["name"], "amount": c["percentage"]} for c in scenario["components"]])
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS scenarios (position INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, description TEXT);"
+            "CREATE TABLE IF NOT EXISTS components (scenario INTEGER REFERENCES scenarios(position) ON DELETE CASCADE, name TEXT, amount REAL);"
+            "CREATE TABLE IF NOT EXISTS revision (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER);"
+            "INSERT OR IGNORE INTO revision VALUES (0, 0);"
+        )
+        return conn
+
+    def _insert(self, name, description, components):
+        with closing(self._connect()) as conn:
+            with conn:
+                position = conn.execute("INSERT INTO scenarios (name, description) VALUES (?, ?)", (name, description)).lastrowid
+                conn.executemany(
+                    "INSERT INTO components VALUES (?, ?, ?)",
+                    [(position, component["name"], component["amount"]) for component in components],
+                )
+                conn.execute("UPDATE revision SET value = value + 1")
+
+    def revision(self):
+        """Method to get a counter that changes on every write to the store"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT value FROM revision").fetchone()[0]
+
+    def _scenarios(self):
+        """Method to get (position, name, description, components) of every scenario, components amounts are fractions"""
+        with closing(self._connect()) as conn:
+            scenarios = conn.execute("SELECT position, name, description FROM scenarios ORDER BY position").fetchall()
+            components = {}
+            for position, name, amount in conn.execute("SELECT scenario, name, amount FROM components ORDER BY rowid"):
+                components.setdefault(position, []).append({"name": name, "amount": amount})
+
+        return [(position, name, description, components.get(position, [])) for position, name, description in scenarios]
+
+    def list_scenarios(self):
+        revision = self.revision()
+
+        if self._cache[0] != revision:
+            scenarios = with_ids([{
+                'name': name,
+                'row': position,
+                'components': [{'name': c["name"], 'percentage': c["amount"]} for c in components],
+            } for position, name, description, components in self._scenarios()])
+            self._cache = (revision, scenarios)
+
+        return self._cache[1]
+
+    def save_scenario(self, name, description, components):
+        try:
+            self._insert(name, description, [{"name": c["name"], "amount": c["percentage"] / 100.0} for c in components])
+            return 1
+
+        except sqlite3.Error as e:
+            print(e)
+            return 0
+
+    def delete_scenario(self, name):
+        print(f"deleting {name}")
+        with closing(self._connect()) as conn:
+            with conn:
+                deleted = conn.execute("DELETE FROM scenarios WHERE name = ?", (name,)).rowcount
+                if deleted:
+                    conn.execute("UPDATE revision SET value = value + 1")
+
+        if not deleted:
+            print(f"Scenario '{name}' not found")
+        return 1 if deleted else 0
+
+    def export_excel(self, path=None):
+        """Method to write the scenarios in the ExcelImporter layout, the file is replaced atomically"""
+        path = path or dbsync.SCENARIO_DB_LOCATION
+        workbook = openpyxl.Workbook(write_only=True)
+        ws = workbook.create_sheet("Sheet1")
+        ws.append(["Database", dbsync.SCENARIOS_DATABASE])
+        ws.append([])
+
+        for _, name, description, components in self._scenarios():
+            for row in scenario_rows(name, description, components):
+                ws.append(row)
+            for _ in range(4):
+                ws.append([])
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+        workbook.save(tmp_path)
+        os.replace(tmp_path, path)
+
+    def datasets(self, database_name):
+        """Method to get the scenarios as linked brightway datasets, as the ExcelImporter would produce them"""
+        facilities = activity_index(database_name)
+        data = []
+
+        for _, name, description, components in self._scenarios():
+            ds = {
+                "name": name,
+                "comment": description,
+                "location": "CA-QC",
+                "production amount": 1.0,
+                "unit": "tonne",
+                "reference product": "OFMSW",
+                "database": dbsync.SCENARIOS_DATABASE,
+                "type": "process",
+            }
+            ds["code"] = activity_hash(ds)
+
+            exchanges = [{"input": (dbsync.SCENARIOS_DATABASE, ds["code"]), "name": name, "amount": 1.0, "unit": "tonne", "location": "CA-QC", "type": "production"}]
+
+            for component in components:
+                if component["name"] not in facilities:
+                    print(f"Unlinked component '{component['name']}' in scenario '{name}'")
+                    continue
+                exchanges.append({
+                    "input": facilities[component["name"]],
+                    "name": component["name"],
+                    "amount": component["amount"],
+                    "unit": "tonne",
+                    "location": "CA-QC",
+                    "type": "technosphere",
+                })
+
+            ds["exchanges"] = exchanges
+            data.append(ds)
+
+        return data
+
+    def sync_database(self, database_name):
+        """Method to bring the brightway Scenarios database up to date with the store, without going through Excel"""
+        source_hash = f"sqlite:{self.revision()}"
+
+        if dbsync.SCENARIOS_DATABASE in bw.databases and bw.databases[dbsync.SCENARIOS_DATABASE].get("source_hash") == source_hash:
+            return
+
+        if dbsync.SCENARIOS_DATABASE not in bw.databases:
+            bw.Database(dbsync.SCENARIOS_DATABASE).register()
+
+        dbsync.write_changed_activities(dbsync.SCENARIOS_DATABASE, self.datasets(database_name))
+
+        bw.databases[dbsync.SCENARIOS_DATABASE]["source_hash"] = source_hash
+        bw.databases.flush()
+
+        scorecache.prune()
+        # Only the scenarios of the engine are replaced, and the snapshot follows for the workers and the next start
+        update_snapshot(climate_change_methods()[0])
+
+def get_scenario_store():
+    """Method to get the scenario store of the app, backend chosen with the SCENARIO_STORE_BACKEND environment variable"""
+    global _store
+
+    if _store is None:
+        _store = ExcelScenarioStore() if SCENARIO_STORE_BACKEND == "excel" else SQLiteScenarioStore()
+
+    return _store
+
+if __name__ == "__main__":
+    # python scenariostore.py export [path], writes the scenarios of the store to the workbook the notebook reads
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        print("usage: python scenariostore.py export [path]")
+        sys.exit(1)
+
+    store = get_scenario_store()
+    if not hasattr(store, "export_excel"):
+        print("The Excel store already writes every change to the workbook")
+        sys.exit(0)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else dbsync.SCENARIO_DB_LOCATION
+    store.export_excel(path)
+    print(f"{len(store.list_scenarios())} scenarios exported to {path}")
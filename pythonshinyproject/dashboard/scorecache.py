@@ -0,0 +1,94 @@
+import brightway2 as bw
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+CACHE_FILENAME = "unit_scores.sqlite"
+
+def cache_location():
+    """Method to get the location of the unit score cache, stored in the current brightway project directory"""
+    return os.path.join(bw.projects.dir, CACHE_FILENAME)
+
+def _connect():
+    conn = sqlite3.connect(cache_location(), timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS unit_scores ("
+        "database TEXT, code TEXT, method TEXT, revision TEXT, score REAL, "
+        "PRIMARY KEY (database, code, method, revision))"
+    )
+    return conn
+
+def database_revision(database_name):
+    """Method to get the revision of a database, which changes whenever it or one of the databases it depends on is written"""
+    names = set()
+    stack = [database_name]
+
+    while stack:
+        name = stack.pop()
+        if name in names or name not in bw.databases:
+            continue
+        names.add(name)
+        stack.extend(bw.databases[name].get("depends", []))
+
+    state = sorted((name, str(bw.databases[name].get("modified"))) for name in names)
+    return hashlib.sha1(json.dumps(state).encode()).hexdigest()
+
+def method_id(method):
+    return json.dumps(list(method))
+
+def lookup(keys, methods):
+    """Method to get the cached {(activity key, method): unit score} for the current revision of every database"""
+    found = {}
+    method_ids = {method_id(method): method for method in methods}
+
+    by_database = {}
+    for key in keys:
+        by_database.setdefault(key[0], set()).add(key[1])
+
+    with closing(_connect()) as conn:
+        for database, codes in by_database.items():
+            revision = database_revision(database)
+            codes = list(codes)
+
+            for start in range(0, len(codes), 500):
+                chunk = codes[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT code, method, score FROM unit_scores WHERE database = ? AND revision = ? AND code IN ({','.join('?' * len(chunk))})",
+                    [database, revision] + chunk,
+                )
+                for code, mid, score in rows:
+                    if mid in method_ids:
+                        found[((database, code), method_ids[mid])] = score
+
+    return found
+
+def store(scores):
+    """Method to write {(activity key, method): unit score} to the cache"""
+    revisions = {}
+    rows = []
+
+    for (key, method), score in scores.items():
+        if key[0] not in revisions:
+            revisions[key[0]] = database_revision(key[0])
+        rows.append((key[0], key[1], method_id(method), revisions[key[0]], float(score)))
+
+    with closing(_connect()) as conn:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO unit_scores VALUES (?, ?, ?, ?, ?)", rows)
+
+def prune():
+    """Method to delete the cached scores of database revisions that no longer exist"""
+    with closing(_connect()) as conn:
+        databases = [row[0] for row in conn.execute("SELECT DISTINCT database FROM unit_scores")]
+
+        with conn:
+            for database in databases:
+                if database in bw.databases:
+                    conn.execute(
+                        "DELETE FROM unit_scores WHERE database = ? AND revision != ?",
+                        (database, database_revision(database)),
+                    )
+                else:
+                    conn.execute("DELETE FROM unit_scores WHERE database = ?", (database,))
@@ -0,0 +1,158 @@
+import brightway2 as bw
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+from lcaengine import LCAEngine, current_engine, database_version, get_engine, same_background, set_engine
+
+SNAPSHOT_DIRNAME = "snapshot"
+
+def snapshot_location():
+    """Method to get the snapshot directory, stored in the current brightway project directory"""
+    return os.path.join(bw.projects.dir, SNAPSHOT_DIRNAME)
+
+def _ordered_keys(index_dict):
+    keys = [None] * len(index_dict)
+    for key, index in index_dict.items():
+        keys[index] = list(key)
+    return keys
+
+def _save_array(path, name, array):
+    # Written aside and renamed, engines that memory-map the previous file keep reading the old one
+    tmp_path = os.path.join(path, f"{name}.tmp.npy")
+    np.save(tmp_path, array)
+    os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+
+def _save_matrix(path, name, matrix, layout="csr"):
+    # Saved in the layout the engine works in and in canonical form, so it is used as loaded without a copy
+    matrix = matrix.asformat(layout, copy=True)
+    matrix.sum_duplicates()
+    _save_array(path, f"{name}_data", matrix.data)
+    _save_array(path, f"{name}_indices", matrix.indices)
+    _save_array(path, f"{name}_indptr", matrix.indptr)
+    return list(matrix.shape)
+
+def _load_matrix(path, name, shape, layout="csr"):
+    # Memory-mapped, so several worker processes share the same pages read-only
+    data, indices, indptr = (
+        np.load(os.path.join(path, f"{name}_{part}.npy"), mmap_mode="r") for part in ("data", "indices", "indptr")
+    )
+    matrix_class = sparse.csc_matrix if layout == "csc" else sparse.csr_matrix
+    return matrix_class((data, indices, indptr), shape=tuple(shape), copy=False)
+
+def save_snapshot(engine, path=None):
+    """Method to write the matrices, index dictionaries and characterization vectors of an engine as .npy files"""
+    path = path or snapshot_location()
+    os.makedirs(path, exist_ok=True)
+
+    methods = list(engine.characterization)
+    _save_array(
+        path,
+        "characterization",
+        np.vstack([engine.characterization[method] for method in methods]) if methods else np.zeros((0, len(engine.biosphere_dict))),
+    )
+
+    manifest = {
+        "version": engine.version,
+        "technosphere_shape": _save_matrix(path, "technosphere", engine.technosphere_matrix, "csc"),
+        "technosphere_layout": "csc",
+        "biosphere_shape": _save_matrix(path, "biosphere", engine.biosphere_matrix),
+        "activities": _ordered_keys(engine.activity_dict),
+        "products": _ordered_keys(engine.product_dict),
+        "biosphere": _ordered_keys(engine.biosphere_dict),
+        "methods": [list(method) for method in methods],
+        "leaves": engine.leaves,
+    }
+
+    # Written last, so a half written snapshot is never picked up
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+def _read_manifest(path):
+    manifest_path = os.path.join(path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest["version"] = tuple(tuple(v) if isinstance(v, list) else v for v in manifest["version"])
+    return manifest
+
+def snapshot_version(path=None):
+    """Method to get the version the snapshot was taken from, None if there is no snapshot"""
+    manifest = _read_manifest(path or snapshot_location())
+    return manifest["version"] if manifest is not None else None
+
+def load_snapshot(path=None, version=None):
+    """Method to load an engine from a snapshot, returns None if there is no snapshot or it was taken from another version
+
+    The matrices and characterization vectors are memory-mapped and used in place, only the factorization of
+    the background is built in the memory of the process.
+    """
+    path = path or snapshot_location()
+    manifest = _read_manifest(path)
+
+    if manifest is None or (version is not None and manifest["version"] != version):
+        return None
+
+    characterization = np.load(os.path.join(path, "characterization.npy"), mmap_mode="r")
+
+    return LCAEngine(
+        _load_matrix(path, "technosphere", manifest["technosphere_shape"], manifest.get("technosphere_layout", "csr")),
+        _load_matrix(path, "biosphere", manifest["biosphere_shape"]),
+        {tuple(key): index for index, key in enumerate(manifest["activities"])},
+        {tuple(key): index for index, key in enumerate(manifest["products"])},
+        {tuple(key): index for index, key in enumerate(manifest["biosphere"])},
+        manifest["version"],
+        {tuple(method): characterization[i] for i, method in enumerate(manifest["methods"])},
+        leaves=manifest.get("leaves", 0),
+    )
+
+def load_background(version=None):
+    """Method to register the snapshot as the shared engine when it was taken from the same background as version
+
+    Returns whether it was. A snapshot with other scenarios is still used, get_engine then only replaces its
+    scenarios instead of building everything again.
+    """
+    version = version or database_version()
+    current = current_engine()
+    # The engine in memory already has this background and its factorization
+    if current is not None and same_background(current.version, version):
+        return True
+    if not same_background(snapshot_version(), version):
+        return False
+
+    engine = load_snapshot()
+    if engine is None:
+        return False
+    set_engine(engine)
+    return True
+
+def warm_start(methods):
+    """Method to load the shared engine from the snapshot, or build it and write the snapshot if it is missing, outdated or lacks one of methods"""
+    methods = list(methods)
+    load_background()
+
+    engine = get_engine(methods[0])
+    if snapshot_version() == tuple(engine.version) and all(method in engine.characterization for method in methods):
+        return engine
+
+    engine.characterization_matrix(methods)
+    save_snapshot(engine)
+    return engine
+
+def update_snapshot(method):
+    """Method to bring the snapshot up to date after a database was written, e.g. the scenarios synced from the store
+
+    The shared engine is updated, only its scenarios when the background did not change, and saved with
+    the characterization of every method it has, so worker processes and the next start load it as is.
+    """
+    load_background()
+    engine = get_engine(method)
+    if snapshot_version() == tuple(engine.version):
+        return engine
+
+    save_snapshot(engine)
+    return engine
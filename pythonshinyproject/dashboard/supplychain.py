@@ -0,0 +1,110 @@
+import brightway2 as bw
+import heapq
+from itertools import count
+from typing import List, TypedDict
+
+import numpy as np
+import pandas as pd
+
+from lcaengine import activity_key, get_engine
+
+class Node(TypedDict):
+    key: tuple
+    name: str
+    amount: float
+    score: float
+    direct: float
+    depth: int
+    children: List["Node"]
+
+def _name(key, names):
+    if key not in names:
+        try:
+            names[key] = bw.get_activity(key)['name']
+        except Exception:
+            names[key] = str(key)
+    return names[key]
+
+def supply_chain(activity, method, amount=1.0, cutoff=0.01, max_depth=3, max_nodes=500, engine=None):
+    """Method to walk the supply chain of an activity, largest contributions first, and get it as a tree of nodes
+
+    The score of every node is its amount times the unit score of its product, all unit scores coming from
+    one solve of the transposed technosphere, so nothing is solved during the walk. Nodes whose absolute score
+    is below cutoff times the absolute total are not expanded nor kept, and the walk stops after max_nodes
+    nodes or max_depth levels. direct is the score of the emissions of the node itself.
+    """
+    engine = engine or get_engine(method)
+    unit_scores = engine.unit_score_vector(method)
+    characterized = engine.biosphere_matrix.T @ engine.characterization_vector(method)
+
+    technosphere = engine.technosphere_matrix.tocsc()
+    products = {index: key for key, index in engine.product_dict.items()}
+    names = {}
+
+    def node(key, node_amount, depth):
+        return {
+            "key": key,
+            "name": _name(key, names),
+            "amount": node_amount,
+            "score": node_amount * unit_scores[engine.product_dict[key]],
+            "direct": 0.0,
+            "depth": depth,
+            "children": [],
+        }
+
+    root = node(activity_key(activity), amount, 0)
+    threshold = cutoff * abs(root["score"])
+
+    # Max-heap on the absolute score, the counter keeps ties in insertion order
+    tie = count()
+    heap = [(-abs(root["score"]), next(tie), root)]
+    visited = 1
+
+    while heap:
+        _, _, current = heapq.heappop(heap)
+        col = engine.activity_dict[current["key"]]
+        row = engine.product_dict[current["key"]]
+        scale = current["amount"] / technosphere[row, col]
+        current["direct"] = float(characterized[col] * scale)
+
+        if current["depth"] >= max_depth:
+            continue
+
+        column = technosphere[:, col]
+        inputs = column.indices != row
+        rows, amounts = column.indices[inputs], -column.data[inputs] * scale
+        scores = amounts * unit_scores[rows]
+
+        for i in np.argsort(-np.abs(scores)):
+            if abs(scores[i]) < threshold or visited >= max_nodes:
+                break
+            child = node(products[rows[i]], float(amounts[i]), current["depth"] + 1)
+            current["children"].append(child)
+            heapq.heappush(heap, (-abs(child["score"]), next(tie), child))
+            visited += 1
+
+    return root
+
+def tree_table(tree):
+    """Method to flatten a supply chain tree into rows in depth-first order, with the share of the root score"""
+    rows = []
+    total = tree["score"]
+    stack = [(tree, tree["name"])]
+
+    while stack:
+        current, path = stack.pop()
+        rest = current["score"] - sum(child["score"] for child in current["children"])
+        rows.append({
+            "path": path,
+            "name": current["name"],
+            "depth": current["depth"],
+            "amount": current["amount"],
+            "score": current["score"],
+            "direct": current["direct"],
+            "other": rest - current["direct"],
+            "share": current["score"] / total if total else np.nan,
+        })
+        for child in reversed(current["children"]):
+            stack.append((child, f"{path} > {child['name']}"))
+
+    return pd.DataFrame(rows)
@@ -1,15 +1,23 @@
-import brightway2 as bw
-import bw2io as bi
+import os
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import time
 from faicons import icon_svg
-import openpyxl
-import random
 
 from shiny import reactive, render, ui
 
+from clientcharts import client_chart, frame_chart, message_chart, send_chart
+from contribution import direct_contributions
+from figurecache import cached_plot
+from jobs import LatestJob, debounce
+from lcaengine import climate_change_methods, unit_scores
+from methodregistry import EF31, impact_methods, method_label, method_unit
+from scenarioindex import cached_on_file, find_activity
+from scenariomix import facility_unit_scores, mix_scores, optimize_allocation, round_allocation, tradeoff_curve, unscored_components
+from scenariostore import get_scenario_store
+from supplychain import supply_chain, tree_table
+
 SCENARIO_DB_LOCATION = "data/brightway/Scenarios Database.xlsx"
 OWM_DB_LOCATION = "data/brightway/Canada OWM Facilities Database.xlsx"
 OWM_DATABASE = "OWM Facilities"
@@ -23,198 +31,110 @@ ICONS = {
     "seedling": icon_svg("seedling"),
 }
 
-def refresh_scenarios(database_name):
-    imp = bw.ExcelImporter(SCENARIO_DB_LOCATION) 
-    imp.apply_strategies()
-    imp.match_database(database_name, fields=('name', 'unit', 'location', 'reference product')) 
-    imp.match_database(fields=('name', 'unit', 'location'))
-    imp.statistics()
-    imp.write_excel(only_unlinked=True)
-    imp.write_database()
+def mix_methods():
+    """Method to get the categories the facilities of a new scenario are scored on, climate change first then EF v3.1"""
+    return list(dict.fromkeys(climate_change_methods() + impact_methods(EF31)))
 
-def detect_scenarios():
-    """Method to detect scenarios in the Scenario Database, easy implementation for now"""
-    scenarios = []
+@cached_on_file(OWM_DB_LOCATION)
+def get_available_components():
+    """Method to list the facilities of the OWM Facilities Database, read again only when the workbook changes"""
+    components = []
 
     try:
-        df = pd.read_excel(SCENARIO_DB_LOCATION, header=None, sheet_name="Sheet1")
-
+        df = pd.read_excel(OWM_DB_LOCATION, header=None, sheet_name="LCI")
         for index, row in df.iterrows():
             if pd.notna(row[0]) and str(row[0]).strip() == "Activity":
-                components = []
+                comp_name = str(row[1]).strip()
+                components.append(comp_name)
 
-                scenario_name = str(row[1]).strip()
+    except Exception as e:
+        print(f"ERROR: {e}")
+    
+    return components
 
-                exchanges = False
-                curr = index + 1
+def scenario_results(names):
+    """Method to compute the LCA results and the contribution analysis of the selected scenarios"""
+    list_of = [find_activity("Scenarios", s) for s in names]
+    
+    acts = tuple(act for act in list_of if act is not None)
+    
+    CC_method = climate_change_methods()
 
-                while curr < len(df):
-                    curr_row = df.iloc[curr]
+    # LCA
+    if acts != ():
+        FU = [{x:1} for x in acts] 
+        mylca = unit_scores(acts, CC_method)
 
-                    if pd.notna(curr_row[0]) and str(curr_row[0]).strip() == "Activity": 
-                        break
-                    
-                    if pd.notna(curr_row[0]) and str(curr_row[0]).strip() == "Exchanges":
-                        exchanges = True
-                        curr += 3 
-
-                        continue
-
-                    if exchanges and pd.notna(curr_row[0]):
-                        component_name = str(curr_row[0]).strip()
-
-                        if pd.notna(curr_row[2]):
-                            try:
-                                percentage = float(curr_row[3])
-                                components.append({
-                                    'name': component_name,
-                                    'percentage': percentage
-                                })
-                            except (ValueError, TypeError):
-                                print("Excel Format Not Appropriate")
-                                pass
-                    
-                    curr += 1
+        mylcadf = pd.DataFrame(index = CC_method, columns = [(x['name']) for y in FU for x in y], data=mylca.T)
+        
+        results_df = mylcadf.copy()
+        results_df.index = [method_label(idx) for idx in results_df.index]
+
+        # Full EF v3.1 profile, every category characterized from the same inventories
+        ef_methods = impact_methods(EF31)
+        profile_df = pd.DataFrame(
+            unit_scores(acts, ef_methods).T,
+            index=[f"{method_label(m)} ({method_unit(m)})" for m in ef_methods],
+            columns=[act['name'] for act in acts],
+        )
+    else:
+        results_df = None
+        profile_df = None
+    
+    # Contribution Analysis
+    if acts != ():
+        mymethod = CC_method[0]
 
-                scenario_id = f"scenario_{abs(hash(scenario_name + str(index) + str(random.randrange(15000))))}"
-                
-                scenarios.append({
-                    'name': scenario_name,
-                    'row': index + 1,
-                    'components': components,
-                    'id': scenario_id
-                })
+        table, totals = direct_contributions(acts, mymethod)
 
-    except Exception as e:
-        print(f"ERROR: {e}")
-    
-    return scenarios
+        combined_df = table[table['type'] == 'technosphere'].rename(columns={'activity': 'Scenario'})
 
-def save_scenario_to_database(name, description, components):
-    try:
-        workbook = openpyxl.load_workbook(SCENARIO_DB_LOCATION, data_only=False)  
-        ws = workbook['Sheet1']
-
-        last_row = 0
-        for row_num in range(1, ws.max_row + 1):
-            if ws.cell(row=row_num, column=1).value is not None or ws.cell(row=row_num, column=2).value is not None:
-                last_row = row_num
-        
-        start_row = last_row + 5
-
-        new_rows = []
-
-        activity_row = [""] * 9
-        activity_row[0] = "Activity"
-        activity_row[1] = name
-
-        new_rows.append(activity_row)
-
-        metadata_rows = [
-            ["comment", description, "", "", "", "", "", "", ""],
-            ["location", "CA-QC", "", "", "", "", "", "", ""],
-            ["production amount", "1", "", "", "", "", "", "", ""],
-            ["unit", "tonne", "", "", "", "", "", "", ""],
-            ["", "", "", "", "", "", "", "", ""],  
-        ]
-
-        new_rows.extend(metadata_rows)
-        new_rows.append(["Exchanges", "", "", "", "", "", "", "", ""])
-        new_rows.append(["name", "reference product", "unit", "amount", "location", "database", "type", "categories", "comment"])
-
-        new_rows.append([name, "OFMSW", "tonne", "1", "CA-QC", "Scenarios", "production", "", ""])
-
-        for component in components:
-            cname = component["name"]
-            amount = component["percentage"] / 100.0
-
-            component_row = [
-                cname,           
-                "OFMSW",            
-                "tonne",            
-                amount,         
-                "CA-QC",            
-                "OWM Facilities",   
-                "technosphere",     
-                "",                 
-                "",                 
-            ]
-
-            new_rows.append(component_row)
-        
-        for i, new_row in enumerate(new_rows):
-            row_num = start_row + i
-            for col_idx, value in enumerate(new_row):
-                if col_idx < 9:  
-                    ws.cell(row=row_num, column=col_idx + 1, value=value)
-        
-        workbook.save(SCENARIO_DB_LOCATION)
-        workbook.close()
-
-        return 1
-    
-    except Exception as e:
-        print(e)
-        return 0
+        contributions = [combined_df, totals]
+    else:
+        contributions = None
 
-def delete_scenario_from_database(name):
-    print(f"deleting {name}")
-    try:
-        workbook = openpyxl.load_workbook(SCENARIO_DB_LOCATION, data_only=False)  
-        ws = workbook['Sheet1']
-
-        start_row = None
-        end_row = ws.max_row + 1
-
-        for row_num in range(1, ws.max_row + 1):
-            cell_value = ws.cell(row=row_num, column=1).value
-            if cell_value == "Activity":
-                scenario_name_cell = ws.cell(row=row_num, column=2).value
-                if scenario_name_cell == name:
-                    start_row = row_num
-                    break
-        
-        if start_row is None:
-            print(f"Scenario '{name}' not found")
-            workbook.close()
-            return 0
-        
-        for row_num in range(start_row + 1, ws.max_row + 1):
-            cell_value = ws.cell(row=row_num, column=1).value
-            if cell_value == "Activity":
-                end_row = row_num
-                break
+    return results_df, contributions, profile_df
+
+def component_results(names):
+    """Method to compute the LCA results of the selected components"""
+    list_of = [find_activity("OWM Facilities", s, exact=False) for s in names]
     
-        rows_to_delete = end_row - start_row
+    acts = tuple(act for act in list_of if act is not None)
+    
+    CC_method = climate_change_methods()
 
-        print(start_row)
-        print(end_row)
+    # LCA
+    if acts != ():
+        FU = [{x:1} for x in acts] 
+        mylca = unit_scores(acts, CC_method)
 
-        for _ in range(rows_to_delete):
-            ws.delete_rows(start_row)
+        mylcadf = pd.DataFrame(index = CC_method, columns = [(x['name']) for y in FU for x in y], data=mylca.T)
         
-        workbook.save(SCENARIO_DB_LOCATION)
-        workbook.close()
+        df = mylcadf.copy()
+        df.index = [method_label(idx) for idx in df.index]
+    else:
+        df = None
 
-        return 1
-    
-    except Exception as e:
-        print(e)
-        return 0
+    return df
 
-def get_available_components():
-    try:
-        df = pd.read_excel(OWM_DB_LOCATION, header=None, sheet_name="LCI")
-        components = []
-        for index, row in df.iterrows():
-            if pd.notna(row[0]) and str(row[0]).strip() == "Activity":
-                comp_name = str(row[1]).strip()
-                components.append(comp_name)
+def supply_chain_results(database, name, cutoff, max_depth):
+    """Method to get the flattened supply chain tree of a scenario or component, cutoff is a fraction of its score"""
+    act = find_activity(database, name, exact=database == "Scenarios")
+    if act is None:
+        return None
 
-    except Exception as e:
-        print(f"ERROR: {e}")
-    
-    return components
+    return tree_table(supply_chain(act, climate_change_methods()[0], cutoff=cutoff, max_depth=max_depth))
+
+def contribution_table(contributions):
+    """Method to get the scenarios x facilities table of contributions and the total score of every scenario"""
+    df = contributions[0]
+    pivot_df = df.pivot_table(index='Scenario', columns='name', values='contribution', aggfunc='sum')
+    pivot_df = pivot_df.fillna(0)
+
+    # The totals are in selection order and the pivot in name order
+    total_scores = list(contributions[1].reindex(pivot_df.index))
+
+    return pivot_df, total_scores
 
 def brightway_tab_ui():
     return ui.page_sidebar(
@@ -225,28 +145,55 @@ def brightway_tab_ui():
                 "Create Scenario",
                 class_="btn-primary mb-3 w-100"
             ),
+            ui.input_action_button(
+                "export_scenarios",
+                "Export Scenarios to Excel",
+                class_="btn-outline-secondary mb-3 w-100"
+            ),
             ui.div(
                 ui.h5("Components"),
                 ui.hr(class_="my-3"),
                 class_="mt-4"
             ),
             ui.output_ui("list_of_components"),
+            ui.hr(class_="my-3"),
+            ui.input_switch("lca_interactive", "Interactive charts", value=False),
             title="Scenarios",
         ),
+        ui.output_ui("lca_job_status"),
         ui.output_ui("lca_value_cards"),
         ui.card(
              ui.card_header("Scenario Life Cycle Assesement Graph"),
-             ui.output_plot("lca_plot"),
+             ui.panel_conditional("!input.lca_interactive", ui.output_image("lca_plot")),
+            ui.panel_conditional("input.lca_interactive", client_chart("lca_chart")),
              class_="shadow-sm"
         ),
         ui.card(
             ui.card_header("Scenario Life Cycle Assesement Contribution Analysis"),
-            ui.output_plot("contribution_plot"),
+            ui.panel_conditional("!input.lca_interactive", ui.output_image("contribution_plot")),
+            ui.panel_conditional("input.lca_interactive", client_chart("contribution_chart")),
+            class_="shadow-sm"
+        ),
+        ui.card(
+            ui.card_header("Scenario EF v3.1 Impact Profile"),
+            ui.output_image("profile_plot"),
+            class_="shadow-sm"
+        ),
+        ui.card(
+            ui.card_header("Supply Chain Breakdown"),
+            ui.layout_columns(
+                ui.output_ui("drilldown_selector"),
+                ui.input_slider("drilldown_cutoff", "Cutoff (% of the total)", min=0.5, max=20, value=2, step=0.5),
+                ui.input_select("drilldown_depth", "Levels", choices=["1", "2", "3", "4"], selected="3"),
+                fill=False,
+            ),
+            ui.output_image("drilldown_plot"),
             class_="shadow-sm"
         ),
         ui.card(
             ui.card_header("Components Life Cycle Assesement Graph"),
-            ui.output_plot("components_lca_plot"),
+            ui.panel_conditional("!input.lca_interactive", ui.output_image("components_lca_plot")),
+            ui.panel_conditional("input.lca_interactive", client_chart("components_lca_chart")),
             class_="shadow-sm"
         ),
         ui.output_ui("lca_component_value_cards"),
@@ -255,215 +202,113 @@ def brightway_tab_ui():
     )
 
 def brightway_tab_server(input, output, session):
-    scenarios_rv = reactive.Value(detect_scenarios())
-    selected_scenarios = reactive.Value([])
+    store = get_scenario_store()
+    scenarios_rv = reactive.Value(store.list_scenarios())
     lca_results = reactive.Value(None)
-    last_change_time = reactive.Value(0)
     deletion_in_progress = reactive.Value(False)
     contribution_results = reactive.Value(None)
+    profile_results = reactive.Value(None)
 
     # Components Analysis Values
     components_results = reactive.Value(None)
-    components_last_change_time = reactive.Value(0)
-    selected_components = reactive.Value([])
 
-    @reactive.Effect
-    def track_checkbox_changes():
-        s_list = scenarios_rv()
-        for index, _ in enumerate(s_list):
-            check_id = f"check_scenario_{index}"
-            if check_id in input:
-                input[check_id]()  
-        
-        last_change_time.set(time.time())
-    
-    @reactive.Effect
-    def track_component_checkbox_changes():
-        c_list = get_available_components()
-        for index, _ in enumerate(c_list):
-            check_id = f"sidebar_component_{index}"
-            if check_id in input:
-                input[check_id]()
-        
-        components_last_change_time.set(time.time())
-
-    @reactive.Effect
-    def update_graph():
-        current_time = time.time()
-        change_time = last_change_time()
-        
-        if current_time - change_time < 1:  
-            reactive.invalidate_later(0.1)
-            return
-        
+    @debounce(1)
+    def scenario_selection():
         s_list = scenarios_rv()
         selected = []
 
         for index, scenarios in enumerate(s_list):
             check_id = f"check_scenario_{index}"
             if check_id in input and input[check_id]():
-                selected.append(scenarios)
-        
-        selected_scenarios.set(selected)
-
-        LCAdb = bw.Database("Scenarios")
-        list_of = []
+                selected.append(scenarios["name"])
 
-        for s in selected_scenarios():
-            name = s["name"]
-            l = [a for a in LCAdb if name == a['name']]
-            list_of.append(l)
-        
-        acts = tuple(activities[0] for activities in list_of if activities)
-        
-        CC_method = [m for m in bw.methods if 'IPCC 2021' in str(m) and not 'LT' in str(m) and 'GWP100' in str(m) and 'climate change' in str(m) and not 'biogenic' in str(m) and not 'fossil' in str(m) and not 'land use' in str(m) and not 'SLCFs' in str(m)]
+        return tuple(selected)
 
-        # LCA
-        if acts != ():
-            FU = [{x:1} for x in acts] 
-            bw.calculation_setups['OWM_Scenarios'] = {'inv':FU, 'ia': CC_method}
-            mylca = bw.MultiLCA('OWM_Scenarios')
+    @debounce(1)
+    def component_selection():
+        components = get_available_components()
+        selected = []
 
-            mylcadf = pd.DataFrame(index = CC_method, columns = [(x['name']) for y in FU for x in y], data=mylca.results.T)
-            
-            df = mylcadf.copy()
-            df.index = ['IPCC 2021' if 'IPCC 2021' in str(idx) else str(idx) for idx in df.index]
-            
-            lca_results.set(df)
-        else:
-            lca_results.set(None)
-        
-        # Contribution Analysis
-        if acts != ():
-            act = bw.Database(acts[0]['database']).get(acts[0]['code'])
-            functional_unit = {act: 1} 
-            mymethod = CC_method[0]
-            lca = bw.LCA(functional_unit, mymethod)
-            lca.lci()
-            lca.lcia()
-
-            def dolcacalc(act, mydemand, mymethod):
-                my_fu = {act: mydemand} 
-                lca = bw.LCA(my_fu, mymethod)
-                lca.lci()
-                lca.lcia()
-                return lca.score
-
-            def getLCAresults(list_acts, mymethod):
-                all_activities = []
-                results = []
-                for a in list_acts:
-                    act = bw.Database(a[0]).get(a[1])
-                    print(act)
-                    all_activities.append(act['name'])
-                    results.append(dolcacalc(act,1,mymethod))
-                
-                results_dict = dict(zip(all_activities, results))
-                return results_dict
-
-            ca_dict = {}
-
-            for act in acts:
-                exc_list = []
-                contr_list = []
-
-                for exc in list(act.exchanges()):
-                    if exc['type'] == 'biosphere':
-                        col = lca.activity_dict[exc['output']]
-                        row = lca.biosphere_dict[exc['input']]
-                        contr_score = lca.biosphere_matrix[row,col] * lca.characterization_matrix[row,row]
-                        contr_list.append((exc['input'],exc['type'], exc['amount'], contr_score))
-                        
-                    elif exc['type'] == 'substitution':
-                        contr_score = dolcacalc(bw.Database(exc['input'][0]).get(exc['input'][1]), exc['amount'], mymethod)
-                        contr_list.append((exc['name'],exc['input'], exc['type'], exc['amount'], -contr_score))
-                        
-                    else:
-                        contr_score = dolcacalc(bw.Database(exc['input'][0]).get(exc['input'][1]), exc['amount'], mymethod)
-                        contr_list.append((exc['name'], exc['input'], exc['type'], exc['amount'], contr_score))
-                    
-                ca_dict[act['name']] = contr_list
+        for index, component in enumerate(components):
+            check_id = f"sidebar_component_{index}"
+            if check_id in input and input[check_id]():
+                selected.append(component)
 
-            contribution_tables = {}
+        return tuple(selected)
 
-            for act in acts:
-                name = act['name']
-                df = pd.DataFrame(ca_dict[name], columns=['name', 'input', 'type', 'amount', 'contribution'])
+    scenario_job = LatestJob(scenario_results)
+    component_job = LatestJob(component_results)
+    drilldown_job = LatestJob(supply_chain_results)
+    mix_job = LatestJob(facility_unit_scores)
+    # Slider values to render with when applying an allocation also checks or unchecks components
+    pending_sliders = {}
 
-                production_total = df.loc[df['type'] == 'production', 'contribution'].sum()
-                df['%_contribution'] = 100 * df['contribution'] / production_total
+    @reactive.Effect
+    def update_graph():
+        scenario_job.submit(scenario_selection())
 
-                df = df.sort_values(by='contribution', ascending=False)
-                contribution_tables[name] = df
+    @reactive.Effect
+    def update_components_graph():
+        component_job.submit(component_selection())
 
-            all_scenarios_df = []
+    @reactive.Effect
+    def collect_graph():
+        if scenario_job.status() == "error":
+            print("Scenario LCA failed")
+            lca_results.set(None)
+            contribution_results.set(None)
+            profile_results.set(None)
+            return
 
-            for act in acts:
-                scenario_name = act['name']
-                df_temp = pd.DataFrame(ca_dict[scenario_name], columns=['name', 'input', 'type', 'amount', 'contribution'])
-                df_temp = df_temp[df_temp['type'] == 'technosphere'].copy()
-                df_temp['Scenario'] = scenario_name
-                all_scenarios_df.append(df_temp)
+        df, contributions, profile = scenario_job.result()
+        lca_results.set(df)
+        contribution_results.set(contributions)
+        profile_results.set(profile)
 
-            combined_df = pd.concat(all_scenarios_df, ignore_index=True)
-            print(combined_df)
+    @reactive.Effect
+    def collect_components_graph():
+        if component_job.status() == "error":
+            print("Component LCA failed")
+            components_results.set(None)
+            return
 
-            contributions = [combined_df, mylca]
-            contribution_results.set(contributions)
-        else:
-            contribution_results.set(None)
+        components_results.set(component_job.result())
 
     @reactive.Effect
-    def update_components_graph():
-        current_time = time.time()
-        change_time = components_last_change_time()
-        
-        if current_time - change_time < 1:  
-            reactive.invalidate_later(0.1)
+    def update_drilldown():
+        if "drilldown_activity" not in input or not input.drilldown_activity():
             return
-        
-        components = get_available_components()
-        selected = []
-
-        for index, scenarios in enumerate(components):
-            check_id = f"sidebar_component_{index}"
-            if check_id in input and input[check_id]():
-                selected.append(scenarios)
-        
-        selected_components.set(selected)
 
-        LCAdb = bw.Database("OWM Facilities")
-        list_of = []
+        database, name = input.drilldown_activity().split("::", 1)
+        drilldown_job.submit(database, name, input.drilldown_cutoff() / 100.0, int(input.drilldown_depth()))
 
-        for s in selected_components():
-            l = [a for a in LCAdb if s in a['name']]
-            list_of.append(l)
-        
-        acts = tuple(activities[0] for activities in list_of if activities)
+    @reactive.Effect
+    @reactive.event(input.cancel_lca)
+    def cancel_lca_jobs():
+        scenario_job.cancel()
+        component_job.cancel()
+        drilldown_job.cancel()
 
-        print(acts)
-        
-        CC_method = [m for m in bw.methods if 'IPCC 2021' in str(m) and not 'LT' in str(m) and 'GWP100' in str(m) and 'climate change' in str(m) and not 'biogenic' in str(m) and not 'fossil' in str(m) and not 'land use' in str(m) and not 'SLCFs' in str(m)]
+    @output
+    @render.ui
+    def lca_job_status():
+        running = [label for label, job in (("scenarios", scenario_job), ("components", component_job), ("supply chain", drilldown_job)) if job.status() == "running"]
 
-        # LCA
-        if acts != ():
-            FU = [{x:1} for x in acts] 
-            bw.calculation_setups['OWM_Scenarios'] = {'inv':FU, 'ia': CC_method}
-            mylca = bw.MultiLCA('OWM_Scenarios')
+        if not running:
+            return ui.div()
 
-            mylcadf = pd.DataFrame(index = CC_method, columns = [(x['name']) for y in FU for x in y], data=mylca.results.T)
-            
-            df = mylcadf.copy()
-            df.index = ['IPCC 2021' if 'IPCC 2021' in str(idx) else str(idx) for idx in df.index]
-            
-            components_results.set(df)
-        else:
-            components_results.set(None)
+        return ui.div(
+            ui.span(f"Computing LCA for the selected {' and '.join(running)}...", class_="me-3"),
+            ui.input_action_button("cancel_lca", "Cancel", class_="btn-sm btn-secondary"),
+            class_="alert alert-info d-flex align-items-center mb-0"
+        )
 
     @reactive.Effect
     @reactive.event(input.add_scenario_button)
     def show_add_scenario_form():
         available_components = get_available_components()
+        # Unit scores of every facility, the score of the mix is then computed live from the sliders
+        mix_job.submit(tuple(available_components), tuple(mix_methods()))
         modal = ui.modal(
             ui.div(
                 ui.h4("Create New Scenario", class_="mb-3"),
@@ -507,6 +352,33 @@ def brightway_tab_server(input, output, session):
                 ui.div(
                     ui.output_ui("total_percentage"),
                     class_="mt-3"
+                ),
+
+                ui.div(
+                    ui.output_ui("live_mix_score"),
+                    class_="mt-3"
+                ),
+
+                ui.div(
+                    ui.h5("Optimize Allocation:", class_="mb-3"),
+                    ui.layout_columns(
+                        ui.input_numeric("min_diversion", "Minimum diversion from landfill (%)", value=0, min=0, max=100, step=5),
+                        fill=False,
+                    ),
+                    ui.output_ui("component_capacities"),
+                    ui.output_ui("optimal_allocation"),
+                    class_="mt-4"
+                ),
+
+                ui.div(
+                    ui.h5("Trade-off:", class_="mb-3"),
+                    ui.input_select(
+                        "tradeoff_category",
+                        "Lowest climate change for a limit on",
+                        choices=[method_label(m) for m in mix_methods()[len(climate_change_methods()):]],
+                    ),
+                    ui.output_image("tradeoff_plot", height="320px"),
+                    class_="mt-4"
                 )
             ),
             footer=ui.div(
@@ -522,6 +394,21 @@ def brightway_tab_server(input, output, session):
         )
         ui.modal_show(modal)
     
+    @reactive.Effect
+    @reactive.event(input.export_scenarios)
+    def export_scenarios():
+        # The SQLite store is the source of truth, the workbook read by the notebook is only written on request
+        if not hasattr(store, "export_excel"):
+            ui.notification_show("Scenarios are already saved in the Excel workbook", type="message")
+            return
+
+        try:
+            store.export_excel()
+            ui.notification_show(f"{len(scenarios_rv())} scenarios exported to {os.path.basename(SCENARIO_DB_LOCATION)}", type="message")
+        except Exception as e:
+            print(f"Scenario export failed: {e}")
+            ui.notification_show("The scenarios could not be exported", type="error")
+
     @reactive.Effect  
     def delete_scenario():
         if deletion_in_progress():
@@ -541,13 +428,11 @@ def brightway_tab_server(input, output, session):
                     scenario_name = scenario['name']
                     print(f"Deleting scenario: {scenario_name}")
                     
-                    success = delete_scenario_from_database(scenario_name)
+                    success = store.delete_scenario(scenario_name)
                     
                     if success:
-                        scenarios_rv.set(detect_scenarios())
-
-                        if scenarios_rv() != []:
-                            refresh_scenarios(OWM_DATABASE)  
+                        scenarios_rv.set(store.list_scenarios())
+                        store.sync_database(OWM_DATABASE)
                         print(f"Successfully deleted scenario: {scenario_name}")
                     else:
                         print(f"Failed to delete scenario '{scenario_name}'")
@@ -623,6 +508,7 @@ def brightway_tab_server(input, output, session):
         for i, comp_name in selected_components:
             slider_id = f"slider_{i}"
             current_value = input[slider_id]() if slider_id in input else 0
+            current_value = pending_sliders.pop(i, current_value)
             
             sliders.append(
                 ui.div(
@@ -681,6 +567,169 @@ def brightway_tab_server(input, output, session):
             )
         )
           
+    @output
+    @render.ui
+    def live_mix_score():
+        available_components = get_available_components()
+
+        allocation = []
+        for i in range(len(available_components)):
+            checkbox_id = f"component_{i}"
+            slider_id = f"slider_{i}"
+
+            selected = checkbox_id in input and input[checkbox_id]()
+            allocation.append(input[slider_id]() if selected and slider_id in input else 0)
+
+        if sum(allocation) == 0:
+            return ui.div()
+
+        if mix_job.status() == "running":
+            return ui.p("Estimating the scenario score...", class_="text-muted small")
+        if mix_job.status() != "success":
+            return ui.div()
+
+        table = mix_job.result()[[method_label(m) for m in climate_change_methods()]]
+        scores = mix_scores(allocation, table.loc[list(available_components)].fillna(0).to_numpy())[0]
+
+        return ui.div(
+            *[ui.div(f"Estimated {label}: {score:.1f} kg CO2-eq per tonne", class_="small") for label, score in zip(table.columns, scores)],
+            class_="alert alert-light mb-0"
+        )
+
+    def checked_components():
+        available_components = get_available_components()
+        return [(i, comp) for i, comp in enumerate(available_components) if f"component_{i}" in input and input[f"component_{i}"]()]
+
+    @output
+    @render.ui
+    def component_capacities():
+        checked = checked_components()
+        if not checked:
+            return ui.div()
+
+        inputs = []
+        for i, comp in checked:
+            capacity_id = f"capacity_{i}"
+            # Read without depending on it, so typing a capacity does not render the inputs again
+            with reactive.isolate():
+                current_value = input[capacity_id]() if capacity_id in input else 100
+            inputs.append(ui.input_numeric(capacity_id, f"{comp}, maximum share (%)", value=current_value, min=0, max=100, step=5))
+
+        return ui.div(*inputs, class_="mb-2")
+
+    def capacities(checked):
+        """Maximum share in percent of every checked component, 100 while its input is not rendered or is empty"""
+        limits = {}
+        for i, comp in checked:
+            capacity_id = f"capacity_{i}"
+            value = input[capacity_id]() if capacity_id in input else None
+            limits[comp] = 100 if value is None else value
+        return limits
+
+    @reactive.Calc
+    def optimal_split():
+        """Lowest impact allocation of the checked components, solved again on every constraint change"""
+        if mix_job.status() != "success":
+            return None
+
+        checked = checked_components()
+        if not checked:
+            return None
+
+        table = mix_job.result().loc[[comp for _, comp in checked]]
+        limits = capacities(checked)
+        allocation, scores = optimize_allocation(table, capacities=limits, min_diversion=input.min_diversion() or 0)
+        if allocation is None:
+            return "infeasible"
+
+        return round_allocation(allocation, capacities=limits), scores, unscored_components(table)
+
+    @output
+    @render.ui
+    def optimal_allocation():
+        split = optimal_split()
+
+        if split is None:
+            return ui.p("Select components to optimize their allocation", class_="text-muted small")
+        if split == "infeasible":
+            return ui.div("No allocation of the selected components meets these constraints", class_="alert alert-warning mb-0")
+
+        allocation, scores, unscored = split
+        return ui.div(
+            *[ui.div(f"{name}: {share}%", class_="small") for name, share in allocation.items() if share > 0],
+            ui.div(f"Lowest {scores.index[0]}: {scores.iloc[0]:.1f} kg CO2-eq per tonne", class_="small fw-bold mt-2"),
+            ui.div(f"Left out, no score: {', '.join(unscored)}", class_="small text-warning mt-1") if unscored else None,
+            ui.input_action_button("apply_optimal", "Use this allocation", class_="btn-sm btn-outline-primary mt-2"),
+            class_="alert alert-light mb-0"
+        )
+
+    @reactive.Calc
+    def tradeoff_points():
+        """Lowest climate change allocations of the checked components under a sweep of limits on the trade-off category"""
+        if mix_job.status() != "success":
+            return None
+
+        checked = checked_components()
+        table = mix_job.result()
+        if len(checked) < 2 or input.tradeoff_category() not in table.columns:
+            return None
+
+        return tradeoff_curve(
+            table.loc[[comp for _, comp in checked]],
+            objective=table.columns[0],
+            constraint=input.tradeoff_category(),
+            capacities=capacities(checked),
+            min_diversion=input.min_diversion() or 0,
+        )
+
+    @render.image(delete_file=True)
+    @cached_plot(session, "tradeoff_plot", lambda: (tradeoff_points(), input.tradeoff_category()))
+    def tradeoff_plot():
+        points = tradeoff_points()
+        fig, ax = plt.subplots(figsize=(8, 5))
+
+        if points is None or points.empty:
+            ax.text(0.5, 0.5, 'Select at least two components that can meet the constraints',
+                   ha='center', va='center', transform=ax.transAxes,
+                   fontsize=12, color='gray')
+            ax.set_xticks([])
+            ax.set_yticks([])
+            return fig
+
+        objective = mix_job.result().columns[0]
+        category = input.tradeoff_category()
+        ax.plot(points[category], points[objective], marker='o', color='#2E86AB')
+
+        ax.set_xlabel(category, fontsize=11)
+        ax.set_ylabel(f'{objective} (kg CO2-eq per tonne)', fontsize=11)
+        ax.grid(True, alpha=0.3, linestyle='--')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        plt.tight_layout()
+
+        return fig
+
+    @reactive.Effect
+    @reactive.event(input.apply_optimal)
+    def apply_optimal_allocation():
+        split = optimal_split()
+        if split is None or split == "infeasible":
+            return
+
+        allocation = split[0]
+        available_components = get_available_components()
+        indexes = {comp: i for i, comp in enumerate(available_components) if comp in allocation.index}
+
+        # Sliders start at 1%, so components left out of the optimum are unchecked, which renders the sliders again
+        if any(allocation[comp] == 0 for comp in indexes):
+            pending_sliders.clear()
+            pending_sliders.update({i: int(allocation[comp]) for comp, i in indexes.items() if allocation[comp] > 0})
+
+        for comp, i in indexes.items():
+            ui.update_checkbox(f"component_{i}", value=bool(allocation[comp] > 0))
+            if allocation[comp] > 0:
+                ui.update_slider(f"slider_{i}", value=int(allocation[comp]))
+
     @reactive.Effect
     @reactive.event(input.cancel_scenario)
     def hide_add_scenario_form():
@@ -707,11 +756,11 @@ def brightway_tab_server(input, output, session):
                         'percentage': percentage
                     })
 
-        success = save_scenario_to_database(scenario_name, description, selected_components_data)
+        success = store.save_scenario(scenario_name, description, selected_components_data)
 
         if success:
-            refresh_scenarios(OWM_DATABASE)
-            scenarios_rv.set(detect_scenarios())  
+            store.sync_database(OWM_DATABASE)
+            scenarios_rv.set(store.list_scenarios())  
             print("Scenario Saved")
         else:
             print("Failed to save scenario")
@@ -827,7 +876,8 @@ def brightway_tab_server(input, output, session):
         )
     
     @output
-    @render.plot
+    @render.image(delete_file=True)
+    @cached_plot(session, "lca_plot", lambda: (lca_results(),))
     def lca_plot():
         df = lca_results()
         if df is None:
@@ -860,7 +910,8 @@ def brightway_tab_server(input, output, session):
         return fig
 
     @output
-    @render.plot
+    @render.image(delete_file=True)
+    @cached_plot(session, "contribution_plot", lambda: (contribution_results(),))
     def contribution_plot():
         dfs = contribution_results()
 
@@ -873,9 +924,7 @@ def brightway_tab_server(input, output, session):
             ax.set_yticks([])
             return fig
         else:
-            df = dfs[0]
-            pivot_df = df.pivot_table(index='Scenario', columns='name', values='contribution', aggfunc='sum')
-            pivot_df = pivot_df.fillna(0)  
+            pivot_df, total_scores = contribution_table(dfs)
 
             fig, ax = plt.subplots(figsize=(14, 8))
             
@@ -887,11 +936,6 @@ def brightway_tab_server(input, output, session):
                 width=0.7
             )
 
-            scenario_names = pivot_df.index.tolist()
-
-            lcas = dfs[1]
-            total_scores = [lcas.results[i][0] for i in range(len(scenario_names))]
-
             for i, score in enumerate(total_scores):
                 ax.scatter(
                     i,                     
@@ -916,7 +960,107 @@ def brightway_tab_server(input, output, session):
             return fig  
     
     @output
-    @render.plot
+    @render.image(delete_file=True)
+    @cached_plot(session, "profile_plot", lambda: (profile_results(),))
+    def profile_plot():
+        df = profile_results()
+
+        if df is None:
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.text(0.5, 0.5, 'Select scenarios to display results', 
+                   ha='center', va='center', transform=ax.transAxes,
+                   fontsize=14, color='gray')
+            ax.set_xticks([])
+            ax.set_yticks([])
+            return fig
+        else:
+            # Categories have different units, each one is shown relative to the largest absolute score among the scenarios
+            scale = df.abs().max(axis=1).replace(0, 1)
+            relative_df = 100 * df.div(scale, axis=0)
+
+            plt.style.use('seaborn-v0_8')
+
+            fig, ax = plt.subplots(figsize=(14, 10))
+            relative_df.iloc[::-1].plot.barh(
+                ax=ax,
+                color=sns.color_palette("husl", len(relative_df.columns)),
+                alpha=0.8,
+                width=0.7
+            )
+
+            ax.set_xlabel('Score relative to the highest scenario (%)', fontsize=12)
+            ax.set_ylabel('')
+            ax.set_title('EF v3.1 Impact Profile', fontsize=16, fontweight='bold', pad=20)
+            ax.legend(title='Scenario', bbox_to_anchor=(1.02, 1), loc='upper left')
+            ax.grid(True, alpha=0.3, linestyle='--')
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+
+            plt.tight_layout(pad=1.5)
+
+        return fig
+
+    @output
+    @render.ui
+    def drilldown_selector():
+        choices = {f"Scenarios::{name}": name for name in scenario_selection()}
+        choices.update({f"{OWM_DATABASE}::{name}": name for name in component_selection()})
+
+        if not choices:
+            return ui.p("Select scenarios or components to break down", class_="text-muted small")
+
+        with reactive.isolate():
+            current = input.drilldown_activity() if "drilldown_activity" in input else None
+
+        return ui.input_select(
+            "drilldown_activity",
+            "Scenario or component",
+            choices=choices,
+            selected=current if current in choices else next(iter(choices)),
+        )
+
+    @output
+    @render.image(delete_file=True)
+    @cached_plot(session, "drilldown_plot", lambda: (drilldown_job.result() if drilldown_job.status() == "success" else None,))
+    def drilldown_plot():
+        if drilldown_job.status() != "success" or drilldown_job.result() is None:
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.text(0.5, 0.5, 'Select a scenario or component to display its supply chain', 
+                   ha='center', va='center', transform=ax.transAxes,
+                   fontsize=14, color='gray')
+            ax.set_xticks([])
+            ax.set_yticks([])
+            return fig
+
+        df = drilldown_job.result()
+
+        plt.style.use('seaborn-v0_8')
+        colors = sns.color_palette("husl", int(df['depth'].max()) + 1)
+
+        fig, ax = plt.subplots(figsize=(14, max(4, 0.35 * len(df))))
+        # Rows in tree order, indented by level, drawn top to bottom
+        labels = ["    " * depth + name for depth, name in zip(df['depth'], df['name'])]
+        ax.barh(range(len(df)), df['score'], color=[colors[d] for d in df['depth']], alpha=0.8)
+        ax.set_yticks(range(len(df)))
+        ax.set_yticklabels(labels, fontsize=9)
+        ax.invert_yaxis()
+
+        for i, share in enumerate(df['share']):
+            ax.annotate(f"{100 * share:.1f}%", (df['score'].iloc[i], i), xytext=(4, 0), textcoords='offset points', va='center', fontsize=8)
+
+        ax.set_xlabel('Impact Score (kg CO2-eq)', fontsize=12)
+        ax.set_title(f"Supply chain of {df['name'].iloc[0]}", fontsize=16, fontweight='bold', pad=20)
+        ax.grid(True, alpha=0.3, linestyle='--', axis='x')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+
+        plt.tight_layout(pad=1.5)
+
+        return fig
+
+    @output
+    @render.image(delete_file=True)
+    @cached_plot(session, "components_lca_plot", lambda: (components_results(),))
     def components_lca_plot():
         df = components_results()
         if df is None:
@@ -948,6 +1092,43 @@ def brightway_tab_server(input, output, session):
         
         return fig
         
+    @reactive.Effect
+    async def lca_chart():
+        if not input.lca_interactive():
+            return
+
+        df = lca_results()
+        if df is None:
+            chart = message_chart('Select scenarios to display results')
+        else:
+            chart = frame_chart(df, title='Life Cycle Assessment Results', x_label='Impact Category', y_label='Impact Score (kg CO2-eq)')
+        await send_chart(session, "lca_chart", chart)
+
+    @reactive.Effect
+    async def contribution_chart():
+        if not input.lca_interactive():
+            return
+
+        dfs = contribution_results()
+        if dfs is None:
+            chart = message_chart('Select scenarios to display results')
+        else:
+            pivot_df, total_scores = contribution_table(dfs)
+            chart = frame_chart(pivot_df, y_label='Impact contribution (kg CO2-eq)', stacked=True, points=('Total Score', total_scores))
+        await send_chart(session, "contribution_chart", chart)
+
+    @reactive.Effect
+    async def components_lca_chart():
+        if not input.lca_interactive():
+            return
+
+        df = components_results()
+        if df is None:
+            chart = message_chart('Select components to display results')
+        else:
+            chart = frame_chart(df, title='Life Cycle Assessment Results', x_label='Impact Category', y_label='Impact Score (kg CO2-eq)')
+        await send_chart(session, "components_lca_chart", chart)
+
     @output
     @render.ui
     def lca_value_cards():
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from shiny import ui, render, reactive, App
 import pandas as pd
 import numpy as np
@@ -5,12 +8,65 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 import matplotlib.style as style
 
+from clientcharts import bar_chart, client_chart, message_chart, panel_chart, send_chart
+from figurecache import cached_plot
+from jobs import LatestJob
+from lcaengine import climate_change_methods
+from methodregistry import method_label
+from projection import cached_bands, export_projection, project, projection_table, record_bands, scenario_bands, scenario_unit_scores, totals
+from scenariostore import get_scenario_store
+from wastedata import AGGLO_MTL_MUN, load_waste_cube
+
+ALL_TERRITORIES = "All territories"
+
+WASTE_TYPES = [
+    "Matières recyclables",
+    "Matières organiques", 
+    "Résidus de construction, rénovation, démolition et encombrants",
+    "Résidus domestiques dangereux",
+    "Textiles",
+    "Autres (produits électroniques)",
+    "Ordures ménagères éliminées",
+    "Résidus de construction, rénovation, démolition et encombrants éliminés",
+    "Résidus domestiques dangereux et PE"
+]
+
+def material_groups(materials, n_groups=8):
+    """Method to divide the materials into exactly n_groups consecutive groups, the last ones possibly empty"""
+    n_materials = len(materials)
+    materials_per_group = max(1, n_materials // n_groups)
+    
+    groups = []
+    for i in range(n_groups):
+        start_idx = i * materials_per_group
+        end_idx = (i + 1) * materials_per_group if i < n_groups - 1 else n_materials
+        groups.append(list(materials[start_idx:end_idx]) if start_idx < n_materials else [])
+    
+    return groups
+
+def territory_bars(cube, year, materials):
+    """Method to get the mean generated and collected tonnage of the materials per territory, sorted by total, None without data"""
+    territories, means = cube.year_slice(year, materials)
+    if not territories:
+        return None
+    
+    # Territories sorted by total, NaN totals last as with a sorted DataFrame
+    generated = means[cube.quantities.index('generated')]
+    collected = means[cube.quantities.index('collected')]
+    order = np.argsort(generated + collected, kind='stable')
+    return {
+        'territory': [territories[j] for j in order],
+        'generated': generated[order],
+        'collected': collected[order],
+    }
+
 def wasteestimation_tab_ui():
     return ui.page_sidebar(
         ui.sidebar(
             ui.div(
                 ui.h3("Waste Data Controls")
             ),
+            ui.input_switch("waste_interactive", "Interactive charts", value=False),
             ui.input_selectize(
                 "selected_year", 
                 "Select Year", 
@@ -21,18 +77,7 @@ def wasteestimation_tab_ui():
             ui.input_selectize(
                 "selected_waste_types", 
                 "Select Waste Type", 
-                choices=[
-                    "",
-                    "Matières recyclables",
-                    "Matières organiques", 
-                    "Résidus de construction, rénovation, démolition et encombrants",
-                    "Résidus domestiques dangereux",
-                    "Textiles",
-                    "Autres (produits électroniques)",
-                    "Ordures ménagères éliminées",
-                    "Résidus de construction, rénovation, démolition et encombrants éliminés",
-                    "Résidus domestiques dangereux et PE"
-                ],
+                choices=[""] + WASTE_TYPES,
                 selected="",
             ),
             ui.input_selectize(
@@ -54,13 +99,42 @@ def wasteestimation_tab_ui():
         ),
         ui.card(
             ui.card_header("Generated vs Collected Residual Materials"),
-            ui.output_plot("waste_plots", height="1800px"),
+            ui.panel_conditional("!input.waste_interactive", ui.output_image("waste_plots", height="1800px")),
+            ui.panel_conditional("input.waste_interactive", client_chart("waste_chart", height="1800px")),
             height="auto",
             collapsible=True,
         ),
         ui.card(
             ui.card_header("Time Series Analysis"),
-            ui.output_plot("time_series_plot", height="600px"),
+            ui.panel_conditional("!input.waste_interactive", ui.output_image("time_series_plot", height="600px")),
+            ui.panel_conditional("input.waste_interactive", client_chart("time_series_chart", height="600px")),
+            height="auto",
+            collapsible=True,
+        ),
+        ui.card(
+            ui.card_header("Carbon Footprint Projection"),
+            ui.layout_columns(
+                ui.input_selectize(
+                    "projection_materials",
+                    "Materials",
+                    choices=WASTE_TYPES,
+                    selected="Matières organiques",
+                    multiple=True,
+                ),
+                ui.input_radio_buttons("projection_quantity", "Tonnage", choices={"collected": "Collected", "generated": "Generated"}),
+                ui.input_selectize("projection_territory", "Territory", choices=[ALL_TERRITORIES] + AGGLO_MTL_MUN, selected=ALL_TERRITORIES),
+                ui.output_ui("projection_scenario_choices"),
+                fill=False,
+            ),
+            ui.div(
+                ui.input_action_button("projection_bands", "Add Monte Carlo bands", class_="btn-secondary btn-sm me-2"),
+                ui.download_button("projection_csv", "Export CSV", class_="btn-sm me-2"),
+                ui.download_button("projection_parquet", "Export Parquet", class_="btn-sm"),
+                class_="mb-2"
+            ),
+            ui.output_ui("projection_status"),
+            ui.output_image("projection_plot", height="500px"),
+            ui.output_table("projection_territories"),
             height="auto",
             collapsible=True,
         ),
@@ -70,38 +144,18 @@ def wasteestimation_tab_ui():
 
 
 def wasteestimation_tab_server(input, output, session):
-    global waste_data, materials_list
-    
-    waste_data = None
     materials_list = []
     
-    try:
-        url = "https://donnees.montreal.ca/dataset/matieres-residuelles-bilan-massique/resource/1341d644-9dd4-4ade-b2b1-9cec53b7beec/download"
-        waste_data = pd.read_csv(url)
-        
-        for col in waste_data.columns[3:11]:
-            waste_data[col] = pd.to_numeric(waste_data[col].astype(str).str.replace(r'[^0-9.]', '', regex=True), errors='coerce')
-        
-        agglo_mtl_mun = [
-            "Ahuntsic-Cartierville", "Anjou", "Côte-des-Neiges–Notre-Dame-de-Grâce",
-            "L'Île-Bizard–Sainte-Geneviève", "Lachine", "LaSalle", "Le Plateau-Mont-Royal",
-            "Le Sud-Ouest", "Mercier–Hochelaga-Maisonneuve", "Montréal-Nord", "Outremont",
-            "Pierrefonds-Roxboro", "Rivière-des-Prairies–Pointe-aux-Trembles",
-            "Rosemont–La Petite-Patrie", "Saint-Laurent", "Saint-Léonard", "Verdun",
-            "Ville-Marie", "Villeray–Saint-Michel–Parc-Extension",
-            "Baie-d'Urfé", "Beaconsfield", "Côte-Saint-Luc", "Dollard-des Ormeaux",
-            "Dorval", "Hampstead", "Kirkland", "Montréal-Est", "Montréal-Ouest",
-            "Mont-Royal", "Pointe-Claire", "Sainte-Anne-de-Bellevue", "Senneville", "Westmount"
-        ]
-        
-        waste_data = waste_data[waste_data['territoire'].isin(agglo_mtl_mun)]
-        
-        materials_list = sorted(waste_data['matiere'].unique())
-        
-    except Exception as e:
-        print(f"Error loading data: {e}")
+    # Shared by every session of this process, built from the local snapshot, and kept by this session
+    # until it ends even if the snapshot is refreshed meanwhile
+    waste_cube = load_waste_cube()
+    cube_version = waste_cube.version if waste_cube is not None else None
+
+    if waste_cube is not None:
+        materials_list = waste_cube.materials
     
-    @render.plot
+    @render.image(delete_file=True)
+    @cached_plot(session, "waste_plots", lambda: (input.selected_year(), cube_version))
     def waste_plots():
         year = input.selected_year()
         
@@ -116,26 +170,7 @@ def wasteestimation_tab_server(input, output, session):
                 ax.set_visible(False)
             return fig
         
-        year_data = waste_data[waste_data['annee'] == int(year)]
-        
-        # Divide materials into exactly 8 groups
-        n_materials = len(materials_list)
-        materials_per_group = n_materials // 8
-        if materials_per_group < 1:
-            materials_per_group = 1
-        
-        material_groups = []
-        for i in range(8):
-            start_idx = i * materials_per_group
-            end_idx = (i + 1) * materials_per_group if i < 7 else n_materials
-            if start_idx < n_materials:
-                group = materials_list[start_idx:end_idx]
-                material_groups.append(group)
-            else:
-                material_groups.append([])
-        
-        while len(material_groups) < 8:
-            material_groups.append([])
+        groups = material_groups(materials_list)
         
         colors = {
             'Generated': '#FF6B35',  
@@ -153,7 +188,7 @@ def wasteestimation_tab_server(input, output, session):
             ax.spines['left'].set_color('#cccccc')
             ax.spines['bottom'].set_color('#cccccc')
             
-            materials = material_groups[i] if i < len(material_groups) else []
+            materials = groups[i]
             
             if not materials:
                 ax.text(0.5, 0.5, f"No materials in group {i+1}", 
@@ -164,9 +199,9 @@ def wasteestimation_tab_server(input, output, session):
                 ax.set_title(f"Group {i+1}", fontsize=14, pad=20, color='#333333')
                 continue
             
-            df_group = year_data[year_data['matiere'].isin(materials)]
+            grouped = territory_bars(waste_cube, year, materials)
             
-            if df_group.empty:
+            if grouped is None:
                 ax.text(0.5, 0.5, "No data available", 
                         ha='center', va='center', transform=ax.transAxes,
                         fontsize=12, color='#888888')
@@ -175,33 +210,8 @@ def wasteestimation_tab_server(input, output, session):
                 ax.set_title(', '.join(materials), fontsize=14, pad=20, color='#333333')
                 continue
             
-            plot_data = []
-            for material in materials:
-                material_data = df_group[df_group['matiere'] == material]
-                for _, row in material_data.iterrows():
-                    plot_data.append({
-                        'material': material,
-                        'territory': row['territoire'],
-                        'generated': row['quantite_generee_donnees_agglo'],
-                        'collected': row['quantite_collectee_donnees_agglo']
-                    })
-            
-            plot_df = pd.DataFrame(plot_data)
-            
-            if plot_df.empty:
-                continue
-            
-            # Aggregate and sort data
-            grouped = plot_df.groupby('territory').agg({
-                'generated': 'mean',
-                'collected': 'mean'
-            }).reset_index()
-            
-            grouped['total'] = grouped['generated'] + grouped['collected']
-            grouped = grouped.sort_values('total')
-            
             # Create beautiful bars
-            x = np.arange(len(grouped))
+            x = np.arange(len(grouped['territory']))
             width = 0.35
             
             bars1 = ax.bar(x - width/2, grouped['generated'], width, 
@@ -248,7 +258,8 @@ def wasteestimation_tab_server(input, output, session):
         
         return fig
 
-    @render.plot  
+    @render.image(delete_file=True)
+    @cached_plot(session, "time_series_plot", lambda: (input.selected_waste_types(), input.selected_territories(), cube_version))
     def time_series_plot():
         waste_type = input.selected_waste_types()
         territory = input.selected_territories()
@@ -265,38 +276,21 @@ def wasteestimation_tab_server(input, output, session):
             ax.set_visible(False)
             return fig
             
-        if waste_data is None:
+        if waste_cube is None:
             fig.text(0.5, 0.5, "Error loading data", 
                     ha='center', va='center', fontsize=14, color='#666666')
             ax.set_visible(False)
             return fig
         
-        # Filter data for selected waste type and territory
-        data_filtered = waste_data[
-            (waste_data['matiere'] == waste_type) & 
-            (waste_data['territoire'] == territory)
-        ].copy()
+        # One material in one territory, every year with a row
+        years, values = waste_cube.series(waste_type, territory)
         
-        if data_filtered.empty:
+        if not years:
             fig.text(0.5, 0.5, f"No data available for {waste_type} in {territory}", 
                     ha='center', va='center', fontsize=14, color='#666666')
             ax.set_visible(False)
             return fig
         
-        # Reshape to long format
-        data_long = data_filtered.melt(
-            id_vars=['annee'], 
-            value_vars=['quantite_generee_donnees_agglo', 'quantite_collectee_donnees_agglo'],
-            var_name='type', value_name='quantite'
-        )
-        
-        # Recode type
-        type_map = {
-            'quantite_generee_donnees_agglo': 'Generated',
-            'quantite_collectee_donnees_agglo': 'Collected'
-        }
-        data_long['type'] = data_long['type'].map(type_map)
-        
         # Same styling as first graphs
         ax.set_facecolor('#fafafa')
         ax.spines['top'].set_visible(False)
@@ -311,15 +305,11 @@ def wasteestimation_tab_server(input, output, session):
         }
         
         # Create the bars
-        generated_data = data_long[data_long['type'] == 'Generated']
-        collected_data = data_long[data_long['type'] == 'Collected']
-        
-        years = sorted(data_long['annee'].unique())
         x = np.arange(len(years))
         width = 0.35
         
-        generated_values = [generated_data[generated_data['annee'] == year]['quantite'].iloc[0] if len(generated_data[generated_data['annee'] == year]) > 0 else 0 for year in years]
-        collected_values = [collected_data[collected_data['annee'] == year]['quantite'].iloc[0] if len(collected_data[collected_data['annee'] == year]) > 0 else 0 for year in years]
+        generated_values = values[waste_cube.quantities.index('generated')]
+        collected_values = values[waste_cube.quantities.index('collected')]
         
         bars1 = ax.bar(x - width/2, generated_values, width, 
                     label='Generated', color=colors['Generated'], 
@@ -355,4 +345,222 @@ def wasteestimation_tab_server(input, output, session):
             top=0.85       # Top margin (increased to add space below card header)
         )
 
-        return fig
\ No newline at end of file
+        return fig
+
+    @reactive.Effect
+    async def waste_chart():
+        if not input.waste_interactive():
+            return
+        
+        year = input.selected_year()
+        if not year:
+            await send_chart(session, "waste_chart", message_chart("Please select a year to view waste data"))
+            return
+        
+        panels = []
+        for i, materials in enumerate(material_groups(materials_list)):
+            if not materials:
+                panels.append(message_chart(f"No materials in group {i+1}"))
+                continue
+            
+            grouped = territory_bars(waste_cube, year, materials)
+            if grouped is None:
+                panels.append(message_chart(f"No data available: {', '.join(materials)}"))
+                continue
+            
+            panels.append(bar_chart(
+                grouped['territory'],
+                {'Generated': grouped['generated'], 'Collected': grouped['collected']},
+                title=', '.join(materials),
+                y_label='Quantity (tonnes)',
+            ))
+        
+        await send_chart(session, "waste_chart", panel_chart(
+            panels, columns=2, title=f"Generated vs Collected Residual Materials by Territory ({year})"
+        ))
+
+    @reactive.Effect
+    async def time_series_chart():
+        if not input.waste_interactive():
+            return
+        
+        waste_type = input.selected_waste_types()
+        territory = input.selected_territories()
+        
+        if not waste_type or not territory:
+            await send_chart(session, "time_series_chart", message_chart("Please select both a waste type and a municipality to view time series data"))
+            return
+        
+        years, values = waste_cube.series(waste_type, territory) if waste_cube is not None else ([], None)
+        if not years:
+            await send_chart(session, "time_series_chart", message_chart(f"No data available for {waste_type} in {territory}"))
+            return
+        
+        await send_chart(session, "time_series_chart", bar_chart(
+            years,
+            {'Generated': values[waste_cube.quantities.index('generated')], 'Collected': values[waste_cube.quantities.index('collected')]},
+            title=f"Generated vs Collected: {waste_type} in {territory}",
+            x_label='Year',
+            y_label='Quantity (tonnes)',
+        ))
+
+    # Carbon footprint projection, tonnage times the per tonne score of the scenarios of the Brightway tab
+    store = get_scenario_store()
+    projection_scores_job = LatestJob(scenario_unit_scores)
+    bands_job = LatestJob(scenario_bands)
+    bands_version = reactive.Value(0)
+
+    @reactive.poll(lambda: tuple(scenario['name'] for scenario in store.list_scenarios()), 5)
+    def scenario_names():
+        return [scenario['name'] for scenario in store.list_scenarios()]
+
+    @render.ui
+    def projection_scenario_choices():
+        names = scenario_names()
+        with reactive.isolate():
+            current = input.projection_scenarios() if "projection_scenarios" in input else names
+        return ui.input_checkbox_group(
+            "projection_scenarios",
+            "Scenarios",
+            choices=names,
+            selected=[name for name in current if name in names],
+            inline=True,
+        )
+
+    def selected_scenarios():
+        return tuple(input.projection_scenarios()) if "projection_scenarios" in input else ()
+
+    @reactive.Effect
+    def update_projection_scores():
+        projection_scores_job.submit(selected_scenarios())
+
+    @reactive.Effect
+    @reactive.event(input.projection_bands)
+    def run_projection_bands():
+        with reactive.isolate():
+            names = selected_scenarios()
+            available = cached_bands(names)
+        missing = tuple(name for name in names if available is None or name not in available.index)
+        if missing:
+            bands_job.submit(missing)
+
+    @reactive.Effect
+    def collect_projection_bands():
+        if bands_job.status() != "success" or bands_job.result() is None:
+            return
+        record_bands(bands_job.result())
+        with reactive.isolate():
+            bands_version.set(bands_version() + 1)
+
+    @reactive.Calc
+    def projection():
+        if waste_cube is None or projection_scores_job.status() != "success":
+            return None
+
+        unit_table = projection_scores_job.result()
+        materials = list(input.projection_materials())
+        if unit_table is None or unit_table.empty or not materials:
+            return None
+
+        bands_version()
+        return project(
+            waste_cube, unit_table, materials, input.projection_quantity(),
+            bands=cached_bands(list(unit_table.index)), band_method=method_label(climate_change_methods()[0]),
+        )
+
+    @reactive.Calc
+    def projection_totals():
+        result = projection()
+        if result is None:
+            return None
+
+        territory = input.projection_territory()
+        scores, lower, upper = totals(result, None if territory == ALL_TERRITORIES else [territory])
+        return result["years"], result["scenarios"], result["methods"][0], scores[:, :, 0], lower[:, :, 0], upper[:, :, 0]
+
+    @render.ui
+    def projection_status():
+        if bands_job.status() == "running":
+            return ui.p("Running the Monte Carlo of the scenarios...", class_="text-muted small")
+        if projection_scores_job.status() == "running":
+            return ui.p("Computing the scores of the scenarios...", class_="text-muted small")
+        if projection_scores_job.status() == "error" or bands_job.status() == "error":
+            return ui.p("The scenario scores could not be computed", class_="text-danger small")
+        return ui.div()
+
+    @render.image(delete_file=True)
+    @cached_plot(session, "projection_plot", lambda: (projection_totals(), input.projection_territory(), tuple(input.projection_materials()), input.projection_quantity()))
+    def projection_plot():
+        plt.style.use('default')
+        fig, ax = plt.subplots(1, 1, figsize=(12, 6))
+        fig.patch.set_facecolor('white')
+
+        data = projection_totals()
+        if data is None:
+            fig.text(0.5, 0.5, "Select materials and scenarios to project their carbon footprint", 
+                    ha='center', va='center', fontsize=14, color='#666666')
+            ax.set_visible(False)
+            return fig
+
+        years, scenarios, method, scores, lower, upper = data
+        colors = plt.get_cmap('tab10')
+
+        ax.set_facecolor('#fafafa')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.spines['left'].set_color('#cccccc')
+        ax.spines['bottom'].set_color('#cccccc')
+
+        # kg CO2-eq per tonne times tonnes, shown in tonnes CO2-eq
+        for j, scenario in enumerate(scenarios):
+            ax.plot(years, scores[:, j] / 1000, marker='o', color=colors(j % 10), label=scenario, linewidth=2)
+            if not np.isnan(lower[:, j]).all():
+                ax.fill_between(years, lower[:, j] / 1000, upper[:, j] / 1000, color=colors(j % 10), alpha=0.2)
+
+        ax.set_xlabel("Year", fontsize=12, color='#555555')
+        ax.set_ylabel(f"{method} (t CO2-eq)", fontsize=12, color='#555555')
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/1000:.0f}K' if abs(x) >= 1000 else f'{x:.0f}'))
+        ax.set_title(f"Carbon footprint of {', '.join(input.projection_materials())}\nin {input.projection_territory()}", 
+                    fontsize=14, pad=20, color='#333333', weight='bold')
+        ax.grid(True, axis='y', linestyle='--', alpha=0.3, color='#cccccc')
+        ax.legend(loc='upper right', frameon=False, fontsize=11)
+
+        plt.tight_layout(pad=1.5)
+        return fig
+
+    @render.table
+    def projection_territories():
+        result = projection()
+        if result is None:
+            return None
+
+        # Latest year of the projection, or the year selected in the sidebar
+        year = int(input.selected_year()) if input.selected_year() else result["years"][-1]
+        if year not in result["years"]:
+            return None
+
+        y = result["years"].index(year)
+        table = pd.DataFrame(result["scores"][y, :, :, 0] / 1000, index=result["territories"], columns=result["scenarios"])
+        table.insert(0, "Tonnes", result["tonnes"][y])
+        table = table.dropna(subset=["Tonnes"]).round(1)
+        return table.reset_index(names=f"Territory ({year}, t CO2-eq)")
+
+    def projection_export(extension):
+        result = projection()
+        table = projection_table(result) if result is not None else pd.DataFrame()
+        fd, path = tempfile.mkstemp(suffix=extension)
+        os.close(fd)
+        try:
+            export_projection(table, path)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    @render.download(filename="carbon_footprint_projection.csv")
+    def projection_csv():
+        yield projection_export(".csv")
+
+    @render.download(filename="carbon_footprint_projection.parquet")
+    def projection_parquet():
+        yield projection_export(".parquet")
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+# The dashboard modules import each other by name, as when the app is run from its directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+METHOD = ("test method",)
+
+def small_system(n_products=8, n_flows=3, seed=0):
+    """Method to get a random (technosphere, biosphere, characterization) system with fewer flows than products"""
+    rng = np.random.default_rng(seed)
+    inputs = rng.uniform(0, 0.1, (n_products, n_products)) * (rng.random((n_products, n_products)) < 0.4)
+    np.fill_diagonal(inputs, 0)
+    technosphere = np.eye(n_products) - inputs
+    biosphere = rng.uniform(0, 2, (n_flows, n_products))
+    characterization = rng.uniform(0.5, 3, n_flows)
+    return technosphere, biosphere, characterization
+
+@pytest.fixture
+def engine():
+    """Engine over a small random system, built without a brightway project"""
+    pytest.importorskip("brightway2")
+    from lcaengine import LCAEngine
+
+    technosphere, biosphere, characterization = small_system()
+    products = {("db", f"p{i}"): i for i in range(technosphere.shape[0])}
+    flows = {("bio", f"f{i}"): i for i in range(biosphere.shape[0])}
+
+    return LCAEngine(
+        sparse.csr_matrix(technosphere),
+        sparse.csr_matrix(biosphere),
+        dict(products),
+        dict(products),
+        flows,
+        version=("test",),
+        characterization={METHOD: characterization},
+    )
+
+def direct_score(engine, demand_key, technosphere=None, biosphere=None, method=METHOD):
+    """Method to get the score of one unit of a product by solving the dense system again"""
+    technosphere = engine.technosphere_matrix.toarray() if technosphere is None else technosphere
+    biosphere = engine.biosphere_matrix.toarray() if biosphere is None else biosphere
+    demand = np.zeros(technosphere.shape[0])
+    demand[engine.product_dict[demand_key]] = 1
+    return engine.characterization_vector(method) @ biosphere @ np.linalg.solve(technosphere, demand)
+
+def waste_frame():
+    """Method to get a small residual materials table, typed like wastedata.clean, with a missing year and a NaN tonnage"""
+    import pandas as pd
+
+    rows = [
+        (2020, "Anjou", "Matières organiques", 100.0, 60.0),
+        (2020, "Anjou", "Textiles", 10.0, 2.0),
+        (2020, "Verdun", "Matières organiques", 200.0, 150.0),
+        (2021, "Anjou", "Matières organiques", 110.0, 70.0),
+        (2021, "Verdun", "Matières organiques", 210.0, float("nan")),
+        (2022, "Verdun", "Textiles", 12.0, 3.0),
+    ]
+    df = pd.DataFrame(rows, columns=["annee", "territoire", "matiere", "quantite_generee_donnees_agglo", "quantite_collectee_donnees_agglo"])
+    df["annee"] = df["annee"].astype("Int64")
+    df["matiere"] = df["matiere"].astype("category")
+    df["territoire"] = df["territoire"].astype("category")
+    return df
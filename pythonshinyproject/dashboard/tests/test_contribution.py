@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from conftest import METHOD, direct_score
+
+pytest.importorskip("brightway2")
+
+import contribution
+from contribution import check_contributions, direct_contributions
+
+def test_contributions_add_up_to_the_scores(engine, monkeypatch):
+    def unit_scores(keys, methods):
+        vector = engine.unit_score_vector(METHOD)
+        return vector[[engine.product_dict[key] for key in keys]][:, None]
+
+    def get_activity(key):
+        raise KeyError(key)
+
+    monkeypatch.setattr(contribution, "unit_scores", unit_scores)
+    monkeypatch.setattr(contribution, "bw", SimpleNamespace(get_activity=get_activity))
+
+    # Selection order differs from the name order of the table
+    keys = [("db", "p5"), ("db", "p1"), ("db", "p3")]
+    table, totals = direct_contributions(keys, METHOD, engine=engine)
+
+    assert list(totals.index) == [str(key) for key in keys]
+    np.testing.assert_allclose(totals.to_numpy(), [direct_score(engine, key) for key in keys], rtol=1e-9)
+    np.testing.assert_allclose(check_contributions(table, totals).to_numpy(), 0, atol=1e-9)
+    assert list(table['activity'].unique()) == sorted(totals.index)
+
+    table.loc[table['activity'] == str(keys[0]), 'contribution'] *= 2
+    assert abs(check_contributions(table, totals)[str(keys[0])]) > 1e-3
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from conftest import METHOD, direct_score
+
+pytest.importorskip("brightway2")
+
+from gsa import GSAModel
+
+def parameter(name, activity, input, type, amount, low, high):
+    return {"name": name, "activity": ("db", activity), "input": input, "type": type, "amount": amount, "low": low, "high": high}
+
+def test_evaluate_matches_direct_solve(engine):
+    # p6 and p7 are technosphere rows past the 3 biosphere rows, two parameters share the p6 -> p1 cell, which
+    # also holds a part that is not a parameter, and the p7 -> p2 credit shares its cell with an input
+    parameters = [
+        parameter("a", "p1", ("db", "p6"), "technosphere", 0.02, 0.01, 0.2),
+        parameter("b", "p1", ("db", "p6"), "technosphere", 0.01, 0.0, 0.05),
+        parameter("c", "p2", ("db", "p7"), "substitution", 0.05, 0.0, 0.1),
+        parameter("d", "p1", ("bio", "f2"), "biosphere", 1.0, 0.5, 1.5),
+    ]
+    demands = [("db", "p0"), ("db", "p1"), ("db", "p2")]
+    model = GSAModel(parameters, demands, METHOD, engine=engine)
+
+    samples = np.random.default_rng(1).random((5, len(parameters)))
+    scores = model.evaluate(samples)
+
+    technosphere = engine.technosphere_matrix.toarray()
+    biosphere = engine.biosphere_matrix.toarray()
+    for s, sample in enumerate(samples):
+        values = model.low + sample * (model.high - model.low)
+        tech, bio = technosphere.copy(), biosphere.copy()
+        tech[6, 1] -= (values[0] - 0.02) + (values[1] - 0.01)
+        tech[7, 2] += values[2] - 0.05
+        bio[2, 1] += values[3] - 1.0
+        expected = [direct_score(engine, demand, tech, bio) for demand in demands]
+        np.testing.assert_allclose(scores[s], expected, rtol=1e-9)
+
+def test_evaluate_at_the_base_amounts_gives_base_scores(engine):
+    # The exchange is only part of its cell, the rest of the cell must be kept
+    parameters = [parameter("a", "p3", ("db", "p5"), "technosphere", 0.01, 0.0, 0.02)]
+    model = GSAModel(parameters, [("db", "p3")], METHOD, engine=engine)
+
+    np.testing.assert_allclose(model.evaluate(np.full((2, 1), 0.5))[:, 0], direct_score(engine, ("db", "p3")))
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from conftest import METHOD, small_system
+
+pytest.importorskip("brightway2")
+
+import lcaengine
+from lcaengine import LCAEngine
+
+class Exchange(dict):
+    pass
+
+class Activity(dict):
+    def __init__(self, code, inputs):
+        super().__init__(name=code)
+        self.key = ("Scenarios", code)
+        self._exchanges = [Exchange(input=self.key, amount=1.0, type="production")]
+        self._exchanges += [Exchange(input=("db", name), amount=amount, type="technosphere") for name, amount in inputs]
+
+    def exchanges(self):
+        return self._exchanges
+
+class FakeBrightway:
+    def __init__(self, scenarios):
+        self.databases = {"Scenarios": {}}
+        self.scenarios = scenarios
+
+    def Database(self, name):
+        return self.scenarios
+
+def background_engine():
+    technosphere, biosphere, characterization = small_system()
+    products = {("db", f"p{i}"): i for i in range(technosphere.shape[0])}
+    return LCAEngine(
+        sparse.csr_matrix(technosphere), sparse.csr_matrix(biosphere), dict(products), dict(products),
+        {("bio", f"f{i}"): i for i in range(biosphere.shape[0])}, ("project", ("db", 1), ("Scenarios", 1)),
+        {METHOD: characterization},
+    )
+
+def test_scenarios_as_leaves_match_a_dense_solve(monkeypatch):
+    base = background_engine()
+    scenarios = [Activity("S1", [("p0", 0.3), ("p5", 0.7)]), Activity("S2", [("p7", 1.0)])]
+    monkeypatch.setattr(lcaengine, "bw", FakeBrightway(scenarios))
+
+    engine = base.with_scenarios(("project", ("db", 1), ("Scenarios", 2)))
+    assert engine.leaves == 2
+    assert engine._background is base._background
+
+    dense = engine.technosphere_matrix.toarray()
+    demand = np.zeros((10, 3))
+    demand[8, 0] = 1
+    demand[9, 1] = 2
+    demand[3, 2] = 1
+    np.testing.assert_allclose(engine.solve_array(demand), np.linalg.solve(dense, demand), rtol=1e-10, atol=1e-12)
+
+    characterized = engine.biosphere_matrix.toarray().T @ engine.characterization_vector(METHOD)
+    np.testing.assert_allclose(engine.unit_score_vector(METHOD), np.linalg.solve(dense.T, characterized), rtol=1e-10)
+
+    s1 = engine.unit_score_vector(METHOD)[engine.product_dict[("Scenarios", "S1")]]
+    background_scores = base.unit_score_vector(METHOD)
+    assert s1 == pytest.approx(0.3 * background_scores[0] + 0.7 * background_scores[5])
+
+def test_get_engine_only_replaces_the_scenarios(monkeypatch):
+    base = background_engine()
+    monkeypatch.setattr(lcaengine, "bw", FakeBrightway([Activity("S1", [("p1", 1.0), ("missing", 2.0)])]))
+    monkeypatch.setattr(lcaengine, "database_version", lambda: ("project", ("db", 1), ("Scenarios", 3)))
+    monkeypatch.setattr(LCAEngine, "from_project", classmethod(lambda cls, method: pytest.fail("background rebuilt")))
+
+    lcaengine.set_engine(base)
+    engine = lcaengine.get_engine(METHOD)
+    assert engine.version == ("project", ("db", 1), ("Scenarios", 3))
+    assert ("Scenarios", "S1") in engine.product_dict
+    assert engine.left_out == [(("Scenarios", "S1"), ("db", "missing"))]
+    assert engine._background is base._background
+
+def test_snapshot_is_used_in_place(tmp_path, monkeypatch):
+    from snapshot import load_snapshot, save_snapshot
+
+    base = background_engine()
+    monkeypatch.setattr(lcaengine, "bw", FakeBrightway([Activity("S1", [("p0", 0.3), ("p5", 0.7)])]))
+    engine = base.with_scenarios(("project", ("db", 1), ("Scenarios", 2)))
+    save_snapshot(engine, str(tmp_path))
+
+    loaded = load_snapshot(str(tmp_path))
+    assert loaded.version == engine.version and loaded.leaves == 1
+    # The technosphere is kept in the layout the engine solves with, on the memory-mapped arrays
+    assert loaded.technosphere_matrix.format == "csc"
+    for matrix in (loaded.technosphere_matrix, loaded.biosphere_matrix):
+        assert not matrix.data.flags.writeable and not matrix.indices.flags.writeable
+
+    demand = np.eye(9)[:, [0, 8]]
+    np.testing.assert_allclose(loaded.solve_array(demand), engine.solve_array(demand), rtol=1e-12)
+    np.testing.assert_allclose(loaded.unit_score_vector(METHOD), engine.unit_score_vector(METHOD), rtol=1e-12)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from mcstream import HISTORY_POINTS, QuantileSketch, StreamingResults
+
+def test_sketch_follows_numpy():
+    rng = np.random.default_rng(0)
+    samples = rng.lognormal(size=(20000, 3))
+    sketch = QuantileSketch(3, (0.025, 0.5, 0.975))
+    for chunk in np.array_split(samples, 37):
+        sketch.update(chunk)
+
+    expected = np.quantile(samples, [0.025, 0.5, 0.975], axis=0)
+    np.testing.assert_allclose(sketch.values(), expected, rtol=0.02)
+
+def test_sketch_of_one_chunk_gives_its_quantiles():
+    samples = np.random.default_rng(3).normal(size=(50, 2))
+    sketch = QuantileSketch(2, (0.1, 0.5, 0.9))
+    assert np.isnan(sketch.values()).all()
+    sketch.update(samples)
+    np.testing.assert_allclose(sketch.values(), np.quantile(samples, [0.1, 0.5, 0.9], axis=0, method="hazen"), rtol=1e-3)
+
+def test_sketch_keeps_the_extremes():
+    rng = np.random.default_rng(4)
+    chunks = [rng.normal(size=(100, 1)) for _ in range(20)]
+    sketch = QuantileSketch(1, (0.0, 1.0))
+    for chunk in chunks:
+        sketch.update(chunk)
+    np.testing.assert_allclose(sketch.values()[:, 0], [np.vstack(chunks).min(), np.vstack(chunks).max()])
+
+def test_streaming_moments_and_bounded_history():
+    rng = np.random.default_rng(1)
+    results = StreamingResults(["a", "b"])
+    chunks = [rng.normal(size=(10, 2)) for _ in range(5 * HISTORY_POINTS + 3)]
+    for chunk in chunks:
+        results.update(chunk)
+
+    samples = np.vstack(chunks)
+    summary = results.summary()
+    np.testing.assert_allclose(summary["mean"], samples.mean(axis=0))
+    np.testing.assert_allclose(summary["std"], samples.std(axis=0, ddof=1))
+
+    assert len(results.history) <= HISTORY_POINTS
+    convergence = results.convergence()
+    iterations = convergence["iterations"].unique()
+    assert iterations[-1] == len(samples)
+    assert np.all(np.diff(iterations) > 0)
+    assert len(iterations) <= HISTORY_POINTS + 1
+    assert convergence.loc[convergence["iterations"] == len(samples), "mean"].to_numpy() == pytest.approx(samples.mean(axis=0))
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pedigree import PEDIGREE_VARIANCES, apply_pedigree
+
+pytest.importorskip("openpyxl")
+
+def workbook(path, reliability):
+    pd.DataFrame({
+        "Facility name": ["Anaerobic digestor"],
+        "Flow": ["Electricity"],
+        "Reliability": [f"{reliability}) Estimate"],
+        "Completeness": ["1) Complete"],
+        "Temporal Correlation": ["1) Recent"],
+        "Geographical Correlation": ["1) Same area"],
+        "Further technological correlation": ["1) Same technology"],
+    }).to_excel(path, index=False)
+    return path
+
+def dataset():
+    return [{"name": "AD", "exchanges": [
+        {"name": "Electricity", "amount": -2.0, "type": "technosphere"},
+        {"name": "Heat", "amount": 1.0, "type": "technosphere", "uncertainty type": 2, "loc": 0.0, "scale": 0.1},
+    ]}]
+
+def test_pedigree_is_replaced_when_the_workbook_changes(tmp_path):
+    data = dataset()
+    assert apply_pedigree(data, workbook(tmp_path / "v1.xlsx", 2)) == 1
+    electricity, heat = data[0]["exchanges"]
+    assert electricity["pedigree"]["reliability"] == 2
+    assert electricity["negative"] and electricity["loc"] == pytest.approx(np.log(2.0))
+    assert heat["scale"] == 0.1
+
+    apply_pedigree(data, workbook(tmp_path / "v2.xlsx", 4))
+    assert electricity["pedigree"]["reliability"] == 4
+    assert electricity["scale"] == pytest.approx(np.sqrt(0.0006 + PEDIGREE_VARIANCES[0, 3]))
+    assert "pedigree" not in heat
+
+    pd.DataFrame(columns=["Facility name", "Flow", "Reliability", "Completeness", "Temporal Correlation",
+                          "Geographical Correlation", "Further technological correlation"]).to_excel(tmp_path / "v3.xlsx", index=False)
+    apply_pedigree(data, tmp_path / "v3.xlsx")
+    assert electricity["uncertainty type"] == 0 and "pedigree" not in electricity
+    assert heat["uncertainty type"] == 2
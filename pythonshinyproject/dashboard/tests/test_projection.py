@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import waste_frame
+
+pytest.importorskip("brightway2")
+
+from projection import project, projection_table, totals
+from wastedata import WasteCube
+
+def unit_table():
+    return pd.DataFrame({"IPCC 2021": [100.0, -50.0], "acidification": [0.5, 0.2]}, index=["S1", "S2"])
+
+def bands():
+    return pd.DataFrame({"q0.025": [80.0], "q0.975": [120.0]}, index=["S1"])
+
+def test_project_is_tonnage_times_unit_scores():
+    cube = WasteCube(waste_frame())
+    result = project(cube, unit_table(), ["Matières organiques"], "generated")
+
+    y, t = cube.years.index(2020), cube.territories.index("Verdun")
+    np.testing.assert_allclose(result["scores"][y, t], 200.0 * unit_table().to_numpy())
+    # No row for the organics in 2022
+    assert np.isnan(result["scores"][cube.years.index(2022)]).all()
+
+def test_bands_only_on_their_method_and_scenario():
+    cube = WasteCube(waste_frame())
+    result = project(cube, unit_table(), ["Matières organiques"], "generated", bands=bands(), band_method="IPCC 2021")
+
+    y, t = cube.years.index(2020), cube.territories.index("Anjou")
+    assert result["lower"][y, t, 0, 0] == pytest.approx(100.0 * 80.0)
+    assert result["upper"][y, t, 0, 0] == pytest.approx(100.0 * 120.0)
+    assert np.isnan(result["lower"][:, :, :, 1]).all()
+    assert np.isnan(result["lower"][:, :, 1, :]).all()
+
+    table = projection_table(result)
+    assert table.loc[table["method"] == "acidification", ["lower", "upper"]].isna().all().all()
+    row = table[(table["year"] == 2020) & (table["territory"] == "Anjou") & (table["scenario"] == "S1") & (table["method"] == "IPCC 2021")]
+    assert row["lower"].item() == pytest.approx(8000.0)
+    assert row["score"].item() == pytest.approx(10000.0)
+
+def test_totals_add_up_territories():
+    cube = WasteCube(waste_frame())
+    result = project(cube, unit_table(), ["Matières organiques"], "generated", bands=bands())
+    scores, lower, upper = totals(result)
+
+    y = cube.years.index(2021)
+    assert scores[y, 0, 0] == pytest.approx((110.0 + 210.0) * 100.0)
+    assert lower[y, 0, 0] == pytest.approx((110.0 + 210.0) * 80.0)
+    assert np.isnan(lower[y, 1, 0]) and np.isnan(lower[y, 0, 1])
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("brightway2")
+
+import pandas as pd
+
+from scenarioindex import parse_scenarios, scenario_id
+
+def sheet(rows):
+    width = max(len(row) for row in rows)
+    return pd.DataFrame([list(row) + [np.nan] * (width - len(row)) for row in rows])
+
+ROWS = [
+    ("Database", "Scenarios"),
+    (),
+    ("Activity", " Compost mix "),
+    ("location", "CA-QC"),
+    ("unit", "ton"),
+    ("Exchanges",),
+    ("name", "amount", "database", "percentage"),
+    ("Compost mix", 1, "Scenarios", np.nan),
+    ("Composter_casselman", 0.4, "OWM Facilities", 40),
+    ("AD", 0.6, "OWM Facilities", 60),
+    (),
+    ("Activity", "Landfill only"),
+    ("Exchanges",),
+    ("name", "amount", "database", "percentage"),
+    ("Landfill only", 1, "Scenarios", np.nan),
+    ("Landfill_lachute", 1, "OWM Facilities", "100"),
+    ("a note", np.nan, np.nan, np.nan),
+]
+
+def test_blocks_are_parsed_into_scenarios():
+    scenarios = parse_scenarios(sheet(ROWS))
+
+    assert [s["name"] for s in scenarios] == ["Compost mix", "Landfill only"]
+    assert [s["row"] for s in scenarios] == [3, 12]
+    assert scenarios[0]["components"] == [
+        {"name": "Composter_casselman", "percentage": 40.0},
+        {"name": "AD", "percentage": 60.0},
+    ]
+    assert scenarios[1]["components"] == [{"name": "Landfill_lachute", "percentage": 100.0}]
+    assert scenarios[0]["id"] == scenario_id("Compost mix", scenarios[0]["components"])
+
+def test_ids_follow_the_content_not_the_position():
+    scenarios = parse_scenarios(sheet(ROWS))
+    moved = parse_scenarios(sheet(ROWS[:2] + [("Notes",), ()] + ROWS[2:]))
+    assert [s["row"] for s in moved] != [s["row"] for s in scenarios]
+    assert [s["id"] for s in moved] == [s["id"] for s in scenarios]
+
+    changed = [row if row[:1] != ("AD",) else ("AD", 0.5, "OWM Facilities", 50) for row in ROWS]
+    assert parse_scenarios(sheet(changed))[0]["id"] != scenarios[0]["id"]
+    assert parse_scenarios(sheet(changed))[1]["id"] == scenarios[1]["id"]
+
+    duplicated = parse_scenarios(sheet(ROWS + ROWS[10:]))
+    assert len({s["id"] for s in duplicated}) == 3
+
+def test_components_without_a_percentage_are_dropped():
+    rows = list(ROWS[:10]) + [("Closed-tunnel Composter", 0.1, "OWM Facilities", "n/a")]
+    (scenario,) = parse_scenarios(sheet(rows))
+    assert [c["name"] for c in scenario["components"]] == ["Composter_casselman", "AD"]
+
+def test_empty_sheet():
+    assert parse_scenarios(pd.DataFrame()) == []
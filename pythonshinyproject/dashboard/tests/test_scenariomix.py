@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("brightway2")
+
+import scenariomix
+from scenariomix import allocation_grid, mix_scores, optimize_allocation, pareto_front, round_allocation, sweep, tradeoff_curve, unscored_components
+
+def facilities():
+    return pd.DataFrame(
+        {"climate": [500.0, 80.0, 40.0], "water": [1.0, 2.0, 6.0]},
+        index=["Landfill_a", "Composter_b", "AD"],
+    )
+
+def test_allocation_grid_covers_every_split():
+    grid = allocation_grid(3, step=25)
+    assert grid.shape == (15, 3)
+    assert np.all(grid.sum(axis=1) == 100)
+    assert len({tuple(row) for row in grid}) == len(grid)
+    assert allocation_grid(1).tolist() == [[100.0]]
+
+def test_mix_scores_and_pareto_front():
+    table = facilities().to_numpy()
+    allocations = np.array([[100, 0, 0], [0, 100, 0], [0, 0, 100], [50, 50, 0]])
+    scores = mix_scores(allocations, table)
+    np.testing.assert_allclose(scores, allocations @ table / 100)
+    # Half landfill is worse than the composter alone on climate but better on water, so no row is dominated
+    assert pareto_front(scores).tolist() == [True, True, True, True]
+    assert pareto_front(np.vstack([scores, scores[1] + 1])).tolist() == [True, True, True, True, False]
+    assert pareto_front(scores, chunk_size=1).tolist() == pareto_front(scores).tolist()
+
+def test_optimize_allocation_respects_capacities_and_diversion():
+    allocation, scores = optimize_allocation(facilities(), capacities={"AD": 30})
+    np.testing.assert_allclose(allocation.to_numpy(), [0, 70, 30], atol=1e-9)
+    assert scores["climate"] == pytest.approx(0.7 * 80 + 0.3 * 40)
+
+    allocation, _ = optimize_allocation(facilities(), weights=[0, 1], min_diversion=60)
+    np.testing.assert_allclose(allocation.to_numpy(), [40, 60, 0], atol=1e-9)
+
+    assert optimize_allocation(facilities(), capacities={"Composter_b": 10, "AD": 10}, min_diversion=50) == (None, None)
+
+def test_unscored_components_are_not_free():
+    table = facilities()
+    table.loc["Closed-tunnel Composter"] = [np.nan, np.nan]
+    assert unscored_components(table) == ["Closed-tunnel Composter"]
+
+    allocation, _ = optimize_allocation(table)
+    assert allocation["Closed-tunnel Composter"] == 0
+    np.testing.assert_allclose(allocation[list(facilities().index)].to_numpy(), [0, 0, 100], atol=1e-9)
+
+def test_sweep_holds_unscored_components_at_zero(monkeypatch):
+    table = facilities()
+    table.loc["Closed-tunnel Composter"] = [np.nan, np.nan]
+    monkeypatch.setattr(scenariomix, "facility_unit_scores", lambda components, methods=None: table.loc[list(components)])
+
+    result = sweep(list(table.index), step=25)
+    assert result.attrs["unscored"] == ["Closed-tunnel Composter"]
+    assert (result["Closed-tunnel Composter"] == 0).all()
+    assert len(result) == len(allocation_grid(3, step=25))
+    assert not result[["climate", "water"]].isna().any().any()
+
+def test_round_allocation_keeps_the_total():
+    allocation = pd.Series([33.4, 33.3, 33.3], index=["a", "b", "c"])
+    rounded = round_allocation(allocation)
+    assert rounded.sum() == 100
+    assert rounded.tolist() == [34, 33, 33]
+
+def test_round_allocation_stays_within_the_capacities():
+    # The largest remainder would round a up past its capacity
+    allocation = pd.Series([30.5, 30.2, 39.3], index=["a", "b", "c"])
+    rounded = round_allocation(allocation, capacities={"a": 30.5, "c": 40})
+    assert rounded.sum() == 100
+    assert rounded["a"] <= 30.5 and rounded["c"] <= 40
+    assert rounded.tolist() == [30, 30, 40]
+
+    rng = np.random.default_rng(2)
+    for _ in range(50):
+        caps = rng.uniform(10, 60, 4)
+        allocation, _ = optimize_allocation(
+            pd.DataFrame({"climate": rng.uniform(0, 100, 4)}, index=list("abcd")),
+            capacities=dict(zip("abcd", caps)),
+        )
+        if allocation is None:
+            continue
+        rounded = round_allocation(allocation, capacities=dict(zip("abcd", caps)))
+        assert rounded.sum() == 100
+        if np.floor(caps).sum() >= 100:
+            assert np.all(rounded.to_numpy() <= caps)
+
+def test_tradeoff_curve_goes_from_one_optimum_to_the_other():
+    curve = tradeoff_curve(facilities(), "climate", "water", n_points=5, capacities={"AD": 50})
+    assert curve["water"].iloc[0] == pytest.approx(1.0)
+    assert curve["water"].iloc[-1] == pytest.approx(0.5 * 2 + 0.5 * 6)
+    assert np.all(np.diff(curve["climate"]) <= 1e-9)
+    np.testing.assert_allclose(curve[list(facilities().index)].sum(axis=1), 100)
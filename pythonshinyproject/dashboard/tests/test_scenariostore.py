@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("brightway2")
+pytest.importorskip("bw2io")
+
+from scenariostore import ExcelScenarioStore, SQLiteScenarioStore
+
+COMPONENTS = [{"name": "AD", "percentage": 40}, {"name": "Landfill_terrebonne", "percentage": 60}]
+
+def test_sqlite_export_reads_back_with_the_excel_store(tmp_path):
+    store = SQLiteScenarioStore(path=str(tmp_path / "scenarios.sqlite"), workbook=str(tmp_path / "missing.xlsx"))
+    assert store.save_scenario("S9", "test", COMPONENTS) == 1
+    assert store.save_scenario("S10", "", COMPONENTS[:1]) == 1
+    assert store.delete_scenario("S10") == 1
+
+    path = str(tmp_path / "export.xlsx")
+    store.export_excel(path)
+
+    exported = ExcelScenarioStore(path).list_scenarios()
+    assert [s["name"] for s in exported] == ["S9"]
+    assert exported[0]["components"] == [{"name": "AD", "percentage": 0.4}, {"name": "Landfill_terrebonne", "percentage": 0.6}]
+
+def test_sqlite_store_revision_changes_on_writes(tmp_path):
+    store = SQLiteScenarioStore(path=str(tmp_path / "scenarios.sqlite"), workbook=str(tmp_path / "missing.xlsx"))
+    before = store.revision()
+    store.save_scenario("S9", "", COMPONENTS)
+    assert store.revision() == before + 1
+    assert store.delete_scenario("unknown") == 0
+    assert store.revision() == before + 1
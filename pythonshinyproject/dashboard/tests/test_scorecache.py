@@ -0,0 +1,54 @@
+from contextlib import closing
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("brightway2")
+
+import scorecache
+
+METHOD = ("IPCC 2021", "climate change", "GWP 100a")
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    databases = {
+        "ecoinvent": {"modified": "1", "depends": ["biosphere3"]},
+        "biosphere3": {"modified": "1"},
+        "Scenarios": {"modified": "1", "depends": ["ecoinvent"]},
+    }
+    monkeypatch.setattr(scorecache, "bw", SimpleNamespace(projects=SimpleNamespace(dir=str(tmp_path)), databases=databases))
+    return databases
+
+def test_scores_are_found_for_the_revision_they_were_stored_with(databases):
+    scorecache.store({(("Scenarios", "a"), METHOD): 12.5, (("ecoinvent", "b"), METHOD): 3.0})
+
+    keys = [("Scenarios", "a"), ("ecoinvent", "b"), ("Scenarios", "missing")]
+    assert scorecache.lookup(keys, [METHOD]) == {(("Scenarios", "a"), METHOD): 12.5, (("ecoinvent", "b"), METHOD): 3.0}
+    assert scorecache.lookup(keys, [("other",)]) == {}
+
+    # Writing a database a scenario depends on changes the revision of the scenario too
+    databases["biosphere3"]["modified"] = "2"
+    assert scorecache.lookup(keys, [METHOD]) == {}
+
+def test_revision_only_follows_the_dependencies(databases):
+    scenarios = scorecache.database_revision("Scenarios")
+    databases["unrelated"] = {"modified": "1"}
+    assert scorecache.database_revision("Scenarios") == scenarios
+
+    ecoinvent = scorecache.database_revision("ecoinvent")
+    databases["Scenarios"]["modified"] = "2"
+    assert scorecache.database_revision("ecoinvent") == ecoinvent
+    assert scorecache.database_revision("Scenarios") != scenarios
+
+def test_prune_keeps_the_current_revisions(databases):
+    databases["Old"] = {"modified": "1"}
+    scorecache.store({(("Scenarios", "a"), METHOD): 1.0, (("ecoinvent", "b"), METHOD): 2.0, (("Old", "c"), METHOD): 3.0})
+    databases["Scenarios"]["modified"] = "2"
+    scorecache.store({(("Scenarios", "a"), METHOD): 4.0})
+    del databases["Old"]
+
+    scorecache.prune()
+
+    with closing(scorecache._connect()) as conn:
+        rows = sorted(conn.execute("SELECT database, code, score FROM unit_scores"))
+    assert rows == [("Scenarios", "a", 4.0), ("ecoinvent", "b", 2.0)]
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from conftest import METHOD, direct_score
+
+pytest.importorskip("brightway2")
+
+import variants
+from variants import BASE, exchange_change, solve_variants
+
+P = [("db", f"p{i}") for i in range(8)]
+# p6 -> p1 is both a technosphere input and a substitution credit of p1
+CREDIT = 0.05
+
+class Activity(dict):
+    def __init__(self, key, exchanges):
+        super().__init__(name=key[1])
+        self._exchanges = exchanges
+
+    def exchanges(self):
+        return self._exchanges
+
+def inventory(engine):
+    """Method to get the activities behind the matrices of the engine, as brightway would store them"""
+    tech = engine.technosphere_matrix.toarray()
+    bio = engine.biosphere_matrix.toarray()
+    flows = {row: key for key, row in engine.biosphere_dict.items()}
+    activities = {}
+
+    for key, col in engine.activity_dict.items():
+        exchanges = [{"input": key, "type": "production", "amount": tech[col, col]}]
+        for product, row in engine.product_dict.items():
+            if row == col or tech[row, col] == 0 and (key, product) != (P[1], P[6]):
+                continue
+            if (key, product) == (P[1], P[6]):
+                exchanges.append({"input": product, "type": "substitution", "amount": CREDIT})
+                exchanges.append({"input": product, "type": "technosphere", "amount": CREDIT - tech[row, col]})
+            else:
+                exchanges.append({"input": product, "type": "technosphere", "amount": -tech[row, col]})
+        exchanges += [{"input": flows[row], "type": "biosphere", "amount": bio[row, col]} for row in np.flatnonzero(bio[:, col])]
+        activities[key] = Activity(key, exchanges)
+
+    return SimpleNamespace(get_activity=lambda key: activities[key])
+
+def test_variants_match_a_direct_solve(engine, monkeypatch):
+    monkeypatch.setattr(variants, "bw", inventory(engine))
+    tech = engine.technosphere_matrix.toarray()
+    bio = engine.biosphere_matrix.toarray()
+    p1_input = CREDIT - tech[6, 1]
+
+    cases = {
+        "more input": [exchange_change(P[1], P[3], amount=0.5)],
+        "doubled": [exchange_change(P[1], P[3], factor=2.0), exchange_change(P[4], P[6], factor=0.0)],
+        "same exchange twice": [exchange_change(P[1], P[3], factor=2.0), exchange_change(P[1], P[3], factor=1.5)],
+        "credit only": [exchange_change(P[1], P[6], factor=3.0, type="substitution")],
+        "input only": [exchange_change(P[1], P[6], amount=0.3)],
+        "both on one cell": [exchange_change(P[1], P[6], amount=0.3), exchange_change(P[1], P[6], factor=0.5, type="substitution")],
+        "cleaner": [exchange_change(P[2], ("bio", "f0"), amount=0.1, type="biosphere")],
+        "bigger batch": [exchange_change(P[5], P[5], amount=2.0, type="production")],
+    }
+    demands = [P[0], P[1], P[2], P[5]]
+    scores = solve_variants(cases, demands, methods=[METHOD], engine=engine)
+    assert list(scores.index.get_level_values("variant").unique()) == [BASE] + list(cases)
+
+    def changed(cells, matrix=tech):
+        matrix = matrix.copy()
+        for (row, col), value in cells.items():
+            matrix[row, col] = value
+        return matrix
+
+    matrices = {
+        BASE: (tech, bio),
+        "more input": (changed({(3, 1): -0.5}), bio),
+        "doubled": (changed({(3, 1): 2 * tech[3, 1], (6, 4): 0}), bio),
+        "same exchange twice": (changed({(3, 1): 3 * tech[3, 1]}), bio),
+        "credit only": (changed({(6, 1): 3 * CREDIT - p1_input}), bio),
+        "input only": (changed({(6, 1): CREDIT - 0.3}), bio),
+        "both on one cell": (changed({(6, 1): 0.5 * CREDIT - 0.3}), bio),
+        "cleaner": (tech, changed({(0, 2): 0.1}, bio)),
+        "bigger batch": (changed({(5, 5): 2.0}), bio),
+    }
+    for name, (t, b) in matrices.items():
+        for key in demands:
+            assert scores.loc[(name, key[1])].iloc[0] == pytest.approx(direct_score(engine, key, t, b), rel=1e-9), name
+
+def test_changes_outside_the_system_are_ignored(engine, monkeypatch):
+    monkeypatch.setattr(variants, "bw", inventory(engine))
+    scores = solve_variants({"unknown": [exchange_change(P[1], ("other", "x"), amount=5.0)]}, [P[1]], methods=[METHOD], engine=engine)
+    assert scores.loc[("unknown", "p1")].iloc[0] == pytest.approx(scores.loc[(BASE, "p1")].iloc[0])
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import waste_frame
+
+pytest.importorskip("brightway2")
+
+from wastedata import WasteCube
+
+def test_cube_axes_and_values():
+    cube = WasteCube(waste_frame(), version="abc")
+    assert cube.version == "abc"
+    assert cube.years == [2020, 2021, 2022]
+    assert cube.territories == ["Anjou", "Verdun"]
+    assert cube.materials == ["Matières organiques", "Textiles"]
+
+    y, m, t = cube.year_index[2021], cube.material_index["Matières organiques"], cube.territory_index["Verdun"]
+    assert cube.quantity("generated")[y, m, t] == 210.0
+    # A row with a missing tonnage is present, its value is NaN
+    assert cube.present[y, m, t] and np.isnan(cube.quantity("collected")[y, m, t])
+    assert not cube.present[cube.year_index[2022], m].any()
+    assert np.isnan(cube.quantity("generated")[cube.year_index[2022], m]).all()
+
+def test_first_duplicate_is_kept():
+    df = waste_frame()
+    duplicate = df.iloc[[0]].assign(quantite_generee_donnees_agglo=999.0)
+    cube = WasteCube(pd.concat([df, duplicate], ignore_index=True))
+    assert cube.quantity("generated")[0, cube.material_index["Matières organiques"], cube.territory_index["Anjou"]] == 100.0
+
+def test_year_slice_means_over_materials():
+    cube = WasteCube(waste_frame())
+    territories, means = cube.year_slice(2020, ["Matières organiques", "Textiles", "unknown"])
+    assert territories == ["Anjou", "Verdun"]
+    generated = means[cube.quantities.index("generated")]
+    np.testing.assert_allclose(generated, [55.0, 200.0])
+
+    territories, means = cube.year_slice(2021, ["Matières organiques"])
+    np.testing.assert_allclose(means[cube.quantities.index("collected")], [70.0, np.nan])
+
+    assert cube.year_slice(2019, ["Textiles"])[0] == []
+    assert cube.year_slice(2020, ["unknown"])[0] == []
+
+def test_series_only_has_years_with_a_row():
+    cube = WasteCube(waste_frame())
+    years, values = cube.series("Textiles", "Verdun")
+    assert years == [2022]
+    assert values[cube.quantities.index("generated"), 0] == 12.0
+    assert values[cube.quantities.index("collected"), 0] == 3.0
+    assert cube.series("Textiles", "nowhere")[0] == []
@@ -0,0 +1,183 @@
+import brightway2 as bw
+from typing import Dict, List, TypedDict
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from lcaengine import TECHNOSPHERE_SIGNS, activity_key, climate_change_methods, get_engine
+
+OWM_DATABASE = "OWM Facilities"
+
+BASE = "base"
+
+class ExchangeChange(TypedDict, total=False):
+    activity: tuple
+    input: tuple
+    type: str
+    amount: float
+    factor: float
+
+def exchange_change(activity, input, amount=None, factor=None, type="technosphere"):
+    """Method to describe a change of one exchange, either its new total amount or a factor on the current amount"""
+    change: ExchangeChange = {"activity": activity_key(activity), "input": activity_key(input), "type": type}
+    if factor is not None:
+        change["factor"] = factor
+    else:
+        change["amount"] = amount
+    return change
+
+def exchange_amounts(activity):
+    """Method to get the {(input, type): amount} of the exchanges of an activity, the exchanges of one input and type summed"""
+    amounts = {}
+    for exc in bw.get_activity(activity_key(activity)).exchanges():
+        key = (tuple(exc["input"]), exc["type"])
+        amounts[key] = amounts.get(key, 0.0) + exc["amount"]
+    return amounts
+
+def variant_deltas(engine, changes):
+    """Method to turn the changes of a variant into sparse deltas of the technosphere and biosphere matrices
+
+    Each change applies to its own exchange, a factor scaling the amount of that exchange and not the net
+    matrix cell it shares with exchanges of other types, such as an input that is also a substitution credit.
+    Changes of the same exchange apply in order, and the deltas of the exchanges of one cell add up.
+    """
+    shapes = {"technosphere": engine.technosphere_matrix.shape, "biosphere": engine.biosphere_matrix.shape}
+    activities = {}
+    exchanges = {}
+
+    for c in changes:
+        row_dict = engine.biosphere_dict if c["type"] == "biosphere" else engine.product_dict
+        if c["input"] not in row_dict or c["activity"] not in engine.activity_dict:
+            continue
+
+        key = (c["activity"], c["input"], c["type"])
+        if key not in exchanges:
+            if c["activity"] not in activities:
+                activities[c["activity"]] = exchange_amounts(c["activity"])
+            amount = activities[c["activity"]].get((c["input"], c["type"]), 0.0)
+            exchanges[key] = [amount, amount]
+
+        exchanges[key][1] = exchanges[key][1] * c["factor"] if "factor" in c else c["amount"]
+
+    deltas = {}
+    for matrix_name in ("technosphere", "biosphere"):
+        selected = [(key, amounts) for key, amounts in exchanges.items() if (key[2] == "biosphere") == (matrix_name == "biosphere")]
+        row_dict = engine.biosphere_dict if matrix_name == "biosphere" else engine.product_dict
+
+        rows = np.array([row_dict[key[1]] for key, _ in selected], dtype=int)
+        cols = np.array([engine.activity_dict[key[0]] for key, _ in selected], dtype=int)
+        data = np.array([(new - old) * TECHNOSPHERE_SIGNS.get(key[2], 1) for key, (old, new) in selected], dtype=float)
+
+        # Duplicated cells are summed by the sparse constructor
+        deltas[matrix_name] = sparse.csc_matrix((data, (rows, cols)), shape=shapes[matrix_name])
+
+    return deltas["technosphere"], deltas["biosphere"]
+
+def solve_variants(variants, demands, methods=None, engine=None):
+    """Method to get the scores of every demand under every variant, all variants sharing one factorization
+
+    variants is a {name: [ExchangeChange]} dictionary and demands a list of activities, the result has a
+    (variant, activity) index, with the unchanged system as the "base" variant, and one column per method.
+    A variant only changes a few columns of the technosphere, so its solution is the base solution corrected
+    with the Woodbury identity, using the base factorization applied to the changed columns of all variants
+    in one multi right-hand side solve.
+    """
+    methods = list(methods or climate_change_methods())
+    engine = engine or get_engine(methods[0])
+
+    keys = [activity_key(activity) for activity in demands]
+    names = [bw.get_activity(key)["name"] for key in keys]
+
+    demand_array = np.zeros((len(engine.product_dict), len(keys)))
+    for j, key in enumerate(keys):
+        demand_array[engine.product_dict[key], j] = 1
+
+    characterization = engine.characterization_matrix(methods)
+    base_supply = engine.solve_array(demand_array)
+
+    deltas = {name: variant_deltas(engine, changes) for name, changes in variants.items()}
+    changed_columns = {name: np.unique(delta_tech.nonzero()[1]) for name, (delta_tech, _) in deltas.items()}
+
+    # The changed technosphere columns of every variant, solved with the base factorization in one batch
+    blocks = [deltas[name][0][:, columns].toarray() for name, columns in changed_columns.items()]
+    corrections = engine.solve_array(np.hstack(blocks)) if sum(block.shape[1] for block in blocks) else np.zeros((len(engine.product_dict), 0))
+    offsets = np.cumsum([0] + [block.shape[1] for block in blocks])
+
+    frames = [pd.DataFrame((characterization @ (engine.biosphere_matrix @ base_supply)).T, index=names, columns=methods)]
+    labels = [BASE]
+
+    for i, (name, columns) in enumerate(changed_columns.items()):
+        delta_tech, delta_bio = deltas[name]
+        supply = base_supply
+
+        if len(columns):
+            w = corrections[:, offsets[i]:offsets[i + 1]]
+            # (A + U E')^-1 = A^-1 - A^-1 U (I + E' A^-1 U)^-1 E' A^-1, E selecting the changed columns
+            capacitance = np.eye(len(columns)) + w[columns, :]
+            supply = base_supply - w @ np.linalg.solve(capacitance, base_supply[columns, :])
+
+        inventory = engine.biosphere_matrix @ supply + delta_bio @ supply
+        frames.append(pd.DataFrame((characterization @ inventory).T, index=names, columns=methods))
+        labels.append(name)
+
+    return pd.concat(frames, keys=labels, names=["variant", "activity"])
+
+def _base_activity(name, base_names):
+    """Method to get the base activity name a variant activity is derived from, the longest base name it starts with"""
+    candidates = [base for base in base_names if name.startswith(base)]
+    return max(candidates, key=len) if candidates else None
+
+def variants_from_workbook(path, base_database=OWM_DATABASE, background_database="ecoinvent-3.9.1-cutoff"):
+    """Method to read a sensitivity workbook as variants of the base database, without writing it to brightway
+
+    Every activity of the workbook is compared to the base activity it is named after, e.g. AD_city_high to
+    AD_city, and the exchanges whose total amount differs become changes. Activities sharing a name suffix
+    (_high, _low, or none) form one variant named after the workbook database and the suffix.
+    """
+    imp = bw.ExcelImporter(path)
+    imp.apply_strategies()
+    imp.match_database(background_database, fields=('name', 'unit', 'location', 'reference product'))
+    imp.match_database(fields=('name', 'unit', 'location'))
+
+    base = {act['name']: act for act in bw.Database(base_database)}
+    own = {ds['code']: ds['name'] for ds in imp.data}
+
+    def base_input(exc):
+        """Method to map an exchange of the workbook to an input of the brightway databases"""
+        key = exc.get('input')
+        if key is None:
+            return None
+        if key[0] == imp.db_name:
+            base_name = _base_activity(own.get(key[1], ""), base)
+            return base[base_name].key if base_name else None
+        return tuple(key)
+
+    variants: Dict[str, List[ExchangeChange]] = {}
+
+    for ds in imp.data:
+        base_name = _base_activity(ds['name'], base)
+        if base_name is None:
+            print(f"No base activity for '{ds['name']}'")
+            continue
+
+        activity = base[base_name]
+        suffix = ds['name'][len(base_name):].strip("_ ")
+        variant = f"{imp.db_name} ({suffix})" if suffix else imp.db_name
+
+        current, target = {}, {}
+        for exc in activity.exchanges():
+            if exc['type'] != 'production':
+                current[(exc.input.key, exc['type'])] = current.get((exc.input.key, exc['type']), 0) + exc['amount']
+        for exc in ds.get('exchanges', []):
+            key = base_input(exc)
+            if exc['type'] != 'production' and key is not None:
+                target[(key, exc['type'])] = target.get((key, exc['type']), 0) + exc['amount']
+
+        changes = variants.setdefault(variant, [])
+        for (key, exc_type) in set(current) | set(target):
+            amount = target.get((key, exc_type), 0)
+            if not np.isclose(amount, current.get((key, exc_type), 0)):
+                changes.append(exchange_change(activity, key, amount=amount, type=exc_type))
+
+    return variants
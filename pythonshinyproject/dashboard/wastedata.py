@@ -0,0 +1,260 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from scenarioindex import file_stamp
+
+WASTE_DATA_URL = "https://donnees.montreal.ca/dataset/matieres-residuelles-bilan-massique/resource/1341d644-9dd4-4ade-b2b1-9cec53b7beec/download"
+
+# URL or local CSV file the snapshot is built from, tests point it at a fixture file
+WASTE_DATA_SOURCE = os.environ.get("WASTE_DATA_SOURCE", WASTE_DATA_URL)
+WASTE_DATA_LOCATION = os.environ.get("WASTE_DATA_LOCATION", "data/waste")
+WASTE_DATA_REFRESH_HOURS = float(os.environ.get("WASTE_DATA_REFRESH_HOURS", 24))
+
+# Tonnage columns of the cube, in the order of its first axis
+QUANTITIES = {
+    "generated": "quantite_generee_donnees_agglo",
+    "collected": "quantite_collectee_donnees_agglo",
+}
+
+SNAPSHOT_FILENAME = "residual_materials.parquet"
+MANIFEST_FILENAME = "manifest.json"
+
+AGGLO_MTL_MUN = [
+    "Ahuntsic-Cartierville", "Anjou", "Côte-des-Neiges–Notre-Dame-de-Grâce",
+    "L'Île-Bizard–Sainte-Geneviève", "Lachine", "LaSalle", "Le Plateau-Mont-Royal",
+    "Le Sud-Ouest", "Mercier–Hochelaga-Maisonneuve", "Montréal-Nord", "Outremont",
+    "Pierrefonds-Roxboro", "Rivière-des-Prairies–Pointe-aux-Trembles",
+    "Rosemont–La Petite-Patrie", "Saint-Laurent", "Saint-Léonard", "Verdun",
+    "Ville-Marie", "Villeray–Saint-Michel–Parc-Extension",
+    "Baie-d'Urfé", "Beaconsfield", "Côte-Saint-Luc", "Dollard-des Ormeaux",
+    "Dorval", "Hampstead", "Kirkland", "Montréal-Est", "Montréal-Ouest",
+    "Mont-Royal", "Pointe-Claire", "Sainte-Anne-de-Bellevue", "Senneville", "Westmount"
+]
+
+_lock = threading.Lock()
+_state = {}
+_refresher = None
+
+def snapshot_path():
+    return os.path.join(WASTE_DATA_LOCATION, SNAPSHOT_FILENAME)
+
+def manifest_path():
+    return os.path.join(WASTE_DATA_LOCATION, MANIFEST_FILENAME)
+
+def read_manifest():
+    """Method to get the manifest of the local snapshot, empty if there is none"""
+    try:
+        with open(manifest_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_atomic(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def _write_manifest(manifest):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+    _write_atomic(manifest_path(), write)
+
+def clean(raw):
+    """Method to type the raw dataset: quantities as numbers, years as integers, only the territories of the agglomeration"""
+    df = raw.copy()
+
+    for col in df.columns[3:11]:
+        df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[^0-9.]', '', regex=True), errors='coerce')
+
+    df = df[df['territoire'].isin(AGGLO_MTL_MUN)].reset_index(drop=True)
+    df['annee'] = pd.to_numeric(df['annee'], errors='coerce').astype('Int64')
+    df['matiere'] = df['matiere'].astype('category')
+    df['territoire'] = df['territoire'].astype('category')
+
+    return df
+
+def _fetch(source, manifest):
+    """Method to get (raw bytes or None if unchanged, etag, last modified) of the source, a URL or a local file"""
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read(), None, None
+
+    request = urllib.request.Request(source)
+    if manifest.get("source") == source and manifest.get("etag") and os.path.exists(snapshot_path()):
+        request.add_header("If-None-Match", manifest["etag"])
+
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.read(), response.headers.get("ETag"), response.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, manifest.get("etag"), manifest.get("last_modified")
+        raise
+
+def refresh(source=None):
+    """Method to bring the local snapshot up to date with the source, only rewritten when the downloaded content changed
+
+    Returns True if the snapshot was rewritten.
+    """
+    source = source or WASTE_DATA_SOURCE
+    manifest = read_manifest()
+    raw, etag, last_modified = _fetch(source, manifest)
+
+    manifest.update({"source": source, "etag": etag, "last_modified": last_modified, "checked_at": time.time()})
+
+    digest = hashlib.sha256(raw).hexdigest() if raw is not None else manifest.get("sha256")
+    changed = raw is not None and (digest != manifest.get("sha256") or not os.path.exists(snapshot_path()))
+
+    os.makedirs(WASTE_DATA_LOCATION, exist_ok=True)
+
+    if changed:
+        df = clean(pd.read_csv(io.BytesIO(raw)))
+        _write_atomic(snapshot_path(), lambda tmp_path: df.to_parquet(tmp_path, index=False))
+        manifest.update({"sha256": digest, "rows": len(df), "written_at": time.time()})
+        print(f"Residual materials snapshot updated, {len(df)} rows")
+
+    _write_manifest(manifest)
+    return changed
+
+def _refresh_due():
+    checked_at = read_manifest().get("checked_at", 0)
+    return time.time() - checked_at >= WASTE_DATA_REFRESH_HOURS * 3600
+
+def _refresh_loop():
+    while True:
+        if _refresh_due():
+            try:
+                refresh()
+            except Exception as e:
+                print(f"Residual materials refresh failed: {e}")
+                # Try again in an hour instead of at every loop
+                time.sleep(3600)
+        time.sleep(60)
+
+def start_background_refresh():
+    """Method to start the refresh thread of this process, once"""
+    global _refresher
+
+    with _lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, name="waste-data-refresh", daemon=True)
+            _refresher.start()
+
+def load_waste_data():
+    """Method to get the residual materials dataset, one in-memory copy per process shared by all sessions
+
+    The copy comes from the local snapshot and is read again only when the refresh thread rewrites it. The
+    source is only downloaded here when there is no snapshot at all yet.
+    """
+    if not os.path.exists(snapshot_path()):
+        try:
+            refresh()
+        except Exception as e:
+            print(f"Error loading data: {e}")
+            return None
+
+    start_background_refresh()
+
+    stamp = file_stamp(snapshot_path())
+    with _lock:
+        if _state.get("stamp") != stamp:
+            _state["data"] = pd.read_parquet(snapshot_path())
+            _state["stamp"] = stamp
+            _state["version"] = read_manifest().get("sha256") or str(stamp)
+        return _state["data"]
+
+def waste_data_version():
+    """Method to get the version of the loaded dataset, the hash of the content it was built from"""
+    return _state.get("version")
+
+class WasteCube:
+    """Dense quantity x year x material x territory array of the tonnages, built once per snapshot
+
+    Missing combinations are NaN and present tells which ones have a row in the dataset, so selections
+    are array slices instead of scans of the table. The axes are sorted and indexed by their labels.
+    version is the version of the dataset the cube was built from.
+    """
+
+    def __init__(self, df, version=None):
+        self.version = version
+        self.quantities = list(QUANTITIES)
+        self.years = sorted(int(year) for year in df['annee'].dropna().unique())
+        self.materials = sorted(str(m) for m in df['matiere'].dropna().unique())
+        self.territories = sorted(str(t) for t in df['territoire'].dropna().unique())
+
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+        self.material_index = {m: i for i, m in enumerate(self.materials)}
+        self.territory_index = {t: i for i, t in enumerate(self.territories)}
+
+        df = df.dropna(subset=['annee', 'matiere', 'territoire'])
+        years = pd.Categorical(df['annee'].astype(int), categories=self.years).codes
+        materials = pd.Categorical(df['matiere'].astype(str), categories=self.materials).codes
+        territories = pd.Categorical(df['territoire'].astype(str), categories=self.territories).codes
+
+        shape = (len(self.years), len(self.materials), len(self.territories))
+        self.values = np.full((len(self.quantities),) + shape, np.nan)
+        self.present = np.zeros(shape, dtype=bool)
+
+        # The first row of a duplicated combination is the one kept, numpy does not say which write of a
+        # repeated index wins
+        cells = np.ravel_multi_index((years, materials, territories), shape)
+        _, first = np.unique(cells, return_index=True)
+        years, materials, territories = years[first], materials[first], territories[first]
+        for q, column in enumerate(QUANTITIES.values()):
+            self.values[q, years, materials, territories] = df[column].to_numpy(dtype=float)[first]
+        self.present[years, materials, territories] = True
+
+    def quantity(self, name):
+        return self.values[self.quantities.index(name)]
+
+    def year_slice(self, year, materials):
+        """Method to get (territories, quantities x territories means over the materials) of one year
+
+        Only the territories with a row for at least one of the materials are kept, in axis order.
+        """
+        y = self.year_index.get(int(year))
+        m = [self.material_index[material] for material in materials if material in self.material_index]
+        if y is None or not m:
+            return [], np.zeros((len(self.quantities), 0))
+
+        present = self.present[y, m]
+        keep = present.any(axis=0)
+        values = np.where(present, self.values[:, y, m], np.nan)[:, :, keep]
+
+        counts = (~np.isnan(values)).sum(axis=1)
+        means = np.divide(np.nansum(values, axis=1), counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+        return [t for t, k in zip(self.territories, keep) if k], means
+
+    def series(self, material, territory):
+        """Method to get (years, quantities x years values) of one material in one territory, years with a row only"""
+        m = self.material_index.get(material)
+        t = self.territory_index.get(territory)
+        if m is None or t is None:
+            return [], np.zeros((len(self.quantities), 0))
+
+        keep = self.present[:, m, t]
+        return [year for year, k in zip(self.years, keep) if k], self.values[:, keep, m, t]
+
+def load_waste_cube():
+    """Method to get the tonnage cube of the current snapshot, built again only when the snapshot changes"""
+    df = load_waste_data()
+    if df is None:
+        return None
+
+    with _lock:
+        if _state.get("cube_data") is not df:
+            _state["cube"] = WasteCube(df, _state.get("version"))
+            _state["cube_data"] = df
+        return _state["cube"]